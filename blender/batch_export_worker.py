@@ -0,0 +1,68 @@
+"""
+Фоновый воркер пакетного экспорта вариантов (запускается Material Manager, не вручную)
+Запуск:
+    blender --background --factory-startup <prepared.blend> --python-exit-code 1 \
+        --python batch_export_worker.py -- <job.json>
+
+job.json: {
+    "objects": [имена экспортируемых объектов],
+    "armatures": [имена арматур],
+    "folder_name": имя папки текстур,
+    "folder_path": путь к папке текстур,
+    "output": путь к GLB,
+    "export_options": {свойства material.export_glb}
+}
+
+Подготовленный .blend содержит объекты (уже с очищенной геометрией) без сцены:
+воркер добавляет их в сцену, применяет материалы папки
+(manager.apply_materials_batch) и экспортирует через material.export_glb.
+"""
+
+import json
+import os
+import sys
+
+import bpy
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.append(SCRIPT_DIR)
+
+import blender_453_material_manager as manager
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:]
+    with open(argv[0], 'r', encoding='utf-8') as f:
+        job = json.load(f)
+
+    # Каталог текстур актуализирован основным процессом: без повторного сканирования папок
+    manager.register(sync_catalog=False)
+
+    scene = bpy.context.scene
+    view_layer = bpy.context.view_layer
+    objects = [bpy.data.objects[name] for name in job['objects']]
+    for obj in objects + [bpy.data.objects[name] for name in job['armatures']]:
+        if obj.name not in scene.collection.objects:
+            scene.collection.objects.link(obj)
+
+    for obj in view_layer.objects:
+        obj.select_set(obj in objects)
+    view_layer.objects.active = objects[0]
+
+    # Фоновый запуск без оператора: шаг отмены не создается
+    result = manager.apply_materials_batch([(objects, job['folder_path'])])[0]
+    if result is None:
+        print(f"✗ Не удалось применить материалы папки: {job['folder_path']}")
+        sys.exit(1)
+
+    result = bpy.ops.material.export_glb(filepath=job['output'], **job['export_options'])
+    if 'FINISHED' not in result or not os.path.exists(job['output']):
+        print(f"✗ Экспорт не выполнен: {job['output']}")
+        sys.exit(1)
+
+    print(f"✓ Вариант экспортирован: {job['output']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,32 @@ Blender скрипт для управления материалами с ди
 """
 
 import bpy
+import bmesh
+import hashlib
+import json
+import math
 import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+from mathutils import Matrix
+
+# Вспомогательные модули (glb_optimize.py и др.) лежат рядом со скриптом
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.append(SCRIPT_DIR)
+
+import glb_optimize
+import glb_stream_export
+import texture_catalog
 
 # Путь к корневой папке с текстурами (все субфолдеры будут сканироваться)
 TEXTURES_ROOT_DIR = r"C:\Users\HP\Downloads\дивансон\textures"
@@ -19,6 +43,74 @@ EXPORT_DIR = r"C:\Users\HP\Downloads\дивансон\textures"
 # Материалы single имеют этот префикс
 SINGLE_MATERIAL_PREFIX = "__SINGLE__"
 
+# Свойство изображений и материалов с хешем содержимого файла текстуры
+TEXTURE_HASH_PROPERTY = "texture_hash"
+
+# Файл каталога текстур (SQLite): папки, файлы, разрешение, каналы, хеши
+TEXTURE_CATALOG_PATH = os.path.join(SCRIPT_DIR, "texture_catalog.sqlite")
+# Кеш текстур, извлеченных из ZIP архивов (имя файла - хеш содержимого)
+TEXTURE_CACHE_DIR = os.path.join(SCRIPT_DIR, "texture_cache")
+_texture_catalog = None
+
+# Глубина вложенных material_batch (режим переключает только внешний)
+_batch_depth = 0
+
+# Раскладка для прогрессивной загрузки: .gltf + .bin + отдельные текстуры и их превью
+EXPORT_TEXTURE_DIR = "textures"
+PREVIEW_TEXTURE_DIR = "preview"
+PREVIEW_TEXTURE_SIZE = 256
+
+# Пакетный экспорт вариантов: воркер для фоновых процессов Blender и индекс файлов
+BATCH_WORKER_SCRIPT = os.path.join(SCRIPT_DIR, "batch_export_worker.py")
+VARIANTS_INDEX_NAME = "variants.json"
+
+# Библиотека материалов: шаблонный материал копируется, в копии меняется только изображение.
+# Шаблон берется из текущего файла, из общего .blend (если есть) или создается в сессии
+MATERIAL_TEMPLATE_NAME = "__MATERIAL_TEMPLATE__"
+MATERIAL_LIBRARY_PATH = os.path.join(SCRIPT_DIR, "material_library.blend")
+# Нода изображения в шаблоне (если ее нет - берется первая нода Image Texture)
+MATERIAL_TEMPLATE_IMAGE_NODE = "Image Texture"
+# Способы создания материалов (оператор применения и выбор на панели)
+MATERIAL_MODE_ITEMS = [
+    ('TEMPLATE', "Template", "Копировать шаблонный материал и подставлять изображение"),
+    ('LINKED_TEMPLATE', "Linked Template",
+     "Шаблон связывается из material_library.blend (а не добавляется в файл)"),
+    ('NODES', "Nodes", "Строить ноды каждого материала с нуля"),
+]
+
+# Поиск одинаковых мешей: допустимое отклонение вершин (доля размера меша)
+# при сравнении с точностью до преобразования
+INSTANCE_MATCH_TOLERANCE = 1e-5
+
+# Группа нод, через которую экспортер glTF получает карту Ambient Occlusion
+GLTF_SETTINGS_GROUP = "glTF Material Output"
+
+# Профили атрибутов вершин для экспорта (POSITION экспортируется всегда).
+# None - атрибуты не удаляются; MORPH - shape keys, CUSTOM_NORMALS - пользовательские нормали
+ATTRIBUTE_PROFILES = {
+    'ALL': None,
+    'WEB': {'NORMAL', 'TEXCOORD_0', 'MORPH'},
+    'WEB_STATIC': {'NORMAL', 'TEXCOORD_0'},
+    'WEB_COLOR': {'NORMAL', 'TEXCOORD_0', 'COLOR_0', 'MORPH'},
+    'UNLIT': {'TEXCOORD_0'},
+}
+
+# Байт на вершину в GLB: UV - 2 float, цвет - 4 unsigned short, нормаль - 3 float, тангенс - 4 float,
+# shape key - смещения позиции и нормали (2 x 3 float)
+ATTRIBUTE_VERTEX_BYTES = {'TEXCOORD': 8, 'COLOR': 8, 'NORMAL': 12, 'TANGENT': 16, 'MORPH': 24}
+
+# Бюджет памяти текстур: минимальная сторона уменьшенной текстуры и вес видимости по входу BSDF
+# (текстуры менее заметных входов уменьшаются раньше)
+MIN_BUDGET_TEXTURE_SIZE = 64
+TEXTURE_VISIBILITY_WEIGHTS = {'Base Color': 1.0, 'Emission Color': 1.0, 'Alpha': 0.75, 'Normal': 0.75}
+DEFAULT_TEXTURE_VISIBILITY = 0.5
+
+# Максимум влияний костей на вершину (столько поддерживает glTF без дополнительных JOINTS_1/WEIGHTS_1)
+MAX_BONE_INFLUENCES = 4
+
+# Путь F-кривой кости: pose.bones["Имя"].rotation_quaternion
+BONE_DATA_PATH_RE = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]')
+
 
 def get_selected_objects(context):
     """
@@ -42,66 +134,563 @@ def get_selected_objects(context):
     return selected_objects
 
 
+def get_texture_catalog():
+    """
+    Возвращает каталог текстур (SQLite). При первом обращении каталог открывается
+    и обновляется: перечитываются только изменившиеся папки.
+    """
+    global _texture_catalog
+    if _texture_catalog is None:
+        _texture_catalog = texture_catalog.TextureCatalog(TEXTURE_CATALOG_PATH, TEXTURE_CACHE_DIR)
+        refresh_texture_catalog()
+    return _texture_catalog
+
+
+def refresh_texture_catalog(force=False):
+    """
+    Обновляет каталог для TEXTURES_ROOT_DIR.
+    Возвращает статистику сканирования.
+    """
+    global _texture_catalog
+    if _texture_catalog is None:
+        _texture_catalog = texture_catalog.TextureCatalog(TEXTURE_CATALOG_PATH, TEXTURE_CACHE_DIR)
+    stats = _texture_catalog.scan(TEXTURES_ROOT_DIR, force=force)
+    print(f"✓ Каталог текстур: папок {stats['directories']} (перечитано {stats['rescanned']}), "
+          f"текстур {stats['textures']}, {stats['seconds']:.3f} с")
+    return stats
+
+
+def get_selected_face_mask(obj):
+    """
+    Маска выделенных граней объекта в Edit Mode (читается массивом, без выхода из Edit Mode).
+    Возвращает: массив bool или None, если грани не выделены
+    """
+    obj.update_from_editmode()
+    mask = np.zeros(len(obj.data.polygons), dtype=bool)
+    obj.data.polygons.foreach_get('select', mask)
+    return mask if mask.any() else None
+
+
+def assign_materials_to_faces(obj, materials, face_mask):
+    """
+    Назначает материалы только граням face_mask: материалы добавляются в слоты (если их нет),
+    несколько материалов распределяются по выделенным граням циклически.
+    Остальные грани и их слоты не меняются. Вызывается в Object Mode.
+    Возвращает: количество измененных граней
+    """
+    mesh = obj.data
+    slot_indices = []
+    for material in materials:
+        slot_index = next((index for index, slot_material in enumerate(mesh.materials)
+                           if slot_material == material), None)
+        if slot_index is None:
+            mesh.materials.append(material)
+            slot_index = len(mesh.materials) - 1
+        slot_indices.append(slot_index)
+    
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_indices)
+    selected_count = int(face_mask.sum())
+    slot_indices = np.array(slot_indices, dtype=np.int32)
+    material_indices[face_mask] = slot_indices[np.arange(selected_count) % len(slot_indices)]
+    mesh.polygons.foreach_set('material_index', material_indices)
+    mesh.update()
+    return selected_count
+
+
 def scan_texture_folders(root_dir):
     """
-    Сканирует корневую папку и возвращает список субфолдеров с количеством текстур в каждом.
-    Возвращает: [(folder_name, texture_count, folder_path), ...]
+    Возвращает список папок с текстурами (рекурсивно) и количество материалов в каждой
+    (PBR набор - один материал, как при применении папки).
+    Данные берутся из каталога, файловая система не читается.
+    Возвращает: [(folder_name, material_count, folder_path), ...]
+    """
+    return get_texture_catalog().folders(root_dir)
+
+
+def sync_folder_list(scene):
+    """
+    Заполняет список папок сцены (scene.material_folders) из каталога текстур.
+    Панель рисует этот список через UIList, не обращаясь к каталогу при каждой перерисовке.
+    """
+    folders = scene.material_folders
+    # Отметки пакетного экспорта сохраняются между обновлениями
+    export_selected = {item.path for item in folders if item.export_selected}
+    folders.clear()
+    memory = get_texture_catalog().folder_memory(TEXTURES_ROOT_DIR)
+    for folder_name, material_count, folder_path in scan_texture_folders(TEXTURES_ROOT_DIR):
+        decoded, gpu, unknown = memory.get(str(folder_path), (0, 0, 0))
+        item = folders.add()
+        item.name = folder_name
+        item.path = str(folder_path)
+        item.material_count = material_count
+        item.decoded_mb = decoded / (1024 * 1024)
+        item.gpu_mb = gpu / (1024 * 1024)
+        item.unknown_count = unknown
+        item.export_selected = item.path in export_selected
+    if scene.material_folder_index >= len(folders):
+        scene.material_folder_index = max(len(folders) - 1, 0)
+
+
+def get_texture_files(folder_path):
+    """
+    Получает список файлов текстур из указанной папки (по каталогу).
+    Папки вне каталога сканируются напрямую.
+    """
+    catalog = get_texture_catalog()
+    if catalog.has_directory(folder_path):
+        return [Path(row['path']) for row in catalog.textures(folder_path)]
+    
+    _, _, _, textures = texture_catalog.scan_directory(os.path.abspath(folder_path))
+    texture_files = [Path(texture[0]) for texture in textures]
+    texture_files.sort(key=lambda x: x.name.lower())
+    return texture_files
+
+
+def get_texture_hash(file_path):
+    """
+    Возвращает SHA-256 содержимого файла текстуры.
+    Хеш хранится в каталоге и пересчитывается только при изменении размера или времени изменения файла.
+    """
+    return get_texture_catalog().get_hash(str(file_path))
+
+
+def get_texture_path(texture_file):
+    """
+    Путь к файлу текстуры на диске для загрузки в Blender.
+    Текстуры из ZIP архивов извлекаются в TEXTURE_CACHE_DIR (только при обращении).
+    """
+    return get_texture_catalog().extract(str(texture_file))
+
+
+def get_image_hash(image):
+    """
+    Хеш содержимого изображения Blender: упакованные данные или файл на диске.
+    Возвращает: (хеш, размер в байтах) или (None, 0), если содержимое недоступно
     """
-    folders_info = []
+    if image.packed_file:
+        data = image.packed_file.data
+        return hashlib.sha256(data).hexdigest(), len(data)
     
-    if not os.path.exists(root_dir):
-        return folders_info
+    file_path = bpy.path.abspath(image.filepath) if image.filepath else ""
+    if file_path and os.path.isfile(file_path):
+        return get_texture_hash(file_path), os.path.getsize(file_path)
+    return None, 0
+
+
+def load_texture_image(texture_file, content_hash):
+    """
+    Загружает изображение текстуры или переиспользует уже загруженное с тем же содержимым
+    (одинаковые файлы из разных папок дают один datablock изображения).
+    Возвращает: (image, reused)
+    """
+    for image in bpy.data.images:
+        if image.get(TEXTURE_HASH_PROPERTY) == content_hash:
+            return image, True
     
-    root_path = Path(root_dir)
-    # Расширения для поиска (в нижнем регистре для нормализации)
-    supported_extensions_lower = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif']
+    image = bpy.data.images.load(get_texture_path(texture_file))
+    # Файл из кеша архива назван хешем - изображению возвращаем исходное имя
+    image.name = Path(texture_file).name
+    image[TEXTURE_HASH_PROPERTY] = content_hash
+    return image, False
+
+
+def find_material_by_hash(content_hash, single):
+    """
+    Ищет уже созданный материал с тем же содержимым текстуры и того же типа (single/multipl):
+    одинаковые картинки из разных папок дают один материал.
+    Возвращает: материал или None
+    """
+    for material in bpy.data.materials:
+        if material.library is None and material.get(TEXTURE_HASH_PROPERTY) == content_hash \
+                and material.name.startswith(SINGLE_MATERIAL_PREFIX) == single:
+            return material
+    return None
+
+
+@contextmanager
+def temporary_image_dedup(objects):
+    """
+    На время экспорта переключает ноды Image Texture материалов объектов
+    на одно изображение для каждого уникального содержимого, чтобы GLB
+    содержал каждую картинку один раз. После выхода исходные изображения возвращаются.
+    Возвращает (yield): {'duplicates': количество дубликатов, 'bytes_saved': байт}
+    """
+    materials = {
+        slot.material for obj in objects for slot in obj.material_slots
+        if slot.material and slot.material.use_nodes
+    }
+    canonical_images = {}  # хеш -> изображение
+    duplicate_images = {}  # дубликат -> размер
+    replaced_nodes = []  # (нода, исходное изображение)
     
-    # Сканируем все субфолдеры
-    for subfolder in root_path.iterdir():
-        if subfolder.is_dir():
-            # Используем set для устранения дубликатов (на случай разных регистров)
-            texture_files = set()
-            
-            # Ищем все файлы в папке
-            for file_path in subfolder.iterdir():
-                if file_path.is_file():
-                    # Получаем расширение в нижнем регистре
-                    ext_lower = file_path.suffix.lower()
-                    # Проверяем, является ли это поддерживаемым расширением
-                    if ext_lower in supported_extensions_lower:
-                        # Используем полный путь для уникальности, но считаем по имени файла
-                        texture_files.add(file_path.name.lower())
-            
-            texture_count = len(texture_files)
-            
-            if texture_count > 0:
-                folders_info.append((subfolder.name, texture_count, subfolder))
+    try:
+        for material in sorted(materials, key=lambda mat: mat.name):
+            for node in material.node_tree.nodes:
+                if node.type != 'TEX_IMAGE' or node.image is None:
+                    continue
+                content_hash, size = get_image_hash(node.image)
+                if content_hash is None:
+                    continue
+                canonical = canonical_images.setdefault(content_hash, node.image)
+                if canonical != node.image:
+                    duplicate_images[node.image] = size
+                    replaced_nodes.append((node, node.image))
+                    node.image = canonical
+        
+        yield {
+            'duplicates': len(duplicate_images),
+            'bytes_saved': sum(duplicate_images.values()),
+        }
+    finally:
+        for node, image in replaced_nodes:
+            node.image = image
+
+
+def get_image_visibility(material, node):
+    """
+    Вес видимости текстуры: по входам BSDF, к которым (напрямую или через ноды) подключена нода.
+    Возвращает наибольший вес среди найденных входов.
+    """
+    weight = 0.0
+    pending = [node]
+    visited = set()
+    while pending:
+        current = pending.pop()
+        if current.name in visited:
+            continue
+        visited.add(current.name)
+        for output in current.outputs:
+            for link in output.links:
+                if link.to_node.type == 'BSDF_PRINCIPLED':
+                    weight = max(weight, TEXTURE_VISIBILITY_WEIGHTS.get(link.to_socket.name, DEFAULT_TEXTURE_VISIBILITY))
+                else:
+                    pending.append(link.to_node)
+    return weight or DEFAULT_TEXTURE_VISIBILITY
+
+
+@contextmanager
+def temporary_texture_budget(objects, budget_mb):
+    """
+    На время экспорта уменьшает текстуры материалов объектов, пока оценка памяти
+    декодированных текстур (RGBA8 с мип-уровнями) не уложится в budget_mb.
+    Первыми уменьшаются самые дорогие с учетом видимости текстуры; уменьшаются
+    временные копии изображений, оригиналы в .blend не меняются.
+    Возвращает (yield): {'before': байт, 'after': байт, 'met': бюджет выполнен,
+                         'reduced': [(имя, (w, h), (новые w, h)), ...]}
+    """
+    report = {'before': 0, 'after': 0, 'met': True, 'reduced': []}
+    if not objects or budget_mb <= 0:
+        yield report
+        return
+    
+    materials = {
+        slot.material for obj in objects for slot in obj.material_slots
+        if slot.material and slot.material.use_nodes
+    }
+    image_nodes = {}  # изображение -> [ноды]
+    visibility = {}  # изображение -> вес видимости
+    for material in sorted(materials, key=lambda mat: mat.name):
+        for node in material.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or node.image is None:
+                continue
+            image_nodes.setdefault(node.image, []).append(node)
+            visibility[node.image] = max(visibility.get(node.image, 0.0), get_image_visibility(material, node))
+    
+    # Текущие размеры (уменьшаются по ходу подбора, применяются к копиям в конце)
+    sizes = {image: tuple(image.size) for image in image_nodes if image.size[0] and image.size[1]}
+    
+    def image_cost(size):
+        return texture_catalog.estimate_texture_memory(size[0], size[1], 8)[1]
+    
+    budget = budget_mb * 1024 * 1024
+    total = sum(image_cost(size) for size in sizes.values())
+    report['before'] = total
     
-    # Сортируем по имени
-    folders_info.sort(key=lambda x: x[0].lower())
+    # Каждый шаг уменьшает вдвое текстуру с наибольшей стоимостью, деленной на видимость
+    while total > budget:
+        candidates = [image for image, size in sizes.items() if min(size) > MIN_BUDGET_TEXTURE_SIZE]
+        if not candidates:
+            report['met'] = False
+            break
+        image = max(candidates, key=lambda img: image_cost(sizes[img]) / visibility[img])
+        width, height = sizes[image]
+        new_size = (max(width // 2, 1), max(height // 2, 1))
+        total += image_cost(new_size) - image_cost(sizes[image])
+        sizes[image] = new_size
+    report['after'] = total
     
-    return folders_info
+    copies = []
+    original_names = {}  # оригинальное изображение -> исходное имя
+    replaced_nodes = []  # (нода, исходное изображение)
+    try:
+        for image, size in sizes.items():
+            if size == tuple(image.size):
+                continue
+            copy = image.copy()
+            copies.append(copy)
+            # Копия получает имя оригинала (по нему экспортер называет текстуру)
+            original_names[image] = image.name
+            image.name = image.name + "__export_original"
+            copy.name = original_names[image]
+            copy.scale(size[0], size[1])
+            report['reduced'].append((copy.name, tuple(image.size), size))
+            for node in image_nodes[image]:
+                replaced_nodes.append((node, image))
+                node.image = copy
+        
+        yield report
+    finally:
+        for node, image in replaced_nodes:
+            node.image = image
+        for copy in copies:
+            bpy.data.images.remove(copy)
+        for image, name in original_names.items():
+            image.name = name
 
 
-def get_texture_files(folder_path):
+def build_material_nodes(material, image):
+    """Строит ноды материала с нуля: Image Texture -> Principled BSDF -> Material Output"""
+    material.use_nodes = True
+    material.node_tree.nodes.clear()
+    
+    # Добавляем ноды
+    output_node = material.node_tree.nodes.new(type='ShaderNodeOutputMaterial')
+    bsdf_node = material.node_tree.nodes.new(type='ShaderNodeBsdfPrincipled')
+    tex_node = material.node_tree.nodes.new(type='ShaderNodeTexImage')
+    tex_node.image = image
+    
+    # Располагаем ноды
+    output_node.location = (300, 0)
+    bsdf_node.location = (0, 0)
+    tex_node.location = (-300, 0)
+    
+    # Подключаем ноды
+    material.node_tree.links.new(tex_node.outputs['Color'], bsdf_node.inputs['Base Color'])
+    material.node_tree.links.new(bsdf_node.outputs['BSDF'], output_node.inputs['Surface'])
+
+
+def read_image_channel(image, size):
+    """
+    Первый канал изображения (карты в градациях серого) как массив (height, width) размера size.
+    Если размер отличается, масштабируется временная копия изображения.
+    """
+    source = image
+    if tuple(image.size) != tuple(size):
+        source = image.copy()
+        source.scale(size[0], size[1])
+    pixels = np.empty(size[0] * size[1] * 4, dtype=np.float32)
+    source.pixels.foreach_get(pixels)
+    if source != image:
+        bpy.data.images.remove(source)
+    return pixels.reshape(size[1], size[0], 4)[..., 0]
+
+
+def pack_orm_image(name, ao_file=None, roughness_file=None, metallic_file=None):
     """
-    Получает список файлов текстур из указанной папки.
+    Упаковывает карты AO, Roughness и Metallic в одно изображение ORM (R - AO, G - Roughness,
+    B - Metallic), как ожидает glTF. Отсутствующая карта заменяется константой
+    (AO = 1, Roughness = 1, Metallic = 0). Размер - наибольший из карт.
+    Изображение с тем же набором исходников переиспользуется (по хешу).
+    Возвращает: (image, reused)
     """
-    texture_files = []
-    texture_dir = Path(folder_path)
-    supported_extensions = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
+    sources = [('ao', ao_file), ('roughness', roughness_file), ('metallic', metallic_file)]
+    orm_hash = hashlib.sha256("|".join(
+        f"{map_type}:{get_texture_hash(path) if path else ''}" for map_type, path in sources
+    ).encode('utf-8')).hexdigest()
+    for image in bpy.data.images:
+        if image.get(TEXTURE_HASH_PROPERTY) == orm_hash:
+            return image, True
     
-    for ext in supported_extensions:
-        found_files = list(texture_dir.glob(ext)) + list(texture_dir.glob(ext.upper()))
-        texture_files.extend(found_files)
+    loaded = {}
+    for map_type, path in sources:
+        if path:
+            image = bpy.data.images.load(get_texture_path(path), check_existing=True)
+            image.colorspace_settings.name = 'Non-Color'
+            loaded[map_type] = image
+    width = max(image.size[0] for image in loaded.values())
+    height = max(image.size[1] for image in loaded.values())
     
-    # Убираем дубликаты
-    texture_files = list(set(texture_files))
+    orm = np.ones((height, width, 4), dtype=np.float32)
+    orm[..., 2] = 0.0
+    for channel, map_type in enumerate(('ao', 'roughness', 'metallic')):
+        if map_type in loaded:
+            orm[..., channel] = read_image_channel(loaded[map_type], (width, height))
     
-    # Сортируем файлы по имени
-    texture_files.sort(key=lambda x: x.name.lower())
+    # Исходные карты нужны были только для упаковки
+    for image in loaded.values():
+        if image.users == 0:
+            bpy.data.images.remove(image)
     
-    return texture_files
+    orm_image = bpy.data.images.new(f"{name}_ORM", width=width, height=height, alpha=False)
+    orm_image.colorspace_settings.name = 'Non-Color'
+    orm_image.pixels.foreach_set(orm.ravel())
+    orm_image.file_format = 'PNG'
+    orm_image.pack()
+    orm_image[TEXTURE_HASH_PROPERTY] = orm_hash
+    return orm_image, False
+
+
+def get_gltf_settings_group():
+    """Группа нод 'glTF Material Output' с входом Occlusion (создается при отсутствии)"""
+    group = bpy.data.node_groups.get(GLTF_SETTINGS_GROUP)
+    if group is None:
+        group = bpy.data.node_groups.new(GLTF_SETTINGS_GROUP, 'ShaderNodeTree')
+        group.interface.new_socket(name="Occlusion", in_out='INPUT', socket_type='NodeSocketFloat')
+    return group
+
+
+def create_pbr_material(material_name, base_image, normal_image, orm_image):
+    """
+    Строит Principled материал PBR набора: Base Color, Normal Map и ORM
+    (G -> Roughness, B -> Metallic, R -> Occlusion через группу glTF Material Output).
+    Любое из изображений может отсутствовать (None).
+    """
+    material = bpy.data.materials.get(material_name)
+    if material is None:
+        material = bpy.data.materials.new(name=material_name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    nodes.clear()
+    
+    output_node = nodes.new(type='ShaderNodeOutputMaterial')
+    bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
+    output_node.location = (300, 0)
+    bsdf_node.location = (0, 0)
+    links.new(bsdf_node.outputs['BSDF'], output_node.inputs['Surface'])
+    
+    if base_image is not None:
+        tex_node = nodes.new(type='ShaderNodeTexImage')
+        tex_node.image = base_image
+        tex_node.location = (-400, 300)
+        links.new(tex_node.outputs['Color'], bsdf_node.inputs['Base Color'])
+    
+    if normal_image is not None:
+        normal_image.colorspace_settings.name = 'Non-Color'
+        normal_tex_node = nodes.new(type='ShaderNodeTexImage')
+        normal_tex_node.image = normal_image
+        normal_tex_node.location = (-600, -300)
+        normal_map_node = nodes.new(type='ShaderNodeNormalMap')
+        normal_map_node.location = (-250, -300)
+        links.new(normal_tex_node.outputs['Color'], normal_map_node.inputs['Color'])
+        links.new(normal_map_node.outputs['Normal'], bsdf_node.inputs['Normal'])
+    
+    if orm_image is not None:
+        orm_tex_node = nodes.new(type='ShaderNodeTexImage')
+        orm_tex_node.image = orm_image
+        orm_tex_node.location = (-600, 0)
+        separate_node = nodes.new(type='ShaderNodeSeparateColor')
+        separate_node.location = (-250, 0)
+        links.new(orm_tex_node.outputs['Color'], separate_node.inputs['Color'])
+        links.new(separate_node.outputs['Green'], bsdf_node.inputs['Roughness'])
+        links.new(separate_node.outputs['Blue'], bsdf_node.inputs['Metallic'])
+        
+        settings_node = nodes.new(type='ShaderNodeGroup')
+        settings_node.node_tree = get_gltf_settings_group()
+        settings_node.location = (0, -400)
+        links.new(separate_node.outputs['Red'], settings_node.inputs['Occlusion'])
+    return material
+
+
+def get_material_template(link=False):
+    """
+    Возвращает шаблонный материал: из текущего файла, из MATERIAL_LIBRARY_PATH
+    (link=True - связать, иначе добавить в файл) или создает его в сессии.
+    """
+    template = bpy.data.materials.get(MATERIAL_TEMPLATE_NAME)
+    if template is not None:
+        return template
+    
+    if os.path.exists(MATERIAL_LIBRARY_PATH):
+        with bpy.data.libraries.load(MATERIAL_LIBRARY_PATH, link=link) as (data_from, data_to):
+            if MATERIAL_TEMPLATE_NAME in data_from.materials:
+                data_to.materials = [MATERIAL_TEMPLATE_NAME]
+        if data_to.materials:
+            print(f"✓ Шаблон материала загружен из библиотеки: {MATERIAL_LIBRARY_PATH}")
+            return data_to.materials[0]
+    
+    # Шаблон сессии без fake user: после пакета удаляется (release_material_template)
+    template = bpy.data.materials.new(name=MATERIAL_TEMPLATE_NAME)
+    build_material_nodes(template, None)
+    return template
+
+
+def release_material_template():
+    """
+    Удаляет шаблон, добавленный в файл на время пакета (создан в сессии или скопирован
+    из библиотеки), если он больше не используется. Связанный шаблон и шаблон с fake user остаются.
+    """
+    template = bpy.data.materials.get(MATERIAL_TEMPLATE_NAME)
+    if template is not None and template.library is None and template.users == 0 \
+            and not template.use_fake_user:
+        bpy.data.materials.remove(template)
+
+
+def get_template_image_node(material):
+    """Нода изображения, в которую подставляется текстура при копировании шаблона"""
+    node = material.node_tree.nodes.get(MATERIAL_TEMPLATE_IMAGE_NODE)
+    if node is not None and node.type == 'TEX_IMAGE':
+        return node
+    return next((node for node in material.node_tree.nodes if node.type == 'TEX_IMAGE'), None)
+
+
+def create_material_from_template(template, material_name, image):
+    """
+    Создает материал копией шаблона и подставляет изображение.
+    Существующий материал с тем же именем заменяется у всех пользователей и удаляется.
+    """
+    material = template.copy()
+    material.use_fake_user = False
+    existing = bpy.data.materials.get(material_name)
+    if existing is not None and existing != material:
+        existing.user_remap(material)
+        bpy.data.materials.remove(existing)
+    material.name = material_name
+    
+    node = get_template_image_node(material)
+    if node is None:
+        raise ValueError(f"В шаблоне '{template.name}' нет ноды Image Texture")
+    node.image = image
+    return material
+
+
+def create_material_from_nodes(material_name, image):
+    """Создает (или пересоздает) материал, строя ноды с нуля"""
+    material = bpy.data.materials.get(material_name)
+    if material is None:
+        material = bpy.data.materials.new(name=material_name)
+    build_material_nodes(material, image)
+    return material
+
+
+def benchmark_material_modes(count=200):
+    """
+    Сравнивает время создания count материалов: ноды с нуля и копии шаблона.
+    Запуск из Python консоли Blender: benchmark_material_modes(200)
+    Возвращает: {'NODES': секунд, 'TEMPLATE': секунд}
+    """
+    image = bpy.data.images.new("__benchmark_image__", 8, 8)
+    timings = {}
+    for mode in ('NODES', 'TEMPLATE'):
+        start_time = time.perf_counter()
+        template = get_material_template() if mode == 'TEMPLATE' else None
+        materials = []
+        for index in range(count):
+            name = f"__benchmark_{mode}_{index}"
+            if template is not None:
+                materials.append(create_material_from_template(template, name, image))
+            else:
+                materials.append(create_material_from_nodes(name, image))
+        timings[mode] = time.perf_counter() - start_time
+        for material in materials:
+            bpy.data.materials.remove(material)
+    bpy.data.images.remove(image)
+    release_material_template()
+    
+    print(f"Создание {count} материалов: ноды с нуля {timings['NODES']:.3f} с, "
+          f"копии шаблона {timings['TEMPLATE']:.3f} с (x{timings['NODES'] / max(timings['TEMPLATE'], 1e-9):.1f})")
+    return timings
 
 
 def cleanup_materials_from_other_types(obj, current_type_prefix):
@@ -134,195 +723,1058 @@ def cleanup_materials_from_other_types(obj, current_type_prefix):
         obj.data.materials.append(mat)
 
 
-class MATERIAL_OT_apply_folder(bpy.types.Operator):
-    """Применяет материалы из выбранной папки к выделенным объектам"""
-    bl_idname = "material.apply_folder"
-    bl_label = "Apply Folder Materials"
-    bl_options = {'REGISTER', 'UNDO'}
+def get_armature_objects(mesh_objects):
+    """Возвращает арматуры, деформирующие переданные меш-объекты (через модификатор Armature)"""
+    armatures = []
+    for obj in mesh_objects:
+        for modifier in obj.modifiers:
+            if modifier.type == 'ARMATURE' and modifier.object and modifier.object not in armatures:
+                armatures.append(modifier.object)
+    return armatures
+
+
+def get_deformed_meshes(armature_obj):
+    """Возвращает все меш-объекты файла, которые деформирует арматура"""
+    return [
+        obj for obj in bpy.data.objects
+        if obj.type == 'MESH' and any(
+            modifier.type == 'ARMATURE' and modifier.object == armature_obj
+            for modifier in obj.modifiers
+        )
+    ]
+
+
+def read_vertex_weights(obj):
+    """
+    Читает веса групп вершин объекта в плоские массивы NumPy.
+    Blender не дает bulk-доступа к весам (foreach_get для vertex.groups работает только
+    в пределах одной вершины), поэтому это единственный проход по вершинам на Python,
+    вся дальнейшая обработка векторизована.
+    Возвращает: (vertex_indices, group_indices, weights)
+    """
+    vertex_indices = []
+    group_indices = []
+    weights = []
+    for vertex in obj.data.vertices:
+        for element in vertex.groups:
+            vertex_indices.append(vertex.index)
+            group_indices.append(element.group)
+            weights.append(element.weight)
+    return (
+        np.array(vertex_indices, dtype=np.int64),
+        np.array(group_indices, dtype=np.int64),
+        np.array(weights, dtype=np.float64),
+    )
+
+
+def limit_influences(vertex_indices, weights, max_influences, min_weight=1e-6):
+    """
+    Оставляет не более max_influences наибольших весов на вершину и нормализует их сумму до 1.
+    Возвращает: (keep_mask, new_weights) для входных массивов
+    """
+    keep = weights > min_weight
+    if not len(weights):
+        return keep, weights
     
-    folder_name: bpy.props.StringProperty()
-    folder_path: bpy.props.StringProperty()
+    # Сортируем по вершине, внутри вершины - по убыванию веса
+    order = np.lexsort((-weights, vertex_indices))
+    sorted_vertices = vertex_indices[order]
+    group_start = np.r_[0, np.flatnonzero(np.diff(sorted_vertices)) + 1]
+    run_lengths = np.diff(np.r_[group_start, len(order)])
+    rank = np.arange(len(order)) - np.repeat(group_start, run_lengths)
     
-    def execute(self, context):
-        # Получаем выделенные объекты (с учетом Edit Mode)
-        selected_objects = get_selected_objects(context)
+    rank_of_entry = np.empty_like(rank)
+    rank_of_entry[order] = rank
+    keep &= rank_of_entry < max_influences
+    
+    new_weights = np.where(keep, weights, 0.0)
+    totals = np.bincount(vertex_indices, weights=new_weights)
+    entry_totals = totals[vertex_indices]
+    new_weights = np.where(entry_totals > 0.0, new_weights / np.where(entry_totals > 0.0, entry_totals, 1.0), 0.0)
+    return keep, new_weights
+
+
+def iter_action_fcurves(action):
+    """Перебирает F-кривые действия (слоистые действия Blender 4.4+ и старый API)"""
+    layers = getattr(action, 'layers', None)
+    if layers:
+        for layer in layers:
+            for strip in layer.strips:
+                for channelbag in getattr(strip, 'channelbags', []):
+                    yield from channelbag.fcurves
+    else:
+        yield from action.fcurves
+
+
+def get_animated_bone_names():
+    """Имена костей, анимированных хотя бы в одном действии файла (экспортер выгружает все действия)"""
+    animated = set()
+    for action in bpy.data.actions:
+        for fcurve in iter_action_fcurves(action):
+            match = BONE_DATA_PATH_RE.match(fcurve.data_path)
+            if match:
+                animated.add(match.group(1))
+    return animated
+
+
+def get_protected_bone_names(armature_obj):
+    """
+    Имена костей, которые нельзя удалять независимо от весов:
+    кости с ограничениями, цели ограничений и кости, к которым привязаны другие объекты.
+    """
+    names = set()
+    for pose_bone in armature_obj.pose.bones:
+        if pose_bone.constraints:
+            names.add(pose_bone.name)
+    
+    for obj in bpy.data.objects:
+        if obj.parent == armature_obj and obj.parent_type == 'BONE' and obj.parent_bone:
+            names.add(obj.parent_bone)
+        constraints = list(obj.constraints)
+        if obj.type == 'ARMATURE' and obj.pose:
+            for pose_bone in obj.pose.bones:
+                constraints.extend(pose_bone.constraints)
+        for constraint in constraints:
+            for target_attr, subtarget_attr in (('target', 'subtarget'), ('pole_target', 'pole_subtarget')):
+                if getattr(constraint, target_attr, None) == armature_obj:
+                    subtarget = getattr(constraint, subtarget_attr, '')
+                    if subtarget:
+                        names.add(subtarget)
+    return names
+
+
+def get_weighted_group_names(obj):
+    """Имена групп вершин объекта, у которых есть хотя бы один ненулевой вес"""
+    _, group_indices, weights = read_vertex_weights(obj)
+    used = np.unique(group_indices[weights > 0.0])
+    return {obj.vertex_groups[int(index)].name for index in used}
+
+
+@contextmanager
+def temporary_export_meshes(objects):
+    """
+    Временно подменяет меши объектов копиями, чтобы подготовка к экспорту
+    не изменяла оригиналы в .blend. Копии получают имена оригиналов,
+    поэтому имена мешей в GLB не меняются. После выхода оригиналы возвращаются, копии удаляются.
+    Возвращает (yield): {копия меша: [объекты, использующие ее]}
+    """
+    original_meshes = {}  # объект -> оригинальный меш
+    copies = {}  # оригинальный меш -> копия
+    original_names = {}  # оригинальный меш -> исходное имя
+    try:
+        for obj in objects:
+            mesh = obj.data
+            if mesh not in copies:
+                copies[mesh] = mesh.copy()
+            original_meshes[obj] = mesh
+            obj.data = copies[mesh]
         
-        if not selected_objects:
-            self.report(
-                {'WARNING'}, 
-                "Необходимо выбрать хотя бы один объект типа MESH! Выделите объект в Object Mode или Edit Mode."
-            )
-            return {'CANCELLED'}
+        for mesh, mesh_copy in copies.items():
+            original_names[mesh] = mesh.name
+            mesh.name = mesh.name + "__export_original"
+            mesh_copy.name = original_names[mesh]
         
-        # Переключаемся в Object Mode для применения материалов
-        if context.mode != 'OBJECT':
+        yield {
+            mesh_copy: [obj for obj, mesh in original_meshes.items() if copies[mesh] == mesh_copy]
+            for mesh_copy in copies.values()
+        }
+    finally:
+        for obj, mesh in original_meshes.items():
+            obj.data = mesh
+        for mesh, mesh_copy in copies.items():
+            bpy.data.meshes.remove(mesh_copy)
+            if mesh in original_names:
+                mesh.name = original_names[mesh]
+
+
+def cleanup_mesh_geometry(mesh, merge_distance):
+    """
+    Очищает геометрию меша через bmesh: объединяет вершины по расстоянию,
+    удаляет вырожденные грани и грани нулевой площади, свободные вершины и ребра,
+    затем один раз триангулирует.
+    Возвращает: {'verts': удалено, 'edges': удалено, 'faces': удалено, 'triangles': итого треугольников}
+    """
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    counts_before = (len(bm.verts), len(bm.edges), len(bm.faces))
+    
+    bmesh.ops.remove_doubles(bm, verts=bm.verts[:], dist=merge_distance)
+    bmesh.ops.dissolve_degenerate(bm, dist=merge_distance, edges=bm.edges[:])
+    
+    # Грани нулевой площади, которые не схлопнулись по ребрам (например, вырожденные в отрезок)
+    zero_area_faces = [face for face in bm.faces if face.calc_area() <= merge_distance * merge_distance]
+    if zero_area_faces:
+        bmesh.ops.delete(bm, geom=zero_area_faces, context='FACES_ONLY')
+    
+    # Свободные ребра (без граней) и вершины (без ребер)
+    loose_edges = [edge for edge in bm.edges if not edge.link_faces]
+    if loose_edges:
+        bmesh.ops.delete(bm, geom=loose_edges, context='EDGES')
+    loose_verts = [vert for vert in bm.verts if not vert.link_edges]
+    if loose_verts:
+        bmesh.ops.delete(bm, geom=loose_verts, context='VERTS')
+    
+    counts_after = (len(bm.verts), len(bm.edges), len(bm.faces))
+    
+    bmesh.ops.triangulate(bm, faces=bm.faces[:])
+    triangles = len(bm.faces)
+    
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+    
+    return {
+        'verts': counts_before[0] - counts_after[0],
+        'edges': counts_before[1] - counts_after[1],
+        'faces': counts_before[2] - counts_after[2],
+        'triangles': triangles,
+    }
+
+
+def compact_material_slots(mesh):
+    """
+    Удаляет с копии меша слоты материалов без граней и объединяет слоты с одинаковым
+    материалом, переназначая material_index массивами.
+    Возвращает: (слотов до, слотов после)
+    """
+    slot_count = len(mesh.materials)
+    if slot_count == 0 or not mesh.polygons:
+        return slot_count, slot_count
+    
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_indices)
+    np.clip(material_indices, 0, slot_count - 1, out=material_indices)
+    face_counts = np.bincount(material_indices, minlength=slot_count)
+    
+    materials = list(mesh.materials)
+    kept_materials = []
+    remap = np.zeros(slot_count, dtype=np.int32)
+    for slot_index, material in enumerate(materials):
+        if face_counts[slot_index] == 0:
+            continue
+        # Слоты с одним и тем же материалом дают лишние примитивы - объединяем
+        if material is not None and material in kept_materials:
+            remap[slot_index] = kept_materials.index(material)
+            continue
+        remap[slot_index] = len(kept_materials)
+        kept_materials.append(material)
+    
+    if len(kept_materials) == slot_count:
+        return slot_count, slot_count
+    
+    mesh.materials.clear()
+    for material in kept_materials:
+        mesh.materials.append(material)
+    mesh.polygons.foreach_set('material_index', remap[material_indices])
+    mesh.update()
+    return slot_count, len(kept_materials)
+
+
+def get_reachable_nodes(node_tree):
+    """Ноды, от которых есть путь по связям к активному выходу материала"""
+    output = next((node for node in node_tree.nodes
+                   if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if output is None:
+        return set()
+    reachable = set()
+    pending = [output]
+    while pending:
+        node = pending.pop()
+        if node.name in reachable:
+            continue
+        reachable.add(node.name)
+        for socket in node.inputs:
+            for link in socket.links:
+                if link.is_valid and not link.is_muted:
+                    pending.append(link.from_node)
+    return reachable
+
+
+@contextmanager
+def temporary_unreachable_image_strip(objects):
+    """
+    На время экспорта отключает изображения в нодах Image Texture, не связанных
+    с выходом материала (в GLB попадают только изображения экспортируемых материалов).
+    После выхода ноды восстанавливаются.
+    Возвращает (yield): {'images': количество изображений, 'bytes': их размер}
+    """
+    materials = {
+        slot.material for obj in objects for slot in obj.material_slots
+        if slot.material and slot.material.use_nodes
+    }
+    replaced_nodes = []  # (нода, исходное изображение)
+    reachable_images = set()
+    stripped_images = set()
+    
+    try:
+        for material in sorted(materials, key=lambda mat: mat.name):
+            reachable = get_reachable_nodes(material.node_tree)
+            for node in material.node_tree.nodes:
+                if node.type != 'TEX_IMAGE' or node.image is None:
+                    continue
+                if node.name in reachable:
+                    reachable_images.add(node.image)
+                    continue
+                stripped_images.add(node.image)
+                replaced_nodes.append((node, node.image))
+                node.image = None
+        
+        # Изображение, используемое и в подключенной ноде, экспортируется все равно
+        stripped_images -= reachable_images
+        yield {
+            'images': len(stripped_images),
+            'bytes': sum(get_image_hash(image)[1] for image in stripped_images),
+        }
+    finally:
+        for node, image in replaced_nodes:
+            node.image = image
+
+
+def read_mesh_arrays(mesh):
+    """
+    Читает массивы меша через foreach_get.
+    Кроме топологии, материалов и UV учитывается все, что меняет результат экспорта:
+    гладкость граней, острые ребра, пользовательские нормали и цветовые атрибуты.
+    Возвращает: (координаты вершин (N, 3), [массивы топологии, материалов, UV, нормалей и цветов])
+    """
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', coords)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', material_indices)
+    arrays = [loop_vertices, loop_starts, material_indices]
+    for layer in mesh.uv_layers:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        layer.data.foreach_get('uv', uvs)
+        arrays.append(uvs)
+    
+    # Гладкость граней и острые ребра (по углам: не зависит от порядка ребер)
+    smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get('use_smooth', smooth)
+    edge_sharp = np.empty(len(mesh.edges), dtype=bool)
+    mesh.edges.foreach_get('use_edge_sharp', edge_sharp)
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('edge_index', loop_edges)
+    arrays += [smooth, edge_sharp[loop_edges]]
+    
+    # Пользовательские нормали: сравниваются итоговые нормали углов
+    if mesh.has_custom_normals:
+        corner_normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        mesh.corner_normals.foreach_get('vector', corner_normals)
+        arrays.append(corner_normals)
+    
+    # Цветовые атрибуты: имя, домен и значения
+    for attribute in mesh.color_attributes:
+        colors = np.empty(len(attribute.data) * 4, dtype=np.float32)
+        attribute.data.foreach_get('color', colors)
+        descriptor = f"{attribute.name}|{attribute.domain}|{attribute.data_type}"
+        arrays += [np.frombuffer(descriptor.encode('utf-8'), dtype=np.uint8), colors]
+    return coords.reshape(-1, 3), arrays
+
+
+def hash_arrays(arrays, extra=""):
+    """Хеш набора массивов NumPy (и строки extra)"""
+    digest = hashlib.blake2b(extra.encode('utf-8'), digest_size=16)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).view(np.uint8))
+    return digest.hexdigest()
+
+
+def fit_similarity_transform(source, target):
+    """
+    Подбирает преобразование подобия (поворот, равномерный масштаб, перенос), переводящее
+    вершины source в target (порядок вершин совпадает).
+    Возвращает: Matrix 4x4 или None, если такого преобразования нет
+    """
+    if len(source) < 4:
+        return None
+    source_center = source.mean(axis=0)
+    target_center = target.mean(axis=0)
+    source_local = (source - source_center).astype(np.float64)
+    target_local = (target - target_center).astype(np.float64)
+    linear, _, rank, _ = np.linalg.lstsq(source_local, target_local, rcond=None)
+    if rank < 3:
+        return None
+    
+    # Только подобие с сохранением ориентации: A^T A = s^2 E, det > 0
+    gram = linear.T @ linear
+    scale_squared = np.trace(gram) / 3
+    if scale_squared <= 0 or np.abs(gram - np.eye(3) * scale_squared).max() > 1e-5 * scale_squared:
+        return None
+    if np.linalg.det(linear) <= 0:
+        return None
+    
+    extent = max(float(np.abs(target_local).max()), 1e-9)
+    if np.abs(source_local @ linear - target_local).max() > INSTANCE_MATCH_TOLERANCE * extent:
+        return None
+    
+    translation = target_center - source_center @ linear
+    matrix = Matrix.Identity(4)
+    for row in range(3):
+        for column in range(3):
+            matrix[row][column] = linear[column][row]
+        matrix[row][3] = translation[row]
+    return matrix
+
+
+def estimate_mesh_bytes(mesh):
+    """Оценка размера меша в GLB: позиции, нормали, UV и индексы (uint32)"""
+    mesh.calc_loop_triangles()
+    vertex_bytes = 12 + 12 + 8 * len(mesh.uv_layers)
+    return estimate_export_vertices(mesh) * vertex_bytes + len(mesh.loop_triangles) * 3 * 4
+
+
+@contextmanager
+def temporary_mesh_instancing(objects, match_transformed=True):
+    """
+    На время экспорта связывает объекты с одинаковой геометрией с одним общим мешем,
+    чтобы экспортер записал ее один раз. Меши сравниваются по хешам массивов
+    (вершины, топология, материалы, UV, гладкость, острые ребра, пользовательские нормали
+    и цветовые атрибуты - см. read_mesh_arrays). match_transformed=True - дополнительно
+    находит меши, совпадающие с точностью до поворота, масштаба и переноса
+    (примененные трансформации), и компенсирует их матрицей объекта.
+    После выхода исходные меши и матрицы объектов возвращаются.
+    Возвращает (yield): {'merged': объединено мешей, 'bytes_saved': оценка байт}
+    """
+    report = {'merged': 0, 'bytes_saved': 0}
+    mesh_users = {}  # меш -> объекты
+    for obj in objects:
+        if obj.type == 'MESH':
+            mesh_users.setdefault(obj.data, []).append(obj)
+    
+    # Дешевая предварительная группировка по размерам
+    size_groups = {}
+    for mesh in mesh_users:
+        if mesh.shape_keys:
+            continue
+        key = (len(mesh.vertices), len(mesh.loops), len(mesh.polygons), len(mesh.uv_layers))
+        size_groups.setdefault(key, []).append(mesh)
+    
+    replaced_objects = []  # (объект, исходный меш, исходная матрица)
+    try:
+        for meshes in size_groups.values():
+            if len(meshes) < 2:
+                continue
+            
+            # Топология + материалы + UV + нормали + цвета -> [(меш, координаты, хеш координат)]
+            topology_groups = {}
+            for mesh in meshes:
+                coords, arrays = read_mesh_arrays(mesh)
+                material_names = "|".join(material.name if material else "" for material in mesh.materials)
+                topology_key = hash_arrays(arrays, material_names)
+                topology_groups.setdefault(topology_key, []).append((mesh, coords, hash_arrays([coords])))
+            
+            for candidates in topology_groups.values():
+                representatives = []  # (меш, координаты)
+                exact = {}  # хеш координат -> меш-представитель
+                for mesh, coords, coords_hash in candidates:
+                    target = exact.get(coords_hash)
+                    transform = None
+                    if target is None and match_transformed and representatives:
+                        # Объекты с детьми или модификаторами нельзя компенсировать матрицей
+                        if not any(obj.children or obj.modifiers for obj in mesh_users[mesh]):
+                            for representative, representative_coords in representatives:
+                                transform = fit_similarity_transform(representative_coords, coords)
+                                if transform is not None:
+                                    target = representative
+                                    break
+                    if target is None:
+                        exact[coords_hash] = mesh
+                        representatives.append((mesh, coords))
+                        continue
+                    
+                    report['merged'] += 1
+                    report['bytes_saved'] += estimate_mesh_bytes(mesh)
+                    for obj in mesh_users[mesh]:
+                        replaced_objects.append((obj, mesh, obj.matrix_world.copy()))
+                        obj.data = target
+                        if transform is not None:
+                            obj.matrix_world = obj.matrix_world @ transform
+        
+        yield report
+    finally:
+        for obj, mesh, matrix in reversed(replaced_objects):
+            obj.data = mesh
+            obj.matrix_world = matrix
+
+
+def estimate_export_vertices(mesh, with_normals=False):
+    """
+    Оценка количества вершин в GLB: экспортер разделяет вершины на швах UV,
+    поэтому считаются уникальные пары (вершина, UV активной карты).
+    with_normals=True - учитываются и разрывы нормалей углов (острые ребра, пользовательские нормали).
+    """
+    if not mesh.loops or not (mesh.uv_layers.active or with_normals):
+        return len(mesh.vertices)
+    vertex_indices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', vertex_indices)
+    columns = [vertex_indices[:, None]]
+    # UV и нормали сравниваются побитово (как int32), чтобы сравнение было точным
+    if mesh.uv_layers.active:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get('uv', uvs)
+        columns.append(uvs.view(np.int32).reshape(-1, 2))
+    if with_normals:
+        normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        mesh.corner_normals.foreach_get('vector', normals)
+        columns.append(normals.view(np.int32).reshape(-1, 3))
+    return len(np.unique(np.hstack(columns), axis=0))
+
+
+def get_exported_color_names(mesh, objects):
+    """
+    Цветовые атрибуты меша, которые экспортер glTF записывает по умолчанию
+    (export_vertex_color='MATERIAL'): используемые нодами Color Attribute / Attribute материалов,
+    а для объектов без материалов - активный цветовой атрибут.
+    """
+    names = set()
+    default_color = mesh.color_attributes.active_color
+    for obj in objects:
+        materials = [slot.material for slot in obj.material_slots if slot.material]
+        if not materials and default_color is not None:
+            names.add(default_color.name)
+        for material in materials:
+            if not material.use_nodes:
+                continue
+            for node in material.node_tree.nodes:
+                if node.type == 'VERTEX_COLOR':
+                    if node.layer_name:
+                        names.add(node.layer_name)
+                    elif default_color is not None:
+                        names.add(default_color.name)
+                elif node.type == 'ATTRIBUTE' and node.attribute_name:
+                    names.add(node.attribute_name)
+    return names
+
+
+def materials_use_normal_map(objects):
+    """Используется ли в материалах объектов нода Normal Map (тогда нужны тангенсы)"""
+    for obj in objects:
+        for slot in obj.material_slots:
+            material = slot.material
+            if not material or not material.use_nodes:
+                continue
+            for node in material.node_tree.nodes:
+                if node.type == 'NORMAL_MAP' and any(output.links for output in node.outputs):
+                    return True
+    return False
+
+
+def prune_mesh_attributes(mesh, objects, keep):
+    """
+    Удаляет с копии меша атрибуты, которых нет в профиле keep (см. ATTRIBUTE_PROFILES):
+    лишние UV карты, цветовые атрибуты, пользовательские нормали и shape keys.
+    Возвращает: {атрибут: оценка сэкономленных байт в GLB}
+    """
+    saved = {}
+    vertex_count = estimate_export_vertices(mesh)
+    
+    # UV: оставляем столько карт, сколько TEXCOORD_n в профиле, активная для рендера - первая
+    uv_keep = sum(1 for name in keep if name.startswith('TEXCOORD_'))
+    uv_names = [layer.name for layer in sorted(mesh.uv_layers, key=lambda layer: not layer.active_render)]
+    for index, name in enumerate(uv_names):
+        if index >= uv_keep:
+            saved[f"TEXCOORD_{index} ({name})"] = vertex_count * ATTRIBUTE_VERTEX_BYTES['TEXCOORD']
+            mesh.uv_layers.remove(mesh.uv_layers[name])
+    
+    # Цветовые атрибуты: COLOR_0 - только активный для рендера (экспортируется как активный).
+    # Экономия считается только для атрибутов, которые экспортер записал бы по умолчанию
+    color_keep = 'COLOR_0' in keep
+    render_color_index = mesh.color_attributes.render_color_index
+    exported_colors = get_exported_color_names(mesh, objects)
+    color_names = [attribute.name for index, attribute in enumerate(mesh.color_attributes)
+                   if not (color_keep and index == render_color_index)]
+    for name in color_names:
+        if name in exported_colors:
+            saved[f"COLOR ({name})"] = vertex_count * ATTRIBUTE_VERTEX_BYTES['COLOR']
+        mesh.color_attributes.remove(mesh.color_attributes[name])
+    if color_keep and len(mesh.color_attributes):
+        mesh.color_attributes.active_color_index = mesh.color_attributes.render_color_index
+    
+    # Пользовательские нормали разбивают вершины - без них экспортируются нормали по гладкости граней.
+    # Экономия - вершины, которые исчезают без разрывов нормалей (позиция, нормаль и оставшиеся UV)
+    if 'CUSTOM_NORMALS' not in keep and mesh.has_custom_normals:
+        split_vertices = estimate_export_vertices(mesh, with_normals=True) if 'NORMAL' in keep else 0
+        with bpy.context.temp_override(object=objects[0], active_object=objects[0]):
+            bpy.ops.mesh.customdata_custom_splitnormals_clear()
+        if split_vertices:
+            merged = split_vertices - estimate_export_vertices(mesh, with_normals=True)
+            vertex_bytes = 12 + ATTRIBUTE_VERTEX_BYTES['NORMAL'] + ATTRIBUTE_VERTEX_BYTES['TEXCOORD'] * len(mesh.uv_layers)
+            saved['CUSTOM_NORMALS'] = max(merged, 0) * vertex_bytes
+    
+    # Shape keys -> morph targets
+    if 'MORPH' not in keep and mesh.shape_keys:
+        morph_count = len(mesh.shape_keys.key_blocks) - 1
+        saved['MORPH'] = vertex_count * ATTRIBUTE_VERTEX_BYTES['MORPH'] * morph_count
+        objects[0].shape_key_clear()
+    
+    if 'NORMAL' not in keep:
+        saved['NORMAL'] = vertex_count * ATTRIBUTE_VERTEX_BYTES['NORMAL']
+    return saved
+
+
+def create_preview_images(gltf_path, gltf, max_size):
+    """
+    Создает уменьшенные копии внешних изображений .gltf (длинная сторона <= max_size)
+    в папке PREVIEW_TEXTURE_DIR рядом с файлом. Оригиналы не меняются.
+    Возвращает: {индекс изображения: (uri превью, исходный размер (w, h))}
+    """
+    base_dir = os.path.dirname(gltf_path)
+    os.makedirs(os.path.join(base_dir, PREVIEW_TEXTURE_DIR), exist_ok=True)
+    previews = {}
+    
+    for index, image_info in enumerate(gltf.get('images', [])):
+        uri = image_info.get('uri')
+        if not uri or uri.startswith('data:'):
+            continue
+        
+        source_path = os.path.join(base_dir, unquote(uri))
+        preview_name = f"{index}_{os.path.basename(unquote(uri))}"
+        preview_path = os.path.join(base_dir, PREVIEW_TEXTURE_DIR, preview_name)
+        
+        image = bpy.data.images.load(source_path, check_existing=False)
+        try:
+            width, height = image.size
+            scale = min(1.0, max_size / max(width, height, 1))
+            if scale < 1.0:
+                image.scale(max(1, round(width * scale)), max(1, round(height * scale)))
+            image.filepath_raw = preview_path
+            image.save()
+        finally:
+            bpy.data.images.remove(image)
+        
+        previews[index] = (quote(f"{PREVIEW_TEXTURE_DIR}/{preview_name}"), (width, height))
+    
+    return previews
+
+
+def write_progressive_manifest(gltf_path, gltf, previews):
+    """
+    Пишет <имя>.preview.gltf (те же геометрия и .bin, но превью текстур)
+    и <имя>.manifest.json с порядком загрузки для вьювера:
+    1. geometry - .preview.gltf и .bin
+    2. preview_textures - уменьшенные текстуры
+    3. textures - текстуры в полном разрешении (и полный .gltf)
+    Возвращает путь к манифесту.
+    """
+    base_dir = os.path.dirname(gltf_path)
+    stem = os.path.splitext(os.path.basename(gltf_path))[0]
+    
+    # .gltf с превью текстур
+    preview_gltf = json.loads(json.dumps(gltf))
+    for index, (preview_uri, _) in previews.items():
+        preview_gltf['images'][index]['uri'] = preview_uri
+    preview_gltf_name = f"{stem}.preview.gltf"
+    with open(os.path.join(base_dir, preview_gltf_name), 'w', encoding='utf-8') as f:
+        json.dump(preview_gltf, f, ensure_ascii=False, indent=2)
+    
+    def file_entry(uri):
+        path = os.path.join(base_dir, unquote(uri))
+        return {'uri': uri, 'bytes': os.path.getsize(path) if os.path.exists(path) else 0}
+    
+    buffer_uris = [buffer['uri'] for buffer in gltf.get('buffers', []) if 'uri' in buffer]
+    images = []
+    for index, image_info in enumerate(gltf.get('images', [])):
+        if index not in previews:
+            continue
+        preview_uri, (width, height) = previews[index]
+        images.append({
+            'index': index,
+            'name': image_info.get('name', ''),
+            'preview': preview_uri,
+            'full': image_info['uri'],
+            'width': width,
+            'height': height,
+        })
+    
+    stages = [
+        {'stage': 'geometry', 'files': [file_entry(quote(preview_gltf_name))] + [file_entry(uri) for uri in buffer_uris]},
+        {'stage': 'preview_textures', 'files': [file_entry(image['preview']) for image in images]},
+        {'stage': 'textures', 'files': [file_entry(quote(os.path.basename(gltf_path)))] + [file_entry(image['full']) for image in images]},
+    ]
+    for stage in stages:
+        stage['bytes'] = sum(entry['bytes'] for entry in stage['files'])
+    
+    manifest = {
+        'version': 1,
+        'preview_gltf': quote(preview_gltf_name),
+        'gltf': quote(os.path.basename(gltf_path)),
+        'load_order': stages,
+        'images': images,
+    }
+    manifest_path = os.path.join(base_dir, f"{stem}.manifest.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def print_report(level, message):
+    """Вывод итогов API вне оператора (аналог Operator.report): сообщение в консоль"""
+    prefix = "✗" if 'ERROR' in level else "⚠" if 'WARNING' in level else "✓"
+    print(f"{prefix} {message}")
+
+
+@contextmanager
+def material_batch():
+    """
+    Пакетная операция с материалами: внешний material_batch переключает в Object Mode
+    (материалы граней записываются только в нем), после выхода возвращает исходный режим
+    и удаляет временный шаблон материала. Вложенные material_batch ничего не переключают.
+    Шаг отмены создает вызывающий оператор с UNDO (кнопка панели, Run Script, консоль):
+    все изменения внутри него, включая переключения режима, - один шаг.
+    """
+    global _batch_depth
+    previous_mode = None
+    if _batch_depth == 0:
+        active_object = bpy.context.view_layer.objects.active
+        if bpy.context.mode != 'OBJECT' and active_object is not None:
+            previous_mode = active_object.mode
             bpy.ops.object.mode_set(mode='OBJECT')
+    _batch_depth += 1
+    try:
+        yield
+    finally:
+        _batch_depth -= 1
+        if _batch_depth == 0:
+            release_material_template()
+            if previous_mode is not None:
+                bpy.ops.object.mode_set(mode=previous_mode)
+
+
+def build_pbr_material(material_name, maps):
+    """Создает материал PBR набора: Base Color, Normal и упакованная ORM карта"""
+    base_image = None
+    normal_image = None
+    if 'basecolor' in maps:
+        base_image, _ = load_texture_image(maps['basecolor'], get_texture_hash(maps['basecolor']))
+    if 'normal' in maps:
+        normal_image, _ = load_texture_image(maps['normal'], get_texture_hash(maps['normal']))
+    
+    orm_image = None
+    if maps.keys() & {'ao', 'roughness', 'metallic'}:
+        orm_image, reused = pack_orm_image(
+            material_name, maps.get('ao'), maps.get('roughness'), maps.get('metallic'))
+        print(f"✓ ORM карта '{orm_image.name}' {'переиспользована' if reused else 'упакована'}")
+    
+    material = create_pbr_material(material_name, base_image, normal_image, orm_image)
+    map_names = ", ".join(f"{map_type}: {path.name}" for map_type, path in sorted(maps.items()))
+    print(f"✓ PBR материал '{material_name}' создан/обновлен ({map_names})")
+    return material
+
+
+def apply_folder_materials(objects, folder_path, folder_name="", material_mode='NODES',
+                           face_masks=None, report=print_report):
+    """
+    Создает материалы из папки и применяет их к объектам (вызывается в Object Mode).
+    material_mode: 'TEMPLATE', 'LINKED_TEMPLATE' или 'NODES' (см. MATERIAL_OT_apply_folder).
+    face_masks: {объект: маска выделенных граней} - этим объектам меняются только выделенные грани.
+    report(level, message) - вывод итога (оператор передает self.report).
+    Шаг отмены создает вызывающий оператор; для нескольких вызовов используйте material_batch.
+    Возвращает: {'materials': имена материалов, 'kind': 'multipl'/'single', 'objects': количество} или None
+    """
+    face_masks = face_masks or {}
+    folder_name = folder_name or os.path.basename(os.path.normpath(folder_path))
+    # Проверяем существование папки (папки внутри ZIP архивов есть только в каталоге)
+    if not os.path.exists(folder_path) and not get_texture_catalog().has_directory(folder_path):
+        report({'ERROR'}, f"Папка не найдена: {folder_path}")
+        return None
+    
+    # Получаем список файлов текстур
+    texture_files = get_texture_files(folder_path)
+    
+    if not texture_files:
+        report({'WARNING'}, f"Текстуры не найдены в: {folder_path}")
+        return None
+    
+    # PBR наборы (карты с суффиксами _basecolor, _normal ...) - один материал на набор
+    texture_sets = texture_catalog.group_pbr_sets(texture_files, name_of=lambda path: path.name)
+    
+    # Одинаковое содержимое под разными именами - один материал.
+    # Дубликаты отбрасываются до определения типа папки (два одинаковых файла - это single)
+    failed_textures = []
+    material_hashes_seen = {}  # Хеш содержимого -> имя файла
+    unique_sets = []
+    for texture_set in texture_sets:
+        if not texture_set['pbr']:
+            texture_file = texture_set['maps']['basecolor']
+            try:
+                content_hash = get_texture_hash(texture_file)
+            except OSError as e:
+                print(f"ОШИБКА при чтении файла '{texture_file.name}': {e}")
+                failed_textures.append((texture_file.name, str(e)))
+                continue
+            if content_hash in material_hashes_seen:
+                print(f"⚠ '{texture_file.name}' совпадает по содержимому с '{material_hashes_seen[content_hash]}', пропущен")
+                continue
+            material_hashes_seen[content_hash] = texture_file.name
+            texture_set['hash'] = content_hash
+        unique_sets.append(texture_set)
+    
+    # Определяем тип материалов (multipl если больше 1 материала, иначе single)
+    is_multipl = len(unique_sets) > 1
+    material_prefix = "" if is_multipl else SINGLE_MATERIAL_PREFIX
+    
+    materials_to_apply = []
+    material_names_seen = {}  # Для отслеживания дубликатов имен
+    reused_images = 0
+    reused_materials = 0
+    template = None
+    if material_mode != 'NODES':
+        template = get_material_template(link=material_mode == 'LINKED_TEMPLATE')
+    build_time = 0.0
+    
+    for texture_set in unique_sets:
+        if texture_set['pbr']:
+            start_time = time.perf_counter()
+            material_name = material_prefix + texture_set['name']
+            try:
+                material = build_pbr_material(material_name, texture_set['maps'])
+            except Exception as e:
+                print(f"ОШИБКА при создании PBR материала '{texture_set['name']}': {e}")
+                failed_textures.append((texture_set['name'], str(e)))
+                continue
+            build_time += time.perf_counter() - start_time
+            material_names_seen[material_name] = texture_set['name']
+            materials_to_apply.append(material_name)
+            continue
         
-        # Проверяем существование папки
-        if not os.path.exists(self.folder_path):
-            self.report({'ERROR'}, f"Папка не найдена: {self.folder_path}")
-            return {'CANCELLED'}
+        texture_file = texture_set['maps']['basecolor']
         
-        # Получаем список файлов текстур
-        texture_files = get_texture_files(self.folder_path)
+        # Имя материала берем из имени файла (без расширения)
+        base_material_name = texture_file.stem
         
-        if not texture_files:
-            self.report({'WARNING'}, f"Текстуры не найдены в: {self.folder_path}")
-            return {'CANCELLED'}
+        # Добавляем префикс для single материалов
+        material_name = material_prefix + base_material_name
         
-        # Определяем тип материалов (multipl если больше 1 текстуры, иначе single)
-        is_multipl = len(texture_files) > 1
-        material_prefix = "" if is_multipl else SINGLE_MATERIAL_PREFIX
+        # Проверяем, не является ли это материалом другого типа
+        if is_multipl and material_name.startswith(SINGLE_MATERIAL_PREFIX):
+            continue  # Пропускаем single материалы при применении multipl
+        if not is_multipl and not material_name.startswith(SINGLE_MATERIAL_PREFIX):
+            continue  # Пропускаем multipl материалы при применении single
         
-        materials_to_apply = []
-        failed_textures = []
-        material_names_seen = {}  # Для отслеживания дубликатов имен
+        # Материал с тем же содержимым уже есть (например, из другой папки) - переиспользуем
+        content_hash = texture_set['hash']
+        existing = find_material_by_hash(content_hash, single=not is_multipl)
+        if existing is not None:
+            reused_materials += 1
+            materials_to_apply.append(existing.name)
+            print(f"✓ '{texture_file.name}' совпадает по содержимому с материалом '{existing.name}', переиспользован")
+            continue
         
-        for texture_file in texture_files:
-            # Имя материала берем из имени файла (без расширения)
-            base_material_name = texture_file.stem
-            
-            # Добавляем префикс для single материалов
-            material_name = material_prefix + base_material_name
-            
-            # Проверяем, не является ли это материалом другого типа
-            if is_multipl and material_name.startswith(SINGLE_MATERIAL_PREFIX):
-                continue  # Пропускаем single материалы при применении multipl
-            if not is_multipl and not material_name.startswith(SINGLE_MATERIAL_PREFIX):
-                continue  # Пропускаем multipl материалы при применении single
-            
-            # Если материал с таким именем уже был обработан, добавляем расширение к имени
-            if material_name in material_names_seen:
-                # Уже есть материал с таким именем - добавляем расширение для уникальности
-                material_name = f"{material_prefix}{texture_file.stem}_{texture_file.suffix[1:]}"
-                print(f"⚠ Обнаружен дубликат имени. Материал переименован: '{base_material_name}' -> '{material_name}'")
-            else:
-                material_names_seen[material_name] = texture_file.name
-            
-            # Создаем или обновляем материал
-            if material_name not in bpy.data.materials:
-                material = bpy.data.materials.new(name=material_name)
-                material.use_nodes = True
-                
-                # Очищаем ноды
-                material.node_tree.nodes.clear()
+        # Если материал с таким именем уже был обработан, добавляем расширение к имени
+        if material_name in material_names_seen:
+            # Уже есть материал с таким именем - добавляем расширение для уникальности
+            material_name = f"{material_prefix}{texture_file.stem}_{texture_file.suffix[1:]}"
+            print(f"⚠ Обнаружен дубликат имени. Материал переименован: '{base_material_name}' -> '{material_name}'")
+        else:
+            material_names_seen[material_name] = texture_file.name
+        
+        # Загружаем изображение (или берем уже загруженное с тем же содержимым)
+        try:
+            image, reused = load_texture_image(texture_file, content_hash)
+            if reused:
+                reused_images += 1
+                print(f"✓ Изображение '{texture_file.name}' совпадает с уже загруженным '{image.name}'")
             else:
-                material = bpy.data.materials[material_name]
-                # Обновляем материал (пересоздаем ноды)
-                material.use_nodes = True
-                material.node_tree.nodes.clear()
-            
-            # Добавляем ноды
-            output_node = material.node_tree.nodes.new(type='ShaderNodeOutputMaterial')
-            bsdf_node = material.node_tree.nodes.new(type='ShaderNodeBsdfPrincipled')
-            tex_node = material.node_tree.nodes.new(type='ShaderNodeTexImage')
-            
-            # Загружаем изображение
-            try:
-                image = bpy.data.images.load(str(texture_file))
-                tex_node.image = image
                 print(f"✓ Изображение '{texture_file.name}' успешно загружено")
-            except Exception as e:
-                error_msg = f"ОШИБКА при загрузке изображения '{texture_file.name}': {e}"
-                print(error_msg)
-                failed_textures.append((texture_file.name, str(e)))
-                continue
-            
-            # Располагаем ноды
-            output_node.location = (300, 0)
-            bsdf_node.location = (0, 0)
-            tex_node.location = (-300, 0)
+        except Exception as e:
+            error_msg = f"ОШИБКА при загрузке изображения '{texture_file.name}': {e}"
+            print(error_msg)
+            failed_textures.append((texture_file.name, str(e)))
+            continue
+        
+        # Создаем или обновляем материал: копия шаблона или ноды с нуля
+        start_time = time.perf_counter()
+        if template is not None:
+            material = create_material_from_template(template, material_name, image)
+        else:
+            material = create_material_from_nodes(material_name, image)
+        build_time += time.perf_counter() - start_time
+        
+        material[TEXTURE_HASH_PROPERTY] = content_hash
+        materials_to_apply.append(material_name)
+        print(f"✓ Материал '{material_name}' создан/обновлен из '{texture_file.name}'")
+    
+    # Шаблон больше не нужен (внутри material_batch удаляется при выходе из пакета)
+    if template is not None and _batch_depth == 0:
+        release_material_template()
+    
+    # Выводим информацию о неудачных загрузках
+    if failed_textures:
+        print(f"\n⚠ Не удалось загрузить {len(failed_textures)} текстур:")
+        for name, error in failed_textures:
+            print(f"  - {name}: {error}")
+    
+    print(f"\nИтого успешно создано материалов: {len(materials_to_apply)}")
+    print(f"Переиспользовано уже загруженных изображений: {reused_images}")
+    print(f"Переиспользовано материалов с тем же содержимым: {reused_materials}")
+    print(f"Создание материалов ({material_mode}): {build_time:.3f} с")
+    print(f"Список материалов: {', '.join(materials_to_apply)}")
+    
+    if not materials_to_apply:
+        report(
+            {'ERROR'}, 
+            f"Не удалось создать материалы! Проверьте:\n"
+            f"1. Папка существует: {folder_path}\n"
+            f"2. В папке есть файлы текстур (png, jpg и т.д.)\n"
+            f"3. Файлы не повреждены"
+        )
+        return None
+    
+    # Применяем материалы к выделенным объектам
+    for obj in objects:
+        if obj in face_masks:
+            # Только выделенные грани: multipl - циклически, single - один материал
+            materials = [bpy.data.materials[name] for name in materials_to_apply if name in bpy.data.materials]
+            if not is_multipl:
+                materials = materials[:1]
+            changed = assign_materials_to_faces(obj, materials, face_masks[obj])
+            print(f"Материалы назначены {changed} выделенным граням объекта '{obj.name}' "
+                  f"(из {len(obj.data.polygons)})")
+            continue
+        
+        # Очищаем материалы другого типа (эта функция также очищает список)
+        cleanup_materials_from_other_types(obj, material_prefix)
+        
+        # Если multipl - добавляем все материалы, если single - только один
+        if is_multipl:
             
-            # Подключаем ноды
-            material.node_tree.links.new(tex_node.outputs['Color'], bsdf_node.inputs['Base Color'])
-            material.node_tree.links.new(bsdf_node.outputs['BSDF'], output_node.inputs['Surface'])
+            # Добавляем все материалы к объекту
+            applied_materials_count = 0
+            for material_name in materials_to_apply:
+                if material_name in bpy.data.materials:
+                    material = bpy.data.materials[material_name]
+                    obj.data.materials.append(material)
+                    applied_materials_count += 1
+                    print(f"Добавлен материал '{material_name}' к объекту '{obj.name}' (material slot {applied_materials_count - 1})")
             
-            materials_to_apply.append(material_name)
-            print(f"✓ Материал '{material_name}' создан/обновлен из '{texture_file.name}'")
-        
-        # Выводим информацию о неудачных загрузках
-        if failed_textures:
-            print(f"\n⚠ Не удалось загрузить {len(failed_textures)} текстур:")
-            for name, error in failed_textures:
-                print(f"  - {name}: {error}")
+            # Если есть грани, распределяем материалы равномерно
+            if obj.data.polygons and obj.data.materials:
+                num_polygons = len(obj.data.polygons)
+                num_materials = len(obj.data.materials)
+                
+                # Распределяем материалы по граням циклически
+                for i, poly in enumerate(obj.data.polygons):
+                    # Циклически распределяем материалы по граням
+                    material_index = i % num_materials
+                    poly.material_index = material_index
+                
+                print(f"Распределено {num_materials} материалов по {num_polygons} граням объекта '{obj.name}'")
+                
+                # Проверяем распределение материалов по граням
+                material_distribution = {}
+                for poly in obj.data.polygons:
+                    idx = poly.material_index
+                    material_distribution[idx] = material_distribution.get(idx, 0) + 1
+                print(f"Распределение материалов по граням: {material_distribution}")
+        else:
+            # Single - применяем только первый материал
+            # cleanup уже очистил материалы другого типа, теперь заменяем на новый single материал
+            if materials_to_apply and materials_to_apply[0] in bpy.data.materials:
+                material = bpy.data.materials[materials_to_apply[0]]
+                
+                # Если материала еще нет в списке, очищаем и добавляем
+                if not obj.data.materials or obj.data.materials[0] != material:
+                    obj.data.materials.clear()
+                    obj.data.materials.append(material)
+                
+                # Применяем материал ко всем граням
+                if obj.data.polygons:
+                    for poly in obj.data.polygons:
+                        poly.material_index = 0
+                
+                print(f"Применен single материал '{materials_to_apply[0]}' к объекту '{obj.name}'")
+            else:
+                print(f"ВНИМАНИЕ: Не удалось добавить single материал к объекту '{obj.name}'")
         
-        print(f"\nИтого успешно создано материалов: {len(materials_to_apply)}")
-        print(f"Список материалов: {', '.join(materials_to_apply)}")
+        # Проверяем финальное состояние материалов объекта
+        print(f"Материальные слоты объекта '{obj.name}': {len(obj.data.materials)}")
+        for idx, mat in enumerate(obj.data.materials):
+            print(f"  Slot [{idx}]: '{mat.name if mat else None}'")
+    
+    folder_type = "multipl" if is_multipl else "single"
+    report({'INFO'}, f"Применено {len(materials_to_apply)} материалов ({folder_type}) из '{folder_name}' к {len(objects)} объектам")
+    return {'materials': materials_to_apply, 'kind': folder_type, 'objects': len(objects)}
+
+
+def clear_object_materials(objects):
+    """
+    Удаляет все материалы у объектов (шаг отмены не создается).
+    Возвращает: количество объектов, у которых были материалы
+    """
+    cleared_count = 0
+    for obj in objects:
+        if obj.type == 'MESH' and obj.data.materials:
+            obj.data.materials.clear()
+            cleared_count += 1
+            print(f"Материалы очищены у объекта '{obj.name}'")
+    return cleared_count
+
+
+def apply_materials_batch(assignments, material_mode='NODES', report=print_report):
+    """
+    Применяет материалы нескольких папок к нескольким наборам объектов одной пакетной операцией
+    (см. material_batch).
+    assignments: [(объекты, путь к папке), ...] или [(объекты, путь к папке, параметры), ...],
+    где параметры - словарь аргументов apply_folder_materials для этого назначения
+    (folder_name, face_masks, material_mode), например:
+        [(objs, "/textures/wood", {'face_masks': {obj: mask}, 'folder_name': "Wood"})]
+    Возвращает: список результатов apply_folder_materials в том же порядке
+    """
+    results = []
+    with material_batch():
+        for objects, folder_path, *options in assignments:
+            kwargs = {'material_mode': material_mode, 'report': report}
+            if options:
+                kwargs.update(options[0])
+            results.append(apply_folder_materials(objects, folder_path, **kwargs))
+    return results
+
+
+class MATERIAL_OT_apply_folder(bpy.types.Operator):
+    """Применяет материалы из выбранной папки к выделенным объектам"""
+    bl_idname = "material.apply_folder"
+    bl_label = "Apply Folder Materials"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    folder_name: bpy.props.StringProperty()
+    folder_path: bpy.props.StringProperty()
+    
+    # Способ создания материалов (кнопки списка папок передают scene.material_mode)
+    material_mode: bpy.props.EnumProperty(
+        name="Material Mode",
+        description="Как создавать материалы",
+        items=MATERIAL_MODE_ITEMS,
+        default='NODES'
+    )
+    
+    def execute(self, context):
+        # Получаем выделенные объекты (с учетом Edit Mode)
+        selected_objects = get_selected_objects(context)
         
-        if not materials_to_apply:
+        if not selected_objects:
             self.report(
-                {'ERROR'}, 
-                f"Не удалось создать материалы! Проверьте:\n"
-                f"1. Папка существует: {self.folder_path}\n"
-                f"2. В папке есть файлы текстур (png, jpg и т.д.)\n"
-                f"3. Файлы не повреждены"
+                {'WARNING'}, 
+                "Необходимо выбрать хотя бы один объект типа MESH! Выделите объект в Object Mode или Edit Mode."
             )
             return {'CANCELLED'}
         
-        # Применяем материалы к выделенным объектам
-        for obj in selected_objects:
-            # Очищаем материалы другого типа (эта функция также очищает список)
-            cleanup_materials_from_other_types(obj, material_prefix)
-            
-            # Если multipl - добавляем все материалы, если single - только один
-            if is_multipl:
-                
-                # Добавляем все материалы к объекту
-                applied_materials_count = 0
-                for material_name in materials_to_apply:
-                    if material_name in bpy.data.materials:
-                        material = bpy.data.materials[material_name]
-                        obj.data.materials.append(material)
-                        applied_materials_count += 1
-                        print(f"Добавлен материал '{material_name}' к объекту '{obj.name}' (material slot {applied_materials_count - 1})")
-                
-                # Если есть грани, распределяем материалы равномерно
-                if obj.data.polygons and obj.data.materials:
-                    num_polygons = len(obj.data.polygons)
-                    num_materials = len(obj.data.materials)
-                    
-                    # Распределяем материалы по граням циклически
-                    for i, poly in enumerate(obj.data.polygons):
-                        # Циклически распределяем материалы по граням
-                        material_index = i % num_materials
-                        poly.material_index = material_index
-                    
-                    print(f"Распределено {num_materials} материалов по {num_polygons} граням объекта '{obj.name}'")
-                    
-                    # Проверяем распределение материалов по граням
-                    material_distribution = {}
-                    for poly in obj.data.polygons:
-                        idx = poly.material_index
-                        material_distribution[idx] = material_distribution.get(idx, 0) + 1
-                    print(f"Распределение материалов по граням: {material_distribution}")
-            else:
-                # Single - применяем только первый материал
-                # cleanup уже очистил материалы другого типа, теперь заменяем на новый single материал
-                if materials_to_apply and materials_to_apply[0] in bpy.data.materials:
-                    material = bpy.data.materials[materials_to_apply[0]]
-                    
-                    # Если материала еще нет в списке, очищаем и добавляем
-                    if not obj.data.materials or obj.data.materials[0] != material:
-                        obj.data.materials.clear()
-                        obj.data.materials.append(material)
-                    
-                    # Применяем материал ко всем граням
-                    if obj.data.polygons:
-                        for poly in obj.data.polygons:
-                            poly.material_index = 0
-                    
-                    print(f"Применен single материал '{materials_to_apply[0]}' к объекту '{obj.name}'")
-                else:
-                    print(f"ВНИМАНИЕ: Не удалось добавить single материал к объекту '{obj.name}'")
-            
-            # Проверяем финальное состояние материалов объекта
-            print(f"Материальные слоты объекта '{obj.name}': {len(obj.data.materials)}")
-            for idx, mat in enumerate(obj.data.materials):
-                print(f"  Slot [{idx}]: '{mat.name if mat else None}'")
+        # В Edit Mode с выделенными гранями материалы назначаются только им
+        face_masks = {}
+        if context.mode == 'EDIT_MESH':
+            for obj in selected_objects:
+                face_mask = get_selected_face_mask(obj)
+                if face_mask is not None:
+                    face_masks[obj] = face_mask
         
-        folder_type = "multipl" if is_multipl else "single"
-        self.report({'INFO'}, f"Применено {len(materials_to_apply)} материалов ({folder_type}) из '{self.folder_name}' к {len(selected_objects)} объектам")
-        return {'FINISHED'}
+        # material_batch переключает в Object Mode (массивы граней пишутся только в нем) и обратно
+        with material_batch():
+            result = apply_folder_materials(selected_objects, self.folder_path, self.folder_name,
+                                            self.material_mode, face_masks, report=self.report)
+        return {'FINISHED'} if result else {'CANCELLED'}
 
 
 class MATERIAL_OT_export_glb(bpy.types.Operator):
@@ -340,6 +1792,168 @@ class MATERIAL_OT_export_glb(bpy.types.Operator):
         subtype='FILE_PATH'
     )
     
+    # Оптимизация анимаций после экспорта (glb_optimize.py)
+    optimize_animations: bpy.props.BoolProperty(
+        name="Optimize Animations",
+        description="Удалить ключи, восстанавливаемые интерполяцией, и постоянные каналы анимации",
+        default=False
+    )
+    
+    animation_tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        description="Допустимая ошибка переводов/масштаба при прореживании ключей",
+        default=0.0001,
+        min=0.0,
+        precision=5
+    )
+    
+    animation_rotation_tolerance: bpy.props.FloatProperty(
+        name="Rotation Tolerance",
+        description="Допустимая ошибка вращений при прореживании ключей",
+        default=math.radians(0.05),
+        min=0.0,
+        subtype='ANGLE'
+    )
+    
+    quantize_animations: bpy.props.BoolProperty(
+        name="Quantize Animations",
+        description="Квантовать вращения (SHORT) и округлять переводы",
+        default=False
+    )
+    
+    deduplicate_images: bpy.props.BoolProperty(
+        name="Deduplicate Images",
+        description="Встраивать каждое уникальное по содержимому изображение один раз",
+        default=True
+    )
+    
+    # Раскладка файлов экспорта
+    export_layout: bpy.props.EnumProperty(
+        name="Layout",
+        description="Формат файлов экспорта",
+        items=[
+            ('GLB', "GLB", "Один GLB файл со встроенными текстурами"),
+            ('PROGRESSIVE', "glTF (progressive)",
+             ".gltf + .bin + отдельные текстуры, превью текстур и манифест порядка загрузки"),
+        ],
+        default='GLB'
+    )
+    
+    # Чем записывать GLB
+    export_writer: bpy.props.EnumProperty(
+        name="Writer",
+        description="Экспортер GLB",
+        items=[
+            ('BLENDER', "Blender glTF", "Встроенный экспортер glTF (все возможности)"),
+            ('STREAMING', "Streaming",
+             "Потоковая запись статических мешей, материалов и изображений: "
+             "в памяти данные одного объекта (без анимаций, скиннинга и shape keys)"),
+        ],
+        default='BLENDER'
+    )
+    
+    preview_texture_size: bpy.props.IntProperty(
+        name="Preview Size",
+        description="Максимальный размер превью текстур (пикселей по длинной стороне)",
+        default=PREVIEW_TEXTURE_SIZE,
+        min=16,
+        max=2048
+    )
+    
+    optimize_vertex_cache: bpy.props.BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Переупорядочить треугольники и вершины под кеш вершин GPU (отчет ACMR до/после)",
+        default=False
+    )
+    
+    # Морф-таргеты (shape keys) после экспорта
+    optimize_morphs: bpy.props.BoolProperty(
+        name="Optimize Morph Targets",
+        description="Хранить только ненулевые дельты shape keys (sparse) и удалить таргеты без смещений",
+        default=False
+    )
+    
+    quantize_morphs: bpy.props.BoolProperty(
+        name="Quantize Morph Targets",
+        description="Квантовать дельты shape keys в SHORT/BYTE (KHR_mesh_quantization)",
+        default=False
+    )
+    
+    # Сжатые для GPU текстуры (KTX2 / Basis Universal, нужен toktx из KTX-Software)
+    compress_textures_ktx2: bpy.props.BoolProperty(
+        name="KTX2 Textures",
+        description="Сжать текстуры в KTX2 (KHR_texture_basisu): ETC1S для цвета, UASTC для нормалей, "
+                    "с мип-уровнями. Нужен toktx в PATH",
+        default=False
+    )
+    
+    ktx2_keep_fallback: bpy.props.BoolProperty(
+        name="Keep PNG/JPEG Fallback",
+        description="Оставить исходные изображения для просмотрщиков без поддержки KHR_texture_basisu",
+        default=False
+    )
+    
+    # Очистка геометрии на временных копиях мешей перед экспортом
+    cleanup_meshes: bpy.props.BoolProperty(
+        name="Cleanup Meshes",
+        description="Объединить дубликаты вершин, удалить вырожденные грани и свободную геометрию, триангулировать",
+        default=False
+    )
+    
+    merge_distance: bpy.props.FloatProperty(
+        name="Merge Distance",
+        description="Расстояние для объединения вершин и удаления вырожденной геометрии",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE'
+    )
+    
+    # Общие меши для одинаковой геометрии
+    instance_meshes: bpy.props.BoolProperty(
+        name="Instance Duplicates",
+        description="Связать объекты с одинаковой геометрией с одним мешем (GLB хранит ее один раз)",
+        default=False
+    )
+    
+    instance_transformed: bpy.props.BoolProperty(
+        name="Match Transformed",
+        description="Находить и меши, совпадающие с точностью до поворота, масштаба и переноса",
+        default=True
+    )
+    
+    # Сжатие слотов материалов и удаление неподключенных изображений
+    compact_materials: bpy.props.BoolProperty(
+        name="Compact Materials",
+        description="Удалить слоты материалов без граней, объединить слоты с одинаковым материалом "
+                    "и не экспортировать изображения, не подключенные к выходу материала",
+        default=False
+    )
+    
+    # Профиль атрибутов вершин (удаление лишних атрибутов на временных копиях мешей)
+    attribute_profile: bpy.props.EnumProperty(
+        name="Attributes",
+        description="Какие атрибуты вершин экспортировать",
+        items=[
+            ('ALL', "All", "Экспортировать все атрибуты"),
+            ('WEB', "Web", "Позиция, нормаль, UV0, shape keys"),
+            ('WEB_STATIC', "Web (static)", "Позиция, нормаль, UV0"),
+            ('WEB_COLOR', "Web + Color", "Позиция, нормаль, UV0, цвет вершин, shape keys"),
+            ('UNLIT', "Unlit", "Позиция, UV0"),
+        ],
+        default='ALL'
+    )
+    
+    # Бюджет памяти декодированных текстур (0 - без ограничения)
+    texture_budget_mb: bpy.props.FloatProperty(
+        name="Texture Budget (MB)",
+        description="Максимум памяти декодированных текстур с мип-уровнями (RGBA8). "
+                    "Крупные и менее заметные текстуры уменьшаются на временных копиях. 0 - без ограничения",
+        default=0.0,
+        min=0.0,
+        soft_max=1024.0
+    )
+    
     def invoke(self, context, event):
         # Убеждаемся, что папка для экспорта существует
         if not os.path.exists(EXPORT_DIR):
@@ -352,6 +1966,157 @@ class MATERIAL_OT_export_glb(bpy.types.Operator):
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
     
+    def needs_mesh_copies(self):
+        """Нужны ли временные копии мешей (включена хотя бы одна подготовка геометрии)"""
+        return (self.cleanup_meshes or self.compact_materials
+                or ATTRIBUTE_PROFILES[self.attribute_profile] is not None)
+    
+    def run_prepasses(self, export_meshes):
+        """
+        Подготавливает временные копии мешей к экспорту. export_meshes: {копия меша: [объекты]}
+        Возвращает текст для отчета.
+        """
+        info = ""
+        if self.cleanup_meshes:
+            start_time = time.perf_counter()
+            print(f"\n[Экспорт] Очистка геометрии ({len(export_meshes)} мешей):")
+            for mesh, objects in export_meshes.items():
+                removed = cleanup_mesh_geometry(mesh, self.merge_distance)
+                object_names = ", ".join(obj.name for obj in objects)
+                print(f"  - '{object_names}': удалено вершин {removed['verts']}, ребер {removed['edges']}, "
+                      f"граней {removed['faces']}; треугольников: {removed['triangles']}")
+            elapsed = time.perf_counter() - start_time
+            print(f"[Экспорт] Очистка геометрии заняла {elapsed:.3f} с")
+            info += f", очистка геометрии: {elapsed:.2f} с"
+        
+        if self.compact_materials:
+            slots_before = 0
+            slots_after = 0
+            for mesh, objects in export_meshes.items():
+                # Слоты, привязанные к объекту (link='OBJECT'), не трогаем
+                if any(slot.link == 'OBJECT' for obj in objects for slot in obj.material_slots):
+                    continue
+                before, after = compact_material_slots(mesh)
+                slots_before += before
+                slots_after += after
+            print(f"\n[Экспорт] Слоты материалов: {slots_before} -> {slots_after}")
+            info += f", слотов материалов: {slots_before} -> {slots_after}"
+        
+        keep = ATTRIBUTE_PROFILES[self.attribute_profile]
+        if keep is not None:
+            saved_total = {}
+            for mesh, objects in export_meshes.items():
+                for attribute, saved in prune_mesh_attributes(mesh, objects, keep).items():
+                    saved_total[attribute] = saved_total.get(attribute, 0) + saved
+            print(f"\n[Экспорт] Профиль атрибутов {self.attribute_profile}: POSITION, {', '.join(sorted(keep))}")
+            for attribute, saved in sorted(saved_total.items(), key=lambda item: -item[1]):
+                print(f"  - {attribute}: ~{saved} байт")
+            info += f", атрибуты: ~{sum(saved_total.values())} байт"
+        return info
+    
+    def apply_attribute_profile(self, export_params, objects):
+        """Параметры экспортера для профиля атрибутов (нормали, тангенсы, цвета, произвольные атрибуты)"""
+        keep = ATTRIBUTE_PROFILES[self.attribute_profile]
+        if keep is None:
+            # Поведение экспортера по умолчанию: цвета, используемые материалами
+            export_params['export_vertex_color'] = 'MATERIAL'
+            return
+        export_params['export_normals'] = 'NORMAL' in keep
+        # COLOR_0 - активный цветовой атрибут (prune_mesh_attributes делает активным оставленный),
+        # независимо от того, использует ли его материал
+        export_params['export_vertex_color'] = 'ACTIVE' if 'COLOR_0' in keep else 'NONE'
+        # Тангенсы нужны только для карт нормалей
+        export_params['export_tangents'] = 'NORMAL' in keep and materials_use_normal_map(objects)
+        export_params['export_attributes'] = False
+        if export_params['export_tangents']:
+            print("[Экспорт] Найдена карта нормалей - тангенсы экспортируются")
+    
+    def get_output_path(self):
+        """Путь основного файла экспорта (.glb или .gltf в зависимости от раскладки)"""
+        if self.export_layout == 'PROGRESSIVE':
+            return os.path.splitext(self.filepath)[0] + ".gltf"
+        return self.filepath
+    
+    def post_process_export(self):
+        """
+        Оптимизирует экспортированный файл (glb_optimize.py) и, для прогрессивной раскладки,
+        создает превью текстур и манифест порядка загрузки.
+        Ошибка обработки не отменяет экспорт: остается неоптимизированный файл и предупреждение.
+        Возвращает текст для отчета (пустая строка, если ничего не выполнялось).
+        """
+        info = ""
+        output_path = self.get_output_path()
+        compress_textures = self.compress_textures_ktx2 and self.export_layout == 'GLB'
+        if self.compress_textures_ktx2 and not compress_textures:
+            # Превью прогрессивной раскладки строятся из PNG/JPEG
+            print("⚠ KTX2 текстуры поддерживаются только для раскладки GLB")
+        try:
+            if self.optimize_animations or self.optimize_vertex_cache or self.optimize_morphs or compress_textures:
+                info += self.optimize_exported_file(output_path, compress_textures)
+            
+            if self.export_layout == 'PROGRESSIVE':
+                gltf, _ = glb_optimize.read_gltf(output_path)
+                previews = create_preview_images(output_path, gltf, self.preview_texture_size)
+                manifest_path = write_progressive_manifest(output_path, gltf, previews)
+                print(f"[Экспорт] Превью текстур: {len(previews)}, манифест: {manifest_path}")
+                info += f", превью текстур: {len(previews)}"
+        except Exception as e:
+            message = f"Пост-обработка не выполнена ({e}), сохранен неоптимизированный файл: {output_path}"
+            print(f"⚠ {message}")
+            self.report({'WARNING'}, message)
+            return ", без пост-обработки"
+        
+        return info
+    
+    def optimize_exported_file(self, output_path, compress_textures=False):
+        """Применяет включенные оптимизации glb_optimize.py к экспортированному файлу"""
+        gltf, bin_data = glb_optimize.read_gltf(output_path)
+        size_before = glb_optimize.gltf_file_size(output_path)
+        
+        if self.optimize_animations:
+            bin_data, report = glb_optimize.optimize_animations(
+                gltf, bin_data,
+                tolerance=self.animation_tolerance,
+                rotation_tolerance=self.animation_rotation_tolerance,
+                quantize=self.quantize_animations,
+            )
+            print(f"\n[Экспорт] Оптимизация анимаций ({len(report)} клипов):")
+            for line in glb_optimize.format_animation_report(report):
+                print(line)
+        
+        if self.optimize_vertex_cache:
+            bin_data, report = glb_optimize.optimize_vertex_cache(gltf, bin_data)
+            print(f"\n[Экспорт] Оптимизация под кеш вершин ({len(report)} примитивов):")
+            for line in glb_optimize.format_vertex_cache_report(report):
+                print(line)
+        
+        # После кеша вершин: перестановка вершин записывает таргеты плотными массивами
+        if self.optimize_morphs:
+            bin_data, report = glb_optimize.optimize_morph_targets(gltf, bin_data, quantize=self.quantize_morphs)
+            print(f"\n[Экспорт] Оптимизация морф-таргетов ({len(report)} таргетов):")
+            for line in glb_optimize.format_morph_report(report):
+                print(line)
+        
+        info = ""
+        if compress_textures:
+            try:
+                bin_data, report = glb_optimize.encode_basisu_textures(
+                    gltf, bin_data, os.path.dirname(output_path), keep_fallback=self.ktx2_keep_fallback)
+                print(f"\n[Экспорт] Текстуры KTX2 ({len(report)} изображений):")
+                for line in glb_optimize.format_basisu_report(report):
+                    print(line)
+                mb = 1024 * 1024
+                gpu_before = sum(item['gpu_before'] for item in report) / mb
+                gpu_after = sum(item['gpu_after'] for item in report) / mb
+                info += f", GPU текстур: {gpu_before:.1f} -> {gpu_after:.1f} МБ"
+            except FileNotFoundError as e:
+                print(f"⚠ {e}")
+                self.report({'WARNING'}, f"Текстуры не сжаты: {e}")
+        
+        size_after = glb_optimize.write_gltf(output_path, gltf, bin_data)
+        print(f"[Экспорт] Размер: {size_before} -> {size_after} байт")
+        return f", оптимизация: {size_before} -> {size_after} байт{info}"
+    
     def execute(self, context):
         # Получаем выделенные объекты (с учетом Edit Mode)
         selected_objects = get_selected_objects(context)
@@ -410,26 +2175,93 @@ class MATERIAL_OT_export_glb(bpy.types.Operator):
         # Для Blender 4.5.3 используем актуальный API экспорта
         # Параметр use_selection должен экспортировать только материалы выбранных объектов
         export_params = {
-            'filepath': self.filepath,
+            'filepath': self.get_output_path(),
             'export_format': 'GLB',
             'use_selection': True,
             'export_materials': 'EXPORT',  # Экспортировать материалы
         }
         
-        # Пробуем экспортировать
+        if self.export_layout == 'PROGRESSIVE':
+            # Геометрия в .bin, текстуры отдельными файлами - можно загружать по частям
+            export_params['export_format'] = 'GLTF_SEPARATE'
+            export_params['export_texture_dir'] = EXPORT_TEXTURE_DIR
+        
+        # Подготовка геометрии выполняется на временных копиях мешей (оригиналы в .blend не меняются)
+        objects_to_copy = selected_objects if self.needs_mesh_copies() else []
+        objects_to_dedup = selected_objects if self.deduplicate_images else []
+        with temporary_export_meshes(objects_to_copy) as export_meshes, \
+                temporary_image_dedup(objects_to_dedup) as dedup_report, \
+                temporary_unreachable_image_strip(selected_objects if self.compact_materials else []) as strip_report, \
+                temporary_texture_budget(selected_objects, self.texture_budget_mb) as budget_report:
+            prepass_info = self.run_prepasses(export_meshes)
+            self.apply_attribute_profile(export_params, selected_objects)
+            if dedup_report['duplicates']:
+                print(f"\n[Экспорт] Дубликаты изображений: {dedup_report['duplicates']}, "
+                      f"сэкономлено {dedup_report['bytes_saved']} байт")
+                prepass_info += f", дубликатов изображений: {dedup_report['duplicates']}"
+            if strip_report['images']:
+                print(f"\n[Экспорт] Неподключенные изображения не экспортируются: {strip_report['images']}, "
+                      f"{strip_report['bytes']} байт")
+                prepass_info += f", неподключенных изображений: {strip_report['images']}"
+            if self.texture_budget_mb > 0:
+                prepass_info += self.format_budget_report(budget_report)
+            
+            # Поиск одинаковых мешей - после подготовки геометрии (сравниваются экспортируемые меши)
+            objects_to_instance = selected_objects if self.instance_meshes else []
+            start_time = time.perf_counter()
+            with temporary_mesh_instancing(objects_to_instance, self.instance_transformed) as instance_report:
+                if self.instance_meshes:
+                    print(f"\n[Экспорт] Одинаковые меши: объединено {instance_report['merged']}, "
+                          f"сэкономлено ~{instance_report['bytes_saved']} байт "
+                          f"({time.perf_counter() - start_time:.3f} с)")
+                    prepass_info += f", объединено мешей: {instance_report['merged']}"
+                return self.run_export(export_params, selected_objects, used_materials, prepass_info)
+    
+    def format_budget_report(self, budget_report):
+        """Печатает отчет бюджета памяти текстур и возвращает текст для отчета"""
+        mb = 1024 * 1024
+        print(f"\n[Экспорт] Память текстур: {budget_report['before'] / mb:.1f} -> "
+              f"{budget_report['after'] / mb:.1f} МБ (бюджет {self.texture_budget_mb:.1f} МБ)")
+        for name, old_size, new_size in budget_report['reduced']:
+            print(f"  - '{name}': {old_size[0]}x{old_size[1]} -> {new_size[0]}x{new_size[1]}")
+        if not budget_report['met']:
+            print(f"⚠ Бюджет не выполнен: текстуры уже уменьшены до {MIN_BUDGET_TEXTURE_SIZE} пикселей")
+            self.report({'WARNING'}, f"Бюджет текстур не выполнен: {budget_report['after'] / mb:.1f} МБ")
+        return f", текстур уменьшено: {len(budget_report['reduced'])} ({budget_report['after'] / mb:.1f} МБ)"
+    
+    def run_streaming_export(self, context, selected_objects, used_materials, prepass_info=""):
+        """Экспорт потоковой записью (glb_stream_export.py) и оптимизация GLB"""
+        start_time = time.perf_counter()
+        try:
+            result = glb_stream_export.export_glb(self.filepath, selected_objects, context.evaluated_depsgraph_get())
+        except Exception as e:
+            self.report({'ERROR'}, f"Ошибка потокового экспорта: {e}")
+            print(f"✗ Ошибка потокового экспорта: {e}")
+            return {'CANCELLED'}
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"\n✓ Потоковый экспорт успешен ({elapsed:.2f} с)")
+        print(f"✓ Узлов: {result['objects']}, мешей: {result['meshes']}, изображений: {result['images']}, "
+              f"размер: {result['size']} байт")
+        
+        post_process_info = self.post_process_export()
+        
+        self.report({'INFO'}, f"Экспортировано {result['objects']} объектов, {len(used_materials)} материалов: {self.filepath}{prepass_info}{post_process_info}")
+        return {'FINISHED'}
+    
+    def run_export(self, export_params, selected_objects, used_materials, prepass_info=""):
+        """Запускает экспорт glTF (с запасным набором параметров) и оптимизацию GLB"""
+        if self.export_writer == 'STREAMING':
+            if self.export_layout == 'GLB':
+                return self.run_streaming_export(bpy.context, selected_objects, used_materials, prepass_info)
+            print("⚠ Потоковая запись поддерживает только GLB - используется экспортер Blender")
+        
+        # Пробуем экспортировать. В try только вызов экспортера: ошибка пост-обработки
+        # не должна запускать повторный экспорт с запасными параметрами
         try:
             # В Blender 4.5.3 параметры экспорта могут отличаться
             bpy.ops.export_scene.gltf(**export_params)
-            
-            # Восстанавливаем флаги материалов (если были изменены)
-            # На самом деле, мы не изменяли их, так что ничего не нужно восстанавливать
-            
             print(f"\n✓ Экспорт успешен")
-            print(f"✓ Экспортировано {len(selected_objects)} объектов")
-            print(f"✓ Экспортировано {len(used_materials)} материалов")
-            
-            self.report({'INFO'}, f"Экспортировано {len(selected_objects)} объектов, {len(used_materials)} материалов: {self.filepath}")
-            return {'FINISHED'}
         except TypeError as e:
             # Пробуем без use_selection или с другими параметрами
             try:
@@ -437,15 +2269,11 @@ class MATERIAL_OT_export_glb(bpy.types.Operator):
                 export_params.pop('use_selection', None)
                 if 'export_materials' in export_params:
                     export_params.pop('export_materials')
+                for key in ('export_normals', 'export_tangents', 'export_attributes', 'export_vertex_color'):
+                    export_params.pop(key, None)
                 
                 bpy.ops.export_scene.gltf(**export_params)
-                
                 print(f"\n✓ Экспорт успешен (с альтернативными параметрами)")
-                print(f"✓ Экспортировано {len(selected_objects)} объектов")
-                print(f"✓ Экспортировано {len(used_materials)} материалов")
-                
-                self.report({'INFO'}, f"Экспортировано {len(selected_objects)} объектов, {len(used_materials)} материалов: {self.filepath}")
-                return {'FINISHED'}
             except Exception as e2:
                 self.report({'ERROR'}, f"Не удалось экспортировать GLB. Ошибка: {e2}")
                 print(f"✗ Ошибка экспорта: {e2}")
@@ -454,6 +2282,208 @@ class MATERIAL_OT_export_glb(bpy.types.Operator):
             self.report({'ERROR'}, f"Ошибка экспорта: {e}")
             print(f"✗ Ошибка экспорта: {e}")
             return {'CANCELLED'}
+        
+        print(f"✓ Экспортировано {len(selected_objects)} объектов")
+        print(f"✓ Экспортировано {len(used_materials)} материалов")
+        
+        post_process_info = self.post_process_export()
+        
+        self.report({'INFO'}, f"Экспортировано {len(selected_objects)} объектов, {len(used_materials)} материалов: {self.get_output_path()}{prepass_info}{post_process_info}")
+        return {'FINISHED'}
+
+
+class MATERIAL_OT_export_variants(bpy.types.Operator):
+    """Экспортирует выделенные объекты в отдельный GLB для каждой отмеченной папки текстур"""
+    bl_idname = "material.export_variants"
+    bl_label = "Export Variants"
+    
+    directory: bpy.props.StringProperty(
+        name="Directory",
+        description="Папка для GLB вариантов и индекса variants.json",
+        default=EXPORT_DIR,
+        subtype='DIR_PATH'
+    )
+    
+    base_name: bpy.props.StringProperty(
+        name="Base Name",
+        description="Префикс имен файлов: <префикс>_<папка>.glb",
+        default="variant"
+    )
+    
+    jobs: bpy.props.IntProperty(
+        name="Parallel Jobs",
+        description="Количество одновременно работающих фоновых процессов Blender",
+        default=max((os.cpu_count() or 2) // 2, 1),
+        min=1,
+        max=64
+    )
+    
+    # Параметры, передаваемые в material.export_glb каждого варианта
+    cleanup_meshes: bpy.props.BoolProperty(
+        name="Cleanup Meshes",
+        description="Очистить геометрию (один раз для всех вариантов)",
+        default=False
+    )
+    
+    merge_distance: bpy.props.FloatProperty(
+        name="Merge Distance",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE'
+    )
+    
+    optimize_animations: bpy.props.BoolProperty(name="Optimize Animations", default=False)
+    optimize_vertex_cache: bpy.props.BoolProperty(name="Optimize Vertex Cache", default=False)
+    texture_budget_mb: bpy.props.FloatProperty(name="Texture Budget (MB)", default=0.0, min=0.0)
+    
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def get_variant_path(self, folder_name):
+        """Путь GLB варианта: имя папки без разделителей и недопустимых символов"""
+        safe_name = re.sub(r'[^\w\-.]+', '_', folder_name).strip('_') or "folder"
+        return os.path.join(bpy.path.abspath(self.directory), f"{self.base_name}_{safe_name}.glb")
+    
+    def prepare_blend(self, work_dir, selected_objects, armatures):
+        """
+        Подготавливает геометрию один раз для всех вариантов: очистка на временных копиях
+        и запись объектов в отдельный .blend для фоновых процессов.
+        """
+        blend_path = os.path.join(work_dir, "prepared.blend")
+        objects_to_copy = selected_objects if self.cleanup_meshes else []
+        with temporary_export_meshes(objects_to_copy) as export_meshes:
+            for mesh in export_meshes:
+                cleanup_mesh_geometry(mesh, self.merge_distance)
+            bpy.data.libraries.write(blend_path, set(selected_objects) | set(armatures), fake_user=True)
+        return blend_path
+    
+    def execute(self, context):
+        selected_objects = get_selected_objects(context)
+        if not selected_objects:
+            self.report({'WARNING'}, "Необходимо выбрать хотя бы один объект типа MESH!")
+            return {'CANCELLED'}
+        
+        folders = [item for item in context.scene.material_folders if item.export_selected]
+        if not folders:
+            self.report({'WARNING'}, "Отметьте папки текстур для экспорта вариантов в списке")
+            return {'CANCELLED'}
+        
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        
+        output_dir = bpy.path.abspath(self.directory)
+        os.makedirs(output_dir, exist_ok=True)
+        armatures = get_armature_objects(selected_objects)
+        work_dir = tempfile.mkdtemp(prefix="material_variants_")
+        start_time = time.perf_counter()
+        
+        try:
+            try:
+                blend_path = self.prepare_blend(work_dir, selected_objects, armatures)
+            except (OSError, RuntimeError) as e:
+                self.report({'ERROR'}, f"Не удалось подготовить геометрию для вариантов: {e}")
+                return {'CANCELLED'}
+            print(f"\n[Варианты] Геометрия подготовлена: {blend_path} ({time.perf_counter() - start_time:.2f} с)")
+            
+            export_options = {
+                'optimize_animations': self.optimize_animations,
+                'optimize_vertex_cache': self.optimize_vertex_cache,
+                'texture_budget_mb': self.texture_budget_mb,
+            }
+            pending = []
+            for index, item in enumerate(folders):
+                job_path = os.path.join(work_dir, f"job_{index}.json")
+                job = {
+                    'objects': [obj.name for obj in selected_objects],
+                    'armatures': [arm.name for arm in armatures],
+                    'folder_name': item.name,
+                    'folder_path': item.path,
+                    'output': self.get_variant_path(item.name),
+                    'export_options': export_options,
+                }
+                with open(job_path, 'w', encoding='utf-8') as f:
+                    json.dump(job, f, ensure_ascii=False)
+                pending.append((item.name, job['output'], job_path, os.path.join(work_dir, f"job_{index}.log")))
+            
+            results = self.run_workers(context, blend_path, pending)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        # Индекс вариантов
+        variants = []
+        for folder_name, output_path, ok in results:
+            if ok:
+                variants.append({
+                    'folder': folder_name,
+                    'file': os.path.basename(output_path),
+                    'size': os.path.getsize(output_path),
+                })
+        index_path = os.path.join(output_dir, VARIANTS_INDEX_NAME)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'objects': [obj.name for obj in selected_objects],
+                'variants': variants,
+            }, f, ensure_ascii=False, indent=2)
+        
+        elapsed = time.perf_counter() - start_time
+        failed = len(results) - len(variants)
+        print(f"[Варианты] Экспортировано {len(variants)} из {len(results)} за {elapsed:.2f} с, индекс: {index_path}")
+        if failed:
+            self.report({'WARNING'}, f"Экспортировано вариантов: {len(variants)}, с ошибками: {failed} (см. консоль)")
+        else:
+            self.report({'INFO'}, f"Экспортировано вариантов: {len(variants)} за {elapsed:.1f} с: {index_path}")
+        return {'FINISHED'}
+    
+    def run_workers(self, context, blend_path, pending):
+        """
+        Запускает фоновые процессы Blender (не больше self.jobs одновременно) и ждет их завершения.
+        pending: [(имя папки, путь GLB, путь job.json, путь лога), ...]
+        Возвращает: [(имя папки, путь GLB, успешно), ...]
+        """
+        pending = list(pending)
+        running = []  # (процесс, лог, имя папки, путь GLB, путь лога)
+        results = []
+        total = len(pending)
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, total)
+        try:
+            while pending or running:
+                while pending and len(running) < self.jobs:
+                    folder_name, output_path, job_path, log_path = pending.pop(0)
+                    log_file = open(log_path, 'w', encoding='utf-8')
+                    process = subprocess.Popen(
+                        [bpy.app.binary_path, '--background', '--factory-startup', blend_path,
+                         '--python-exit-code', '1', '--python', BATCH_WORKER_SCRIPT, '--', job_path],
+                        stdout=log_file, stderr=subprocess.STDOUT
+                    )
+                    running.append((process, log_file, folder_name, output_path, log_path))
+                
+                time.sleep(0.1)
+                for entry in list(running):
+                    process, log_file, folder_name, output_path, log_path = entry
+                    if process.poll() is None:
+                        continue
+                    running.remove(entry)
+                    log_file.close()
+                    ok = process.returncode == 0 and os.path.exists(output_path)
+                    results.append((folder_name, output_path, ok))
+                    window_manager.progress_update(len(results))
+                    if ok:
+                        print(f"  ✓ {folder_name} -> {os.path.basename(output_path)} ({os.path.getsize(output_path)} байт)")
+                    else:
+                        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                            log_tail = f.read()[-2000:]
+                        print(f"  ✗ {folder_name}: код {process.returncode}\n{log_tail}")
+        finally:
+            for process, log_file, *_ in running:
+                process.kill()
+                log_file.close()
+            window_manager.progress_end()
+        
+        results.sort(key=lambda result: result[0].lower())
+        return results
 
 
 class MATERIAL_OT_clear_materials(bpy.types.Operator):
@@ -473,18 +2503,196 @@ class MATERIAL_OT_clear_materials(bpy.types.Operator):
             )
             return {'CANCELLED'}
         
-        # Переключаемся в Object Mode
+        # material_batch переключает в Object Mode
+        with material_batch():
+            cleared_count = clear_object_materials(selected_objects)
+        
+        self.report({'INFO'}, f"Материалы удалены у {cleared_count} объектов")
+        return {'FINISHED'}
+
+
+class MATERIAL_OT_cleanup_skinning(bpy.types.Operator):
+    """Очищает скиннинг выделенных объектов перед экспортом: ограничивает влияния костей и удаляет лишние кости"""
+    bl_idname = "material.cleanup_skinning"
+    bl_label = "Cleanup Skinning"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    max_influences: bpy.props.IntProperty(
+        name="Max Influences",
+        description="Максимальное количество костей, влияющих на одну вершину",
+        default=MAX_BONE_INFLUENCES,
+        min=1,
+        max=8
+    )
+    
+    prune_bones: bpy.props.BoolProperty(
+        name="Prune Bones",
+        description="Удалять кости, которые ничего не деформируют и не анимированы",
+        default=True
+    )
+    
+    def count_bones(self, armature_obj):
+        """Возвращает (количество костей, количество суставов скина - deform-костей с весами)"""
+        deform_names = {bone.name for bone in armature_obj.data.bones if bone.use_deform}
+        weighted_names = set()
+        for obj in get_deformed_meshes(armature_obj):
+            weighted_names |= get_weighted_group_names(obj)
+        return len(armature_obj.data.bones), len(deform_names & weighted_names)
+    
+    def cleanup_mesh(self, obj, deform_names):
+        """
+        Ограничивает влияния костей на вершины, нормализует веса и удаляет пустые группы вершин.
+        Возвращает: (удалено влияний, изменено весов, удалено групп)
+        """
+        vertex_indices, group_indices, weights = read_vertex_weights(obj)
+        
+        # Обрабатываем только группы deform-костей, остальные группы не трогаем
+        deform_groups = np.array([vg.name in deform_names for vg in obj.vertex_groups], dtype=bool)
+        is_deform = deform_groups[group_indices] if len(group_indices) else np.zeros(0, dtype=bool)
+        
+        keep, new_weights = limit_influences(
+            vertex_indices[is_deform], weights[is_deform], self.max_influences
+        )
+        deform_vertices = vertex_indices[is_deform]
+        deform_group_indices = group_indices[is_deform]
+        
+        # Удаляем лишние влияния (пакетно по группам)
+        removed_influences = int(np.count_nonzero(~keep))
+        for group_index in np.unique(deform_group_indices[~keep]):
+            mask = (~keep) & (deform_group_indices == group_index)
+            obj.vertex_groups[int(group_index)].remove(deform_vertices[mask].tolist())
+        
+        # Записываем нормализованные веса (только изменившиеся): один вызов add на группу и значение веса.
+        # Blender хранит веса во float32 - значения, совпадающие после округления, объединяются
+        changed = keep & (np.abs(new_weights - weights[is_deform]) > 1e-6)
+        changed_vertices = deform_vertices[changed]
+        changed_groups = deform_group_indices[changed]
+        changed_weights = new_weights[changed].astype(np.float32)
+        order = np.lexsort((changed_weights, changed_groups))
+        sorted_groups = changed_groups[order]
+        sorted_weights = changed_weights[order]
+        run_start = np.r_[0, np.flatnonzero((np.diff(sorted_groups) != 0) | (np.diff(sorted_weights) != 0)) + 1]
+        run_end = np.r_[run_start[1:], len(order)]
+        for start, end in zip(run_start[:len(order)], run_end):
+            obj.vertex_groups[int(sorted_groups[start])].add(
+                changed_vertices[order[start:end]].tolist(), float(sorted_weights[start]), 'REPLACE')
+        
+        # Удаляем группы без ненулевых весов (кроме групп, используемых модификаторами и shape keys)
+        weighted_names = get_weighted_group_names(obj)
+        referenced_names = {getattr(modifier, 'vertex_group', '') for modifier in obj.modifiers}
+        if obj.data.shape_keys:
+            referenced_names |= {key_block.vertex_group for key_block in obj.data.shape_keys.key_blocks}
+        
+        empty_groups = [
+            vg for vg in obj.vertex_groups
+            if vg.name not in weighted_names and vg.name not in referenced_names
+        ]
+        for vg in empty_groups:
+            obj.vertex_groups.remove(vg)
+        
+        return removed_influences, int(np.count_nonzero(changed)), len(empty_groups)
+    
+    def prune_armature(self, context, armature_obj, animated_names):
+        """Удаляет кости, которые ничего не деформируют и не анимированы. Возвращает список имен удаленных костей"""
+        used_names = set()
+        for obj in get_deformed_meshes(armature_obj):
+            used_names |= get_weighted_group_names(obj)
+        protected_names = get_protected_bone_names(armature_obj)
+        
+        bones_to_remove = [
+            bone.name for bone in armature_obj.data.bones
+            if bone.name not in used_names
+            and bone.name not in animated_names
+            and bone.name not in protected_names
+        ]
+        if not bones_to_remove:
+            return []
+        
+        if not armature_obj.visible_get():
+            print(f"⚠ Арматура '{armature_obj.name}' скрыта, удаление костей пропущено")
+            return []
+        
+        # Удалять кости можно только в Edit Mode арматуры
+        previous_active = context.view_layer.objects.active
+        previous_selection = [obj for obj in context.selected_objects]
+        bpy.ops.object.select_all(action='DESELECT')
+        armature_obj.select_set(True)
+        context.view_layer.objects.active = armature_obj
+        bpy.ops.object.mode_set(mode='EDIT')
+        
+        edit_bones = armature_obj.data.edit_bones
+        for bone_name in bones_to_remove:
+            # Дочерние кости переходят к родителю удаляемой кости
+            edit_bones.remove(edit_bones[bone_name])
+        
+        bpy.ops.object.mode_set(mode='OBJECT')
+        armature_obj.select_set(False)
+        for obj in previous_selection:
+            obj.select_set(True)
+        context.view_layer.objects.active = previous_active
+        
+        return bones_to_remove
+    
+    def execute(self, context):
+        # Получаем выделенные объекты (с учетом Edit Mode)
+        selected_objects = get_selected_objects(context)
+        skinned_objects = [obj for obj in selected_objects if get_armature_objects([obj])]
+        
+        if not skinned_objects:
+            self.report(
+                {'WARNING'}, 
+                "Необходимо выбрать хотя бы один меш-объект с модификатором Armature!"
+            )
+            return {'CANCELLED'}
+        
+        # Веса групп вершин можно менять только в Object Mode
         if context.mode != 'OBJECT':
             bpy.ops.object.mode_set(mode='OBJECT')
         
-        cleared_count = 0
-        for obj in selected_objects:
-            if obj.type == 'MESH' and obj.data.materials:
-                obj.data.materials.clear()
-                cleared_count += 1
-                print(f"Материалы очищены у объекта '{obj.name}'")
+        armatures = get_armature_objects(skinned_objects)
+        counts_before = {arm.name: self.count_bones(arm) for arm in armatures}
         
-        self.report({'INFO'}, f"Материалы удалены у {cleared_count} объектов")
+        print(f"\n[Скиннинг] Очистка {len(skinned_objects)} объектов (макс. влияний: {self.max_influences})")
+        for obj in skinned_objects:
+            deform_names = set()
+            for arm in get_armature_objects([obj]):
+                deform_names |= {bone.name for bone in arm.data.bones if bone.use_deform}
+            removed, changed, groups_removed = self.cleanup_mesh(obj, deform_names)
+            print(f"  - '{obj.name}': удалено влияний {removed}, нормализовано весов {changed}, удалено пустых групп {groups_removed}")
+        
+        pruned_total = 0
+        if self.prune_bones:
+            animated_names = get_animated_bone_names()
+            for arm in armatures:
+                pruned = self.prune_armature(context, arm, animated_names)
+                pruned_total += len(pruned)
+                if pruned:
+                    print(f"  - Арматура '{arm.name}': удалены кости {', '.join(pruned)}")
+        
+        for arm in armatures:
+            bones_before, joints_before = counts_before[arm.name]
+            bones_after, joints_after = self.count_bones(arm)
+            print(f"  - Арматура '{arm.name}': костей {bones_before} -> {bones_after}, суставов скина {joints_before} -> {joints_after}")
+        
+        self.report({'INFO'}, f"Скиннинг очищен у {len(skinned_objects)} объектов, удалено костей: {pruned_total}")
+        return {'FINISHED'}
+
+
+class MATERIAL_OT_rescan_textures(bpy.types.Operator):
+    """Обновляет каталог текстур (перечитываются только изменившиеся папки)"""
+    bl_idname = "material.rescan_textures"
+    bl_label = "Rescan Textures"
+    
+    force: bpy.props.BoolProperty(
+        name="Full Rescan",
+        description="Перечитать все папки, даже если время их изменения не поменялось",
+        default=False
+    )
+    
+    def execute(self, context):
+        stats = refresh_texture_catalog(force=self.force)
+        sync_folder_list(context.scene)
+        self.report({'INFO'}, f"Каталог обновлен: папок {stats['directories']}, перечитано {stats['rescanned']}, текстур {stats['textures']}")
         return {'FINISHED'}
 
 
@@ -501,6 +2709,94 @@ class MATERIAL_OT_close_script(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class MaterialFolderItem(bpy.types.PropertyGroup):
+    """Папка с текстурами в списке панели"""
+    # name - относительный путь папки (используется для фильтрации по имени)
+    path: bpy.props.StringProperty(name="Path")
+    # Число материалов (PBR набор - один материал): по нему определяется тип папки, как при применении
+    material_count: bpy.props.IntProperty(name="Materials")
+    # Оценка по заголовкам файлов: декодированные изображения и текстуры на GPU (с мипами)
+    decoded_mb: bpy.props.FloatProperty(name="Decoded MB")
+    gpu_mb: bpy.props.FloatProperty(name="GPU MB")
+    unknown_count: bpy.props.IntProperty(name="Unknown")
+    # Отметка для пакетного экспорта вариантов
+    export_selected: bpy.props.BoolProperty(name="Export Variant", default=False)
+
+
+class MATERIAL_UL_folders(bpy.types.UIList):
+    """Список папок с текстурами: рисуются только видимые строки"""
+    bl_idname = "MATERIAL_UL_folders"
+    
+    sort_mode: bpy.props.EnumProperty(
+        name="Sort",
+        description="Сортировка списка папок",
+        items=[
+            ('NAME', "Name", "По имени папки"),
+            ('TYPE', "Type", "Сначала multipl, затем single"),
+            ('COUNT', "Count", "По количеству материалов (по убыванию)"),
+            ('GPU', "GPU", "По оценке памяти GPU (по убыванию)"),
+        ],
+        default='NAME'
+    )
+    
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        # Определяем тип (multipl если больше 1 материала)
+        is_multipl = item.material_count > 1
+        folder_type = "multipl" if is_multipl else "single"
+        icon = 'MATERIAL' if is_multipl else 'MATERIAL_DATA'
+        
+        # Текст кнопки с количеством материалов
+        button_text = f"{item.name} ({item.material_count}) [{folder_type}]"
+        
+        row = layout.row(align=True)
+        row.prop(item, "export_selected", text="")
+        op = row.operator("material.apply_folder", text=button_text, icon=icon)
+        op.folder_name = item.name
+        op.folder_path = item.path
+        op.material_mode = context.scene.material_mode
+        
+        # Оценка памяти рядом с кнопкой
+        memory_col = row.column()
+        memory_col.alignment = 'RIGHT'
+        memory_col.alert = item.unknown_count > 0
+        memory_col.label(text=f"{item.decoded_mb:.0f}/{item.gpu_mb:.0f} MB")
+    
+    def draw_filter(self, context, layout):
+        row = layout.row(align=True)
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "use_filter_invert", text="", icon='ARROW_LEFTRIGHT')
+        row = layout.row(align=True)
+        row.prop(self, "sort_mode", expand=True)
+        row.prop(self, "use_filter_sort_reverse", text="", icon='SORT_DESC')
+    
+    def filter_items(self, context, data, propname):
+        folders = getattr(data, propname)
+        helpers = bpy.types.UI_UL_list
+        
+        # Фильтр по имени (подстрока без учета регистра)
+        flt_flags = []
+        if self.filter_name:
+            flt_flags = helpers.filter_items_by_name(
+                self.filter_name, self.bitflag_filter_item, folders, "name", reverse=False
+            )
+        
+        # Сортировка: возвращаем новый порядок для каждого элемента
+        if self.sort_mode == 'COUNT':
+            keys = [(-item.material_count, item.name.lower()) for item in folders]
+        elif self.sort_mode == 'GPU':
+            keys = [(-item.gpu_mb, item.name.lower()) for item in folders]
+        elif self.sort_mode == 'TYPE':
+            keys = [(item.material_count <= 1, item.name.lower()) for item in folders]
+        else:
+            keys = [item.name.lower() for item in folders]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        flt_neworder = [0] * len(order)
+        for position, index in enumerate(order):
+            flt_neworder[index] = position
+        
+        return flt_flags, flt_neworder
+
+
 class MATERIAL_PT_panel(bpy.types.Panel):
     """Панель для управления материалами"""
     bl_label = "Material Manager 4.5.3"
@@ -531,29 +2827,26 @@ class MATERIAL_PT_panel(bpy.types.Panel):
         
         layout.separator()
         
-        # Сканируем папки с текстурами
-        folders_info = scan_texture_folders(TEXTURES_ROOT_DIR)
+        # Папки с текстурами из каталога
+        row = layout.row(align=True)
+        row.label(text="Папки текстур:", icon='FILE_FOLDER')
+        op = row.operator("material.rescan_textures", text="", icon='FILE_REFRESH')
+        scene = context.scene
+        
+        # Способ создания материалов для кнопок списка папок
+        row = layout.row(align=True)
+        row.prop(scene, "material_mode", expand=True)
         
-        if not folders_info:
+        if not scene.material_folders:
             box = layout.box()
             box.label(text="Текстуры не найдены", icon='ERROR')
             box.label(text=f"Проверьте путь: {TEXTURES_ROOT_DIR}")
         else:
-            # Отображаем кнопки для каждой папки
-            for folder_name, texture_count, folder_path in folders_info:
-                row = layout.row()
-                row.scale_y = 1.5
-                
-                # Определяем тип (multipl если больше 1 текстуры)
-                folder_type = "multipl" if texture_count > 1 else "single"
-                icon = 'MATERIAL' if texture_count > 1 else 'MATERIAL_DATA'
-                
-                # Текст кнопки с количеством материалов
-                button_text = f"{folder_name} ({texture_count}) [{folder_type}]"
-                
-                op = row.operator("material.apply_folder", text=button_text, icon=icon)
-                op.folder_name = folder_name
-                op.folder_path = str(folder_path)
+            # Список папок: рисуются только видимые строки, есть фильтр и сортировка
+            layout.template_list(
+                "MATERIAL_UL_folders", "", scene, "material_folders",
+                scene, "material_folder_index", rows=8
+            )
         
         layout.separator()
         
@@ -562,11 +2855,23 @@ class MATERIAL_PT_panel(bpy.types.Panel):
         row.scale_y = 1.5
         op = row.operator("material.clear_materials", text="Clear Materials", icon='TRASH')
         
+        # Кнопка очистки скиннинга (перед экспортом)
+        row = layout.row()
+        row.scale_y = 1.5
+        op = row.operator("material.cleanup_skinning", text="Cleanup Skinning", icon='ARMATURE_DATA')
+        
         # Кнопка Export GLB
         row = layout.row()
         row.scale_y = 2.0
         op = row.operator("material.export_glb", text="Export GLB", icon='EXPORT')
         
+        # Пакетный экспорт: один GLB на каждую отмеченную папку
+        selected_count = sum(1 for item in scene.material_folders if item.export_selected)
+        row = layout.row()
+        row.scale_y = 1.5
+        row.enabled = selected_count > 0
+        op = row.operator("material.export_variants", text=f"Export Variants ({selected_count})", icon='PACKAGE')
+        
         # Информация о путях
         box = layout.box()
         box.label(text="Пути:", icon='INFO')
@@ -576,22 +2881,56 @@ class MATERIAL_PT_panel(bpy.types.Panel):
 
 # Регистрация классов
 classes = (
+    MaterialFolderItem,
+    MATERIAL_UL_folders,
     MATERIAL_OT_apply_folder,
     MATERIAL_OT_export_glb,
+    MATERIAL_OT_export_variants,
     MATERIAL_OT_clear_materials,
+    MATERIAL_OT_cleanup_skinning,
+    MATERIAL_OT_rescan_textures,
     MATERIAL_OT_close_script,
     MATERIAL_PT_panel,
 )
 
 
-def register():
+def register(sync_catalog=True):
+    """
+    Регистрирует классы и свойства сцены.
+    sync_catalog=False - каталог открывается без сканирования папок текстур, список папок
+    не заполняется (фоновые воркеры: каталог уже обновлен основным процессом)
+    """
+    global _texture_catalog
     for cls in classes:
         bpy.utils.register_class(cls)
+    bpy.types.Scene.material_folders = bpy.props.CollectionProperty(type=MaterialFolderItem)
+    bpy.types.Scene.material_folder_index = bpy.props.IntProperty(default=0)
+    bpy.types.Scene.material_mode = bpy.props.EnumProperty(
+        name="Material Mode",
+        description="Как создавать материалы при применении папки",
+        items=MATERIAL_MODE_ITEMS,
+        default='NODES'
+    )
+    
+    # Заполняем список папок из каталога
+    if sync_catalog:
+        for scene in bpy.data.scenes:
+            sync_folder_list(scene)
+    elif _texture_catalog is None:
+        # get_texture_catalog не обновляет уже открытый каталог
+        _texture_catalog = texture_catalog.TextureCatalog(TEXTURE_CATALOG_PATH, TEXTURE_CACHE_DIR)
 
 
 def unregister():
+    global _texture_catalog
+    del bpy.types.Scene.material_mode
+    del bpy.types.Scene.material_folder_index
+    del bpy.types.Scene.material_folders
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
+    if _texture_catalog is not None:
+        _texture_catalog.close()
+        _texture_catalog = None
 
 
 if __name__ == "__main__":
@@ -1,49 +1,117 @@
 """
-Blender скрипт для создания куба с двумя текстурами и экспорта в GLB
-Использование: В Blender открыть скрипт (Scripting workspace) и запустить (Run Script)
+Blender скрипт-генератор тяжелых тестовых моделей (GLB) для нагрузочного тестирования
+ModelViewer.tsx и CDN
+Использование:
+1. В Blender открыть скрипт (Scripting workspace) и запустить (Run Script) -
+   будут созданы все ассеты из BENCHMARK_PRESETS
+2. Из командной строки:
+   blender --background --factory-startup --python create_textured_cube.py -- \
+       --preset heavy
+   blender --background --factory-startup --python create_textured_cube.py -- \
+       --name custom --objects 20 --polygons 50000 --materials 8 --textures 8 \
+       --resolution 2048 --clips 3 --bones 16 --seed 7
+
+Параметры ассета: количество объектов, полигонов на объект, материалов, текстур
+и их разрешение (текстуры генерируются процедурно, с диска ничего не читается),
+количество анимационных клипов и костей. Генерация детерминирована: одинаковые
+параметры и seed дают одинаковый GLB (в пределах одной версии Blender).
+Ассеты пишутся в папку корпуса вместе с manifest.json (параметры, размер, хеш).
 """
 
-import bpy
+import argparse
+import hashlib
+import json
+import math
 import os
+import sys
+
+import bpy
+import numpy as np
+
+# Папка корпуса тестовых моделей (относительно корня проекта)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "public", "models", "benchmark")
+MANIFEST_NAME = "manifest.json"
+
+# Длина анимационного клипа (кадров)
+CLIP_FRAMES = 48
+
+# Наборы параметров корпуса
+BENCHMARK_PRESETS = {
+    'minimal': dict(objects=1, polygons=6, materials=2, textures=2, resolution=512, clips=0, bones=0),
+    'light': dict(objects=10, polygons=2000, materials=4, textures=4, resolution=512, clips=0, bones=0),
+    'medium': dict(objects=25, polygons=20000, materials=8, textures=8, resolution=1024, clips=2, bones=0),
+    'heavy': dict(objects=50, polygons=100000, materials=16, textures=16, resolution=2048, clips=4, bones=0),
+    'skinned': dict(objects=4, polygons=50000, materials=4, textures=4, resolution=1024, clips=6, bones=64),
+}
+
+
+def parse_args(argv=None):
+    """
+    Читает параметры после '--' (аргументы Blender до '--' пропускаются)
+    """
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    
+    parser = argparse.ArgumentParser(description="Генератор тестовых GLB моделей")
+    parser.add_argument('--preset', choices=sorted(BENCHMARK_PRESETS) + ['all'],
+                        help="Набор параметров (all - весь корпус)")
+    parser.add_argument('--name', default="custom", help="Имя ассета (для своих параметров)")
+    parser.add_argument('--objects', type=int, default=1, help="Количество объектов")
+    parser.add_argument('--polygons', type=int, default=6, help="Полигонов на объект")
+    parser.add_argument('--materials', type=int, default=2, help="Количество материалов")
+    parser.add_argument('--textures', type=int, default=2, help="Количество текстур")
+    parser.add_argument('--resolution', type=int, default=512, help="Разрешение текстур (пикселей)")
+    parser.add_argument('--clips', type=int, default=0, help="Количество анимационных клипов")
+    parser.add_argument('--bones', type=int, default=0, help="Количество костей (0 - без скиннинга)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed генератора")
+    parser.add_argument('--out', default=BENCHMARK_DIR, help="Папка корпуса")
+    return parser.parse_args(argv)
+
 
 # Очистка сцены
 def clear_scene():
-    """Удаляет все объекты и материалы из сцены"""
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete()
-    
-    # Удаляем все материалы
-    for material in bpy.data.materials:
-        bpy.data.materials.remove(material)
+    """Удаляет все объекты и данные, чтобы имена ассета не получали суффиксы .001"""
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.armatures,
+                       bpy.data.materials, bpy.data.textures, bpy.data.images, bpy.data.actions):
+        for item in list(collection):
+            collection.remove(item)
+
+
+def create_procedural_image(name, resolution, rng):
+    """
+    Создает процедурную текстуру: шахматка со случайными цветами клеток и шумом
     
-    # Удаляем все текстуры
-    for texture in bpy.data.textures:
-        bpy.data.textures.remove(texture)
+    Args:
+        name: Имя изображения
+        resolution: Сторона квадратной текстуры в пикселях
+        rng: Генератор случайных чисел (numpy)
+    """
+    cells = int(rng.integers(4, 17))
+    palette = rng.random((cells, cells, 3), dtype=np.float32)
+    coords = np.arange(resolution) * cells // resolution
+    pixels = np.empty((resolution, resolution, 4), dtype=np.float32)
+    pixels[..., :3] = palette[coords[:, None], coords[None, :]]
+    # Шум сильно ухудшает сжатие PNG - это и нужно для тяжелого ассета
+    pixels[..., :3] += rng.normal(0.0, 0.05, (resolution, resolution, 3)).astype(np.float32)
+    pixels[..., 3] = 1.0
+    np.clip(pixels, 0.0, 1.0, out=pixels)
     
-    # Удаляем все изображения
-    for image in bpy.data.images:
-        bpy.data.images.remove(image)
+    image = bpy.data.images.new(name, width=resolution, height=resolution, alpha=False)
+    image.pixels.foreach_set(pixels.ravel())
+    image.file_format = 'PNG'
+    image.pack()
+    return image
 
-# Абсолютные пути к текстурам
-TEXTURE1_PATH = r"C:\Users\HP\Downloads\дивансон\кожа_01.png"
-TEXTURE2_PATH = r"C:\Users\HP\Downloads\дивансон\ткань01.png"
 
-# Путь для экспорта GLB (можно изменить)
-EXPORT_PATH = r"C:\Users\HP\Downloads\дивансон\textured_cube.glb"
-
-def create_material_with_texture(material_name, texture_path):
+def create_material_with_texture(material_name, image):
     """
     Создает материал с текстурой
     
     Args:
         material_name: Имя материала
-        texture_path: Абсолютный путь к файлу текстуры
+        image: Изображение Blender
     """
-    # Проверяем существование файла
-    if not os.path.exists(texture_path):
-        print(f"ОШИБКА: Файл не найден: {texture_path}")
-        return None
-    
     # Создаем новый материал
     material = bpy.data.materials.new(name=material_name)
     material.use_nodes = True
@@ -55,15 +123,7 @@ def create_material_with_texture(material_name, texture_path):
     output_node = material.node_tree.nodes.new(type='ShaderNodeOutputMaterial')
     bsdf_node = material.node_tree.nodes.new(type='ShaderNodeBsdfPrincipled')
     tex_node = material.node_tree.nodes.new(type='ShaderNodeTexImage')
-    
-    # Загружаем изображение
-    try:
-        image = bpy.data.images.load(texture_path)
-        tex_node.image = image
-        print(f"✓ Текстура загружена: {texture_path}")
-    except Exception as e:
-        print(f"ОШИБКА при загрузке изображения: {e}")
-        return None
+    tex_node.image = image
     
     # Располагаем ноды
     output_node.location = (300, 0)
@@ -73,61 +133,243 @@ def create_material_with_texture(material_name, texture_path):
     # Подключаем ноды
     material.node_tree.links.new(tex_node.outputs['Color'], bsdf_node.inputs['Base Color'])
     material.node_tree.links.new(bsdf_node.outputs['BSDF'], output_node.inputs['Surface'])
+    return material
+
+
+def copy_material_with_texture(template, material_name, image):
+    """
+    Создает материал копией шаблона (без построения нод) и подставляет изображение
     
-    print(f"✓ Материал '{material_name}' создан")
+    Args:
+        template: Материал-шаблон с нодой Image Texture
+        material_name: Имя материала
+        image: Изображение Blender
+    """
+    material = template.copy()
+    material.name = material_name
+    for node in material.node_tree.nodes:
+        if node.type == 'TEX_IMAGE':
+            node.image = image
+            break
     return material
 
-def create_cube_with_materials():
-    """Создает куб и применяет к нему материалы"""
-    # Добавляем куб
-    bpy.ops.mesh.primitive_cube_add(size=2, location=(0, 0, 0))
-    cube = bpy.context.active_object
-    cube.name = "TexturedCube"
+
+def create_surface_mesh(name, polygons, rng):
+    """
+    Создает волнистую поверхность-сетку примерно из polygons четырехугольников с UV
+    
+    Args:
+        name: Имя меша
+        polygons: Желаемое количество полигонов
+        rng: Генератор случайных чисел (numpy)
+    """
+    side = max(int(math.ceil(math.sqrt(polygons))), 1)
+    grid = np.linspace(-1.0, 1.0, side + 1, dtype=np.float32)
+    xs, ys = np.meshgrid(grid, grid, indexing='ij')
+    frequency = rng.uniform(1.0, 6.0, 2)
+    phase = rng.uniform(0.0, 2.0 * np.pi, 2)
+    zs = 0.15 * np.sin(xs * frequency[0] + phase[0]) * np.cos(ys * frequency[1] + phase[1])
+    vertices = np.stack([xs, ys, zs], axis=-1).reshape(-1, 3)
+    
+    index = np.arange((side + 1) * (side + 1)).reshape(side + 1, side + 1)
+    faces = np.stack([
+        index[:-1, :-1], index[1:, :-1], index[1:, 1:], index[:-1, 1:]
+    ], axis=-1).reshape(-1, 4)
+    
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    
+    # UV = координаты сетки
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    loop_vertices = faces.ravel()
+    uvs = (vertices[loop_vertices, :2] + 1.0) * 0.5
+    uv_layer.data.foreach_set('uv', uvs.ravel())
+    mesh.update()
+    return mesh
+
+
+def assign_materials(mesh, materials):
+    """Распределяет материалы по полосам полигонов"""
+    mesh_materials = list(materials)
+    for material in mesh_materials:
+        mesh.materials.append(material)
+    polygon_count = len(mesh.polygons)
+    material_indices = (np.arange(polygon_count) * len(mesh_materials) // max(polygon_count, 1)).astype(np.int32)
+    mesh.polygons.foreach_set('material_index', material_indices)
+
+
+def create_armature(bone_count):
+    """
+    Создает арматуру - цепочку костей вдоль оси X (от -1 до 1)
+    
+    Args:
+        bone_count: Количество костей
+    """
+    armature_data = bpy.data.armatures.new("BenchmarkArmature")
+    armature = bpy.data.objects.new("BenchmarkArmature", armature_data)
+    bpy.context.scene.collection.objects.link(armature)
+    
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode='EDIT')
+    length = 2.0 / bone_count
+    parent = None
+    for index in range(bone_count):
+        bone = armature_data.edit_bones.new(f"Bone_{index:03d}")
+        bone.head = (-1.0 + index * length, 0.0, 0.0)
+        bone.tail = (-1.0 + (index + 1) * length, 0.0, 0.0)
+        if parent:
+            bone.parent = parent
+            bone.use_connect = True
+        parent = bone
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature
+
+
+def bind_to_armature(obj, armature, bone_count):
+    """
+    Привязывает объект к арматуре: каждая вершина получает веса двух соседних костей
+    по положению вдоль X (веса квантуются до 1/8, чтобы добавлять их группами)
+    """
+    modifier = obj.modifiers.new("Armature", 'ARMATURE')
+    modifier.object = armature
+    
+    coords = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+    obj.data.vertices.foreach_get('co', coords)
+    position = np.clip((coords[0::3] + 1.0) * 0.5 * bone_count - 0.5, 0.0, bone_count - 1)
+    first_bone = np.minimum(position.astype(np.int32), bone_count - 1)
+    second_weight = np.round((position - first_bone) * 8) / 8
     
-    # Создаем материалы
-    material_t1 = create_material_with_texture("t1", TEXTURE1_PATH)
-    material_t2 = create_material_with_texture("t2", TEXTURE2_PATH)
+    groups = [obj.vertex_groups.new(name=f"Bone_{index:03d}") for index in range(bone_count)]
+    for bone_index in np.unique(first_bone):
+        in_bone = first_bone == bone_index
+        for weight in np.unique(second_weight[in_bone]):
+            vertex_indices = np.nonzero(in_bone & (second_weight == weight))[0].tolist()
+            if weight < 1.0:
+                groups[bone_index].add(vertex_indices, float(1.0 - weight), 'REPLACE')
+            if weight > 0.0 and bone_index + 1 < bone_count:
+                groups[bone_index + 1].add(vertex_indices, float(weight), 'REPLACE')
+
+
+def create_clips(target, clip_count, rng, bone_names=None):
+    """
+    Создает анимационные клипы (отдельные Actions в NLA дорожках):
+    синусоидальные вращения костей или, без костей, вращение и покачивание объекта
+    
+    Args:
+        target: Объект (арматура или меш)
+        clip_count: Количество клипов
+        rng: Генератор случайных чисел (numpy)
+        bone_names: Имена костей (None - анимируется сам объект)
+    """
+    animation_data = target.animation_data_create()
+    for clip_index in range(clip_count):
+        action = bpy.data.actions.new(f"{target.name}_Clip_{clip_index:02d}")
+        animation_data.action = action
+        amplitude = rng.uniform(0.1, 0.6)
+        cycles = int(rng.integers(1, 4))
+        phases = rng.uniform(0.0, 2.0 * np.pi, len(bone_names) if bone_names else 1)
+        
+        for frame in range(0, CLIP_FRAMES + 1, 2):
+            angle_base = 2.0 * np.pi * cycles * frame / CLIP_FRAMES
+            if bone_names:
+                for bone_name, phase in zip(bone_names, phases):
+                    pose_bone = target.pose.bones[bone_name]
+                    pose_bone.rotation_mode = 'QUATERNION'
+                    angle = amplitude * math.sin(angle_base + phase)
+                    pose_bone.rotation_quaternion = (math.cos(angle / 2), 0.0, 0.0, math.sin(angle / 2))
+                    pose_bone.keyframe_insert('rotation_quaternion', frame=frame)
+            else:
+                target.rotation_euler = (0.0, 0.0, amplitude * math.sin(angle_base + phases[0]))
+                target.location.z = amplitude * 0.5 * math.sin(angle_base)
+                target.keyframe_insert('rotation_euler', frame=frame)
+                target.keyframe_insert('location', frame=frame)
+        
+        track = animation_data.nla_tracks.new()
+        track.name = action.name
+        track.strips.new(action.name, 0, action)
+        animation_data.action = None
+
+
+def generate_asset(name, params, seed, out_dir):
+    """
+    Создает сцену по параметрам, экспортирует GLB в папку корпуса
+    Возвращает: запись манифеста
+    """
+    rng = np.random.default_rng(seed)
+    clear_scene()
+    scene = bpy.context.scene
+    scene.frame_start = 0
+    scene.frame_end = CLIP_FRAMES
     
-    if not material_t1 or not material_t2:
-        print("ОШИБКА: Не удалось создать материалы")
-        return False
+    images = [
+        create_procedural_image(f"{name}_tex_{index:03d}", params['resolution'], rng)
+        for index in range(params['textures'])
+    ]
+    # Ноды строятся один раз, остальные материалы - копии первого с другим изображением
+    materials = []
+    for index in range(params['materials']):
+        image = images[index % len(images)] if images else None
+        if materials:
+            materials.append(copy_material_with_texture(materials[0], f"{name}_mat_{index:03d}", image))
+        else:
+            materials.append(create_material_with_texture(f"{name}_mat_{index:03d}", image))
     
-    # Добавляем материалы к объекту (важно: порядок добавления определяет индексы)
-    cube.data.materials.append(material_t1)  # Индекс 0
-    cube.data.materials.append(material_t2)  # Индекс 1
+    armature = create_armature(params['bones']) if params['bones'] > 0 else None
     
-    # Получаем доступ к граням куба
-    mesh = cube.data
-    # У куба 6 граней (индексы 0-5)
-    # Применяем t1 к первым 3 граням (0, 1, 2)
-    mesh.polygons[0].material_index = 0
-    mesh.polygons[1].material_index = 0
-    mesh.polygons[2].material_index = 0
+    grid_side = max(int(math.ceil(math.sqrt(params['objects']))), 1)
+    objects = []
+    for index in range(params['objects']):
+        mesh = create_surface_mesh(f"{name}_mesh_{index:03d}", params['polygons'], rng)
+        if materials:
+            # У каждого объекта до 4 материалов подряд из общего списка
+            count = min(len(materials), 4)
+            assign_materials(mesh, [materials[(index + offset) % len(materials)] for offset in range(count)])
+        obj = bpy.data.objects.new(f"{name}_obj_{index:03d}", mesh)
+        scene.collection.objects.link(obj)
+        if armature:
+            obj.parent = armature
+            bind_to_armature(obj, armature, params['bones'])
+        else:
+            obj.location = ((index % grid_side) * 2.5, (index // grid_side) * 2.5, 0.0)
+        objects.append(obj)
     
-    # Применяем t2 к остальным 3 граням (3, 4, 5)
-    mesh.polygons[3].material_index = 1
-    mesh.polygons[4].material_index = 1
-    mesh.polygons[5].material_index = 1
+    if params['clips'] > 0:
+        if armature:
+            create_clips(armature, params['clips'], rng, [bone.name for bone in armature.data.bones])
+        elif objects:
+            create_clips(objects[0], params['clips'], rng)
     
-    # Устанавливаем активный материал (для отображения в Blender)
-    cube.active_material_index = 0
+    os.makedirs(out_dir, exist_ok=True)
+    filepath = os.path.join(out_dir, f"{name}.glb")
+    export_to_glb(filepath, animations=params['clips'] > 0)
     
-    print(f"✓ Куб создан с материалами t1 и t2")
-    print(f"  - Материал t1 применен к 3 граням")
-    print(f"  - Материал t2 применен к 3 граням")
-    return True
+    with open(filepath, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return {
+        'name': name,
+        'file': os.path.basename(filepath),
+        'size': os.path.getsize(filepath),
+        'sha256': content_hash,
+        'seed': seed,
+        'params': params,
+        'vertices': sum(len(obj.data.vertices) for obj in objects),
+        'polygons': sum(len(obj.data.polygons) for obj in objects),
+        'blender': bpy.app.version_string,
+    }
 
-def export_to_glb(filepath):
+
+def export_to_glb(filepath, animations=False):
     """
-    Экспортирует выбранные объекты в GLB формат
+    Экспортирует все объекты сцены в GLB формат
     
     Args:
         filepath: Путь для сохранения GLB файла
+        animations: Экспортировать анимационные клипы (NLA дорожки)
     """
     # Выбираем все объекты для экспорта
-    bpy.ops.object.select_all(action='SELECT')
+    for obj in bpy.context.scene.objects:
+        obj.select_set(True)
     
-    # Настройки экспорта
     # В GLB формате текстуры автоматически встраиваются в файл
     
     # Список возможных вариантов параметров (для разных версий Blender)
@@ -139,22 +381,18 @@ def export_to_glb(filepath):
             'use_selection': True,
             'export_materials': 'EXPORT',
             'export_normals': True,
+            'export_animations': animations,
+            'export_animation_mode': 'NLA_TRACKS',
         },
-        # Попытка 2: Альтернативное имя параметра selection
-        {
-            'filepath': filepath,
-            'export_format': 'GLB',
-            'export_selected': True,
-            'export_materials': 'EXPORT',
-            'export_normals': True,
-        },
-        # Попытка 3: Минимальный набор
+        # Попытка 2: Без выбора режима анимаций
         {
             'filepath': filepath,
             'export_format': 'GLB',
+            'use_selection': True,
             'export_materials': 'EXPORT',
+            'export_animations': animations,
         },
-        # Попытка 4: Только формат
+        # Попытка 3: Только формат
         {
             'filepath': filepath,
             'export_format': 'GLB',
@@ -174,45 +412,53 @@ def export_to_glb(filepath):
             else:
                 raise Exception(f"Не удалось экспортировать GLB. Ошибка: {e}")
 
+
+def update_manifest(out_dir, entries):
+    """Добавляет (или обновляет по имени) записи ассетов в manifest.json корпуса"""
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    assets = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            assets = {entry['name']: entry for entry in json.load(f).get('assets', [])}
+    for entry in entries:
+        assets[entry['name']] = entry
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'assets': [assets[name] for name in sorted(assets)]}, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
 # Основная функция
 def main():
+    args = parse_args()
+    
+    if args.preset == 'all' or (args.preset is None and '--' not in sys.argv):
+        # Run Script из Blender без параметров - весь корпус
+        assets = [(name, params) for name, params in BENCHMARK_PRESETS.items()]
+    elif args.preset:
+        assets = [(args.preset, BENCHMARK_PRESETS[args.preset])]
+    else:
+        assets = [(args.name, dict(
+            objects=args.objects, polygons=args.polygons, materials=args.materials,
+            textures=args.textures, resolution=args.resolution, clips=args.clips, bones=args.bones,
+        ))]
+    
     print("=" * 50)
-    print("Начало выполнения скрипта")
+    print(f"Генерация тестовых моделей: {len(assets)}")
     print("=" * 50)
     
-    # Очистка сцены
-    print("\n1. Очистка сцены...")
-    clear_scene()
-    
-    # Создание куба с материалами
-    print("\n2. Создание куба с материалами...")
-    if not create_cube_with_materials():
-        print("ОШИБКА: Не удалось создать куб с материалами")
-        return
-    
-    # Экспорт в GLB
-    print("\n3. Экспорт в GLB...")
-    try:
-        # Создаем директорию, если её нет
-        export_dir = os.path.dirname(EXPORT_PATH)
-        if export_dir and not os.path.exists(export_dir):
-            os.makedirs(export_dir)
-        
-        export_to_glb(EXPORT_PATH)
-    except Exception as e:
-        print(f"ОШИБКА при экспорте: {e}")
-        return
+    entries = []
+    for name, params in assets:
+        print(f"\n- {name}: {params}")
+        entry = generate_asset(name, params, args.seed, args.out)
+        entries.append(entry)
+        print(f"✓ {entry['file']}: {entry['size']} байт, вершин {entry['vertices']}, полигонов {entry['polygons']}")
     
+    manifest_path = update_manifest(args.out, entries)
     print("\n" + "=" * 50)
-    print("Скрипт выполнен успешно!")
+    print(f"Скрипт выполнен успешно! Манифест: {manifest_path}")
     print("=" * 50)
-    print(f"\nФайл сохранен: {EXPORT_PATH}")
-    print("\nМатериалы в модели:")
-    print("  - t1 (кожа)")
-    print("  - t2 (ткань)")
-    print("\nОба материала доступны для переключения в приложении!")
+
 
 # Запуск скрипта
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,306 @@
+"""
+Сравнение двух GLB файлов по разделам (Blender и NumPy не нужны)
+Использование:
+    python glb_diff.py <old.glb> <new.glb> [--max-total-growth 5] [--max-growth 10]
+                       [--limit images=0] [--limit "image:Fabric"=20] [--all]
+
+Сравниваются:
+- размер файла, JSON и BIN чанков
+- bufferView по владельцу и назначению (mesh:Sofa[0] POSITION, image:..., animation:Walk ...)
+- изображения по имени и размеру
+- количество примитивов и draw calls (примитивы всех узлов с мешами)
+- количество вершин и индексов
+- байты анимаций (данные accessor'ов сэмплеров)
+
+Файлы читаются через mmap: разбирается только JSON чанк, бинарные данные не копируются.
+Таблица сортируется по абсолютному изменению. Код выхода 1, если превышен
+какой-либо порог роста, 2 - если файл не удалось прочитать.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+GLB_MAGIC = 0x46546C67  # b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# Размер компонента по componentType и количество компонентов по type
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+
+
+class GlbError(Exception):
+    """Файл не является корректным GLB"""
+
+
+def read_glb_layout(filepath):
+    """
+    Читает заголовок, JSON и размеры чанков GLB через mmap (без чтения бинарных данных).
+    Возвращает: (gltf, {'file': размер файла, 'json': размер JSON чанка, 'bin': размер BIN чанка})
+    """
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < 20:
+                raise GlbError(f"Файл слишком мал для GLB: {filepath}")
+            magic, version, length = struct.unpack_from('<III', data, 0)
+            if magic != GLB_MAGIC:
+                raise GlbError(f"Не GLB файл: {filepath}")
+
+            gltf = None
+            sizes = {'file': len(data), 'json': 0, 'bin': 0}
+            offset = 12
+            while offset + 8 <= min(length, len(data)):
+                chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+                start = offset + 8
+                if chunk_type == CHUNK_JSON:
+                    gltf = json.loads(data[start:start + chunk_length].decode('utf-8'))
+                    sizes['json'] = chunk_length
+                elif chunk_type == CHUNK_BIN:
+                    sizes['bin'] = chunk_length
+                offset = start + chunk_length
+            if gltf is None:
+                raise GlbError(f"В файле нет JSON чанка: {filepath}")
+    return gltf, sizes
+
+
+def accessor_byte_length(gltf, accessor):
+    """Объем данных accessor'а в байтах (без учета шага чередующихся буферов)"""
+    component_size = COMPONENT_SIZES.get(accessor.get('componentType'), 4)
+    return accessor.get('count', 0) * TYPE_SIZES.get(accessor.get('type'), 1) * component_size
+
+
+def buffer_view_labels(gltf):
+    """
+    Назначение каждого bufferView по ссылкам на него с владельцем: меш и примитив, скин,
+    изображение, анимация (например, 'mesh:Sofa[0] POSITION'). Метка не зависит от порядка
+    bufferViews в файле, поэтому перестановка данных не выглядит как изменение размера.
+    bufferView, общий для нескольких владельцев, помечается 'shared' с перечнем назначений.
+    Возвращает: {индекс bufferView: метка}
+    """
+    usages = {}  # индекс bufferView -> {(владелец, назначение)}
+
+    def add(view_index, owner, usage=""):
+        if view_index is not None:
+            usages.setdefault(view_index, set()).add((owner, usage))
+
+    accessors = gltf.get('accessors', [])
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        mesh_name = mesh.get('name') or str(mesh_index)
+        for primitive_index, primitive in enumerate(mesh.get('primitives', [])):
+            owner = f"mesh:{mesh_name}[{primitive_index}]"
+            for semantic, accessor_index in primitive.get('attributes', {}).items():
+                add(accessors[accessor_index].get('bufferView'), owner, semantic)
+            if 'indices' in primitive:
+                add(accessors[primitive['indices']].get('bufferView'), owner, 'indices')
+            for target in primitive.get('targets', []):
+                for semantic, accessor_index in target.items():
+                    add(accessors[accessor_index].get('bufferView'), owner, f"morph {semantic}")
+    for skin_index, skin in enumerate(gltf.get('skins', [])):
+        if 'inverseBindMatrices' in skin:
+            add(accessors[skin['inverseBindMatrices']].get('bufferView'),
+                f"skin:{skin.get('name') or skin_index}", 'inverseBindMatrices')
+    for animation_index, animation in enumerate(gltf.get('animations', [])):
+        owner = f"animation:{animation.get('name') or animation_index}"
+        for sampler in animation.get('samplers', []):
+            add(accessors[sampler['input']].get('bufferView'), owner)
+            add(accessors[sampler['output']].get('bufferView'), owner)
+    for image_index, image in enumerate(gltf.get('images', [])):
+        add(image.get('bufferView'), f"image:{image.get('name', image_index)}")
+
+    labels = {}
+    for index in range(len(gltf.get('bufferViews', []))):
+        view_usages = usages.get(index)
+        if not view_usages:
+            labels[index] = 'unused'
+            continue
+        owners = {owner for owner, _ in view_usages}
+        purposes = "+".join(sorted({usage for _, usage in view_usages if usage}))
+        owner = owners.pop() if len(owners) == 1 else 'shared'
+        labels[index] = f"{owner} {purposes}" if purposes else owner
+    return labels
+
+
+def collect_metrics(filepath):
+    """
+    Собирает метрики GLB файла.
+    Возвращает: {имя метрики: значение}
+    """
+    gltf, sizes = read_glb_layout(filepath)
+    accessors = gltf.get('accessors', [])
+    buffer_views = gltf.get('bufferViews', [])
+    metrics = {
+        'file bytes': sizes['file'],
+        'json bytes': sizes['json'],
+        'bin bytes': sizes['bin'],
+    }
+
+    # bufferView: размеры с одинаковой меткой (например, все данные клипа) суммируются
+    for index, label in buffer_view_labels(gltf).items():
+        key = f"bufferView {label}"
+        metrics[key] = metrics.get(key, 0) + buffer_views[index].get('byteLength', 0)
+
+    # Изображения: встроенные - размер bufferView, внешние - размер файла рядом с GLB
+    image_total = 0
+    for image_index, image in enumerate(gltf.get('images', [])):
+        name = image.get('name') or image.get('uri') or str(image_index)
+        if 'bufferView' in image:
+            size = buffer_views[image['bufferView']].get('byteLength', 0)
+        else:
+            uri_path = os.path.join(os.path.dirname(filepath), image.get('uri', ''))
+            size = os.path.getsize(uri_path) if image.get('uri') and os.path.isfile(uri_path) else 0
+        metrics[f"image:{name}"] = size
+        image_total += size
+    metrics['images'] = len(gltf.get('images', []))
+    metrics['images bytes'] = image_total
+
+    # Примитивы, вершины и индексы считаются по мешам; draw calls - по узлам с мешами
+    meshes = gltf.get('meshes', [])
+    primitive_count = 0
+    vertex_count = 0
+    index_count = 0
+    for mesh in meshes:
+        for primitive in mesh.get('primitives', []):
+            primitive_count += 1
+            position = primitive.get('attributes', {}).get('POSITION')
+            if position is not None:
+                vertex_count += accessors[position].get('count', 0)
+            if 'indices' in primitive:
+                index_count += accessors[primitive['indices']].get('count', 0)
+    metrics['meshes'] = len(meshes)
+    metrics['primitives'] = primitive_count
+    metrics['draw calls'] = sum(
+        len(meshes[node['mesh']].get('primitives', []))
+        for node in gltf.get('nodes', []) if 'mesh' in node
+    )
+    metrics['vertices'] = vertex_count
+    metrics['indices'] = index_count
+    metrics['materials'] = len(gltf.get('materials', []))
+
+    # Анимации: данные входов/выходов сэмплеров (общие accessor'ы считаются один раз)
+    animation_accessors = set()
+    for animation_index, animation in enumerate(gltf.get('animations', [])):
+        clip_accessors = set()
+        for sampler in animation.get('samplers', []):
+            clip_accessors.update((sampler['input'], sampler['output']))
+        name = animation.get('name') or str(animation_index)
+        metrics[f"animation:{name}"] = sum(accessor_byte_length(gltf, accessors[i]) for i in clip_accessors)
+        animation_accessors |= clip_accessors
+    metrics['animations'] = len(gltf.get('animations', []))
+    metrics['animation bytes'] = sum(accessor_byte_length(gltf, accessors[i]) for i in animation_accessors)
+    return metrics
+
+
+def diff_metrics(old_metrics, new_metrics):
+    """
+    Разница метрик, отсортированная по абсолютному изменению (по убыванию).
+    Возвращает: [(метрика, старое значение или None, новое значение или None, изменение, изменение в %)]
+    """
+    rows = []
+    for key in set(old_metrics) | set(new_metrics):
+        old_value = old_metrics.get(key)
+        new_value = new_metrics.get(key)
+        delta = (new_value or 0) - (old_value or 0)
+        if old_value:
+            percent = delta / old_value * 100
+        else:
+            percent = 0.0 if not new_value else float('inf')
+        rows.append((key, old_value, new_value, delta, percent))
+    rows.sort(key=lambda row: (-abs(row[3]), row[0]))
+    return rows
+
+
+def format_table(rows, show_all=False):
+    """Форматирует таблицу изменений (без show_all - только изменившиеся строки)"""
+    if not show_all:
+        rows = [row for row in rows if row[3] != 0]
+    if not rows:
+        return "Различий нет"
+
+    def fmt(value):
+        return "-" if value is None else f"{value:,}".replace(',', ' ')
+
+    width = max(len("Метрика"), max(len(row[0]) for row in rows))
+    lines = [f"{'Метрика':<{width}}  {'Было':>14}  {'Стало':>14}  {'Изменение':>14}  {'%':>8}"]
+    lines.append("-" * len(lines[0]))
+    for key, old_value, new_value, delta, percent in rows:
+        percent_text = "new" if percent == float('inf') else f"{percent:+.1f}%"
+        lines.append(f"{key:<{width}}  {fmt(old_value):>14}  {fmt(new_value):>14}  "
+                     f"{delta:>+14,}  {percent_text:>8}".replace(',', ' '))
+    return "\n".join(lines)
+
+
+def check_thresholds(rows, max_total_growth=None, max_growth=None, limits=None):
+    """
+    Проверяет пороги роста (в процентах).
+    max_total_growth - для размера файла, max_growth - для каждой метрики,
+    limits - {префикс метрики: процент} для отдельных метрик.
+    Возвращает: список нарушений (строки)
+    """
+    violations = []
+    for key, old_value, new_value, delta, percent in rows:
+        if delta <= 0:
+            continue
+        thresholds = []
+        if max_growth is not None:
+            thresholds.append(max_growth)
+        if key == 'file bytes' and max_total_growth is not None:
+            thresholds.append(max_total_growth)
+        for prefix, limit in (limits or {}).items():
+            if key == prefix or key.startswith(prefix + ':') or key.startswith(prefix + ' '):
+                thresholds.append(limit)
+        if thresholds and percent > min(thresholds):
+            percent_text = "new" if percent == float('inf') else f"{percent:+.1f}%"
+            violations.append(f"{key}: {percent_text} (порог {min(thresholds):+.1f}%)")
+    return violations
+
+
+def parse_limit(value):
+    """Разбирает --limit метрика=процент (type= для argparse: ошибка выводится как ошибка аргумента)"""
+    key, _, percent = value.rpartition('=')
+    if not key:
+        raise argparse.ArgumentTypeError(f"ожидается метрика=процент: {value}")
+    try:
+        return key, float(percent)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"процент не является числом: {value}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение двух GLB файлов по разделам")
+    parser.add_argument('old', help="Исходный GLB")
+    parser.add_argument('new', help="Новый GLB")
+    parser.add_argument('--max-total-growth', type=float, default=None,
+                        help="Допустимый рост размера файла (%%)")
+    parser.add_argument('--max-growth', type=float, default=None,
+                        help="Допустимый рост любой метрики (%%)")
+    parser.add_argument('--limit', action='append', default=[], type=parse_limit,
+                        help="Порог для метрики или группы метрик: 'images bytes=0', 'image=10', 'vertices=5'")
+    parser.add_argument('--all', action='store_true', help="Показывать и неизменившиеся метрики")
+    args = parser.parse_args(argv)
+
+    try:
+        old_metrics = collect_metrics(args.old)
+        new_metrics = collect_metrics(args.new)
+    except (OSError, ValueError, GlbError) as e:
+        print(f"✗ Ошибка чтения: {e}")
+        return 2
+
+    rows = diff_metrics(old_metrics, new_metrics)
+    print(f"{args.old} -> {args.new}\n")
+    print(format_table(rows, show_all=args.all))
+
+    violations = check_thresholds(rows, args.max_total_growth, args.max_growth, dict(args.limit))
+    if violations:
+        print("\n✗ Превышены пороги:")
+        for violation in violations:
+            print(f"  - {violation}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
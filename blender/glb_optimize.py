@@ -0,0 +1,1531 @@
+"""
+Оптимизация GLB файлов после экспорта (Blender не нужен, только NumPy)
+Использование:
+    python glb_optimize.py <input.glb> [-o output.glb] [--animations] [...]
+
+Используется из Material Manager (MATERIAL_OT_export_glb) после экспорта,
+а также как отдельная утилита командной строки.
+
+Оптимизации:
+- --animations: удаление ключей анимации, которые восстанавливаются интерполяцией
+  (LINEAR/SLERP) с заданной точностью, удаление постоянных каналов,
+  опциональное квантование вращений и переводов (--quantize-animations)
+- --vertex-cache: переупорядочивание треугольников под кеш вершин (Tipsify)
+  и вершин в порядке обращения, с отчетом ACMR до/после
+- --morphs: морф-таргеты (shape keys) - нулевые дельты не хранятся (sparse accessor'ы),
+  таргеты без смещений удаляются, опционально дельты квантуются (--quantize-morphs,
+  KHR_mesh_quantization)
+- --ktx2: сжатие текстур в KTX2 (KHR_texture_basisu) локальным энкодером toktx:
+  ETC1S для цветных текстур, UASTC для карт нормалей и линейных данных, с мип-уровнями,
+  параллельно по изображениям, с кешем по хешу исходника; отчет о памяти GPU до/после
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+import texture_catalog
+
+GLB_MAGIC = 0x46546C67  # b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# componentType -> dtype
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+DTYPE_COMPONENTS = {np.dtype(v): k for k, v in COMPONENT_DTYPES.items()}
+
+# type -> количество компонентов
+TYPE_SIZES = {
+    'SCALAR': 1,
+    'VEC2': 2,
+    'VEC3': 3,
+    'VEC4': 4,
+    'MAT2': 4,
+    'MAT3': 9,
+    'MAT4': 16,
+}
+SIZE_TYPES = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4', 16: 'MAT4'}
+
+# Делители для нормализованных целочисленных компонентов
+NORMALIZED_DIVISORS = {
+    5120: 127.0,
+    5121: 255.0,
+    5122: 32767.0,
+    5123: 65535.0,
+}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+# Значения по умолчанию для каналов анимации (покой узла)
+DEFAULT_TRS = {
+    'translation': [0.0, 0.0, 0.0],
+    'rotation': [0.0, 0.0, 0.0, 1.0],
+    'scale': [1.0, 1.0, 1.0],
+}
+
+
+# ---------------------------------------------------------------------------
+# Чтение и запись GLB
+# ---------------------------------------------------------------------------
+
+def read_glb(filepath):
+    """
+    Читает GLB файл.
+    Возвращает: (gltf, bin_data) - JSON документ (dict) и бинарный буфер (bytearray)
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    return parse_glb(data)
+
+
+def parse_glb(data):
+    """Разбирает содержимое GLB файла (bytes). Возвращает: (gltf, bin_data)"""
+    if len(data) < 20:
+        raise ValueError("Файл слишком мал для GLB")
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError("Файл не является GLB (неверная сигнатура)")
+    if version != 2:
+        raise ValueError(f"Неподдерживаемая версия GLB: {version}")
+
+    gltf = None
+    bin_data = bytearray()
+    offset = 12
+    while offset + 8 <= length:
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(bytes(chunk).decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and not bin_data:
+            bin_data = bytearray(chunk)
+        offset += 8 + chunk_length
+
+    if gltf is None:
+        raise ValueError("В GLB нет JSON чанка")
+    if len(gltf.get('buffers', [])) > 1 or any('uri' in b for b in gltf.get('buffers', [])):
+        raise ValueError("Поддерживаются только GLB с одним встроенным буфером")
+    return gltf, bin_data
+
+
+def build_glb(gltf, bin_data):
+    """Собирает GLB (bytes) из JSON документа и бинарного буфера"""
+    if gltf.get('buffers'):
+        gltf['buffers'][0]['byteLength'] = len(bin_data)
+
+    json_bytes = json.dumps(gltf, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    json_bytes += b' ' * (-len(json_bytes) % 4)
+    bin_bytes = bytes(bin_data) + b'\x00' * (-len(bin_data) % 4)
+
+    total_length = 12 + 8 + len(json_bytes)
+    if bin_bytes:
+        total_length += 8 + len(bin_bytes)
+
+    parts = [
+        struct.pack('<III', GLB_MAGIC, 2, total_length),
+        struct.pack('<II', len(json_bytes), CHUNK_JSON),
+        json_bytes,
+    ]
+    if bin_bytes:
+        parts.append(struct.pack('<II', len(bin_bytes), CHUNK_BIN))
+        parts.append(bin_bytes)
+    return b''.join(parts)
+
+
+def write_glb(filepath, gltf, bin_data):
+    """Записывает GLB файл. Возвращает размер файла в байтах"""
+    data = build_glb(gltf, bin_data)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def read_gltf(filepath):
+    """
+    Читает GLB или .gltf с одним внешним .bin буфером (изображения остаются внешними файлами).
+    Возвращает: (gltf, bin_data)
+    """
+    if not filepath.lower().endswith('.gltf'):
+        return read_glb(filepath)
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        gltf = json.load(f)
+    buffers = gltf.get('buffers', [])
+    if len(buffers) > 1:
+        raise ValueError("Поддерживаются только .gltf с одним буфером")
+    bin_data = bytearray()
+    if buffers:
+        uri = buffers[0].get('uri', '')
+        if uri.startswith('data:'):
+            raise ValueError("Встроенные data: URI не поддерживаются, экспортируйте с отдельным .bin")
+        with open(os.path.join(os.path.dirname(filepath), unquote(uri)), 'rb') as f:
+            bin_data = bytearray(f.read())
+    return gltf, bin_data
+
+
+def write_gltf(filepath, gltf, bin_data):
+    """
+    Записывает GLB или .gltf + .bin (имя .bin совпадает с именем .gltf).
+    Возвращает суммарный размер записанных файлов в байтах.
+    """
+    if not filepath.lower().endswith('.gltf'):
+        return write_glb(filepath, gltf, bin_data)
+
+    if gltf.get('buffers'):
+        bin_name = os.path.splitext(os.path.basename(filepath))[0] + '.bin'
+        gltf['buffers'][0]['uri'] = quote(bin_name)
+        gltf['buffers'][0]['byteLength'] = len(bin_data)
+        with open(os.path.join(os.path.dirname(filepath), bin_name), 'wb') as f:
+            f.write(bin_data)
+    json_bytes = json.dumps(gltf, ensure_ascii=False, indent=2).encode('utf-8')
+    with open(filepath, 'wb') as f:
+        f.write(json_bytes)
+    return len(json_bytes) + len(bin_data)
+
+
+def gltf_file_size(filepath):
+    """Размер GLB файла или .gltf вместе с его .bin буферами (без изображений)"""
+    if not filepath.lower().endswith('.gltf'):
+        return os.path.getsize(filepath)
+    gltf, bin_data = read_gltf(filepath)
+    return os.path.getsize(filepath) + len(bin_data)
+
+
+# ---------------------------------------------------------------------------
+# Доступ к accessor'ам
+# ---------------------------------------------------------------------------
+
+def _read_view_array(gltf, bin_data, view_index, byte_offset, dtype, count, num_components):
+    """Читает массив (count, num_components) из bufferView с учетом byteStride"""
+    view = gltf['bufferViews'][view_index]
+    start = view.get('byteOffset', 0) + byte_offset
+    item_size = np.dtype(dtype).itemsize * num_components
+    stride = view.get('byteStride') or item_size
+
+    if count == 0:
+        return np.zeros((0, num_components), dtype=dtype)
+
+    if stride == item_size:
+        # Копия, а не представление: bin_data (bytearray) дальше может расширяться
+        array = np.frombuffer(bin_data, dtype=dtype, count=count * num_components, offset=start)
+        return array.reshape(count, num_components).copy()
+
+    # Чередующиеся данные: читаем строки с шагом stride
+    raw = np.frombuffer(bin_data, dtype=np.uint8, count=stride * (count - 1) + item_size, offset=start)
+    return np.lib.stride_tricks.as_strided(
+        raw[:item_size].view(dtype),
+        shape=(count, num_components),
+        strides=(stride, np.dtype(dtype).itemsize),
+    ).copy()
+
+
+def read_accessor(gltf, bin_data, accessor_index, normalize=True):
+    """
+    Читает accessor в массив NumPy формы (count, components).
+    Нормализованные целые значения переводятся во float (если normalize=True).
+    Разреженные (sparse) accessor'ы разворачиваются в плотный массив.
+    """
+    accessor = gltf['accessors'][accessor_index]
+    dtype = COMPONENT_DTYPES[accessor['componentType']]
+    num_components = TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+
+    if 'bufferView' in accessor:
+        array = _read_view_array(gltf, bin_data, accessor['bufferView'],
+                                 accessor.get('byteOffset', 0), dtype, count, num_components)
+    else:
+        array = np.zeros((count, num_components), dtype=dtype)
+
+    sparse = accessor.get('sparse')
+    if sparse:
+        array = array.copy()
+        indices_info = sparse['indices']
+        values_info = sparse['values']
+        indices = _read_view_array(gltf, bin_data, indices_info['bufferView'],
+                                   indices_info.get('byteOffset', 0),
+                                   COMPONENT_DTYPES[indices_info['componentType']],
+                                   sparse['count'], 1)[:, 0]
+        values = _read_view_array(gltf, bin_data, values_info['bufferView'],
+                                  values_info.get('byteOffset', 0), dtype,
+                                  sparse['count'], num_components)
+        array[indices.astype(np.int64)] = values
+
+    if normalize and accessor.get('normalized'):
+        divisor = NORMALIZED_DIVISORS[accessor['componentType']]
+        array = np.maximum(array.astype(np.float32) / divisor, -1.0)
+
+    return array
+
+
+def _dense_byte_length(accessor):
+    """Размер плотно упакованных данных accessor'а (без sparse части)"""
+    item_size = np.dtype(COMPONENT_DTYPES[accessor['componentType']]).itemsize
+    return accessor['count'] * TYPE_SIZES[accessor['type']] * item_size
+
+
+def _view_byte_span(accessor, byte_stride=None):
+    """Сколько байт bufferView занимает accessor с учетом byteStride"""
+    if not byte_stride or not accessor['count']:
+        return _dense_byte_length(accessor)
+    item_size = np.dtype(COMPONENT_DTYPES[accessor['componentType']]).itemsize
+    return byte_stride * (accessor['count'] - 1) + TYPE_SIZES[accessor['type']] * item_size
+
+
+def accessor_byte_length(gltf, accessor_index):
+    """Размер данных accessor'а в байтах (плотная упаковка + sparse часть)"""
+    accessor = gltf['accessors'][accessor_index]
+    item_size = np.dtype(COMPONENT_DTYPES[accessor['componentType']]).itemsize
+    size = 0
+    if 'bufferView' in accessor:
+        size += _dense_byte_length(accessor)
+    sparse = accessor.get('sparse')
+    if sparse:
+        index_size = np.dtype(COMPONENT_DTYPES[sparse['indices']['componentType']]).itemsize
+        size += sparse['count'] * (index_size + TYPE_SIZES[accessor['type']] * item_size)
+    return size
+
+
+def append_buffer_view(gltf, bin_data, data, target=None, byte_stride=None):
+    """
+    Добавляет данные в конец бинарного буфера (с выравниванием до 4 байт)
+    и создает для них bufferView. Возвращает индекс bufferView.
+    """
+    bin_data.extend(b'\x00' * (-len(bin_data) % 4))
+    view = {
+        'buffer': 0,
+        'byteOffset': len(bin_data),
+        'byteLength': len(data),
+    }
+    if byte_stride:
+        view['byteStride'] = byte_stride
+    if target:
+        view['target'] = target
+    bin_data.extend(data)
+
+    if not gltf.get('buffers'):
+        gltf['buffers'] = [{'byteLength': 0}]
+    gltf.setdefault('bufferViews', []).append(view)
+    return len(gltf['bufferViews']) - 1
+
+
+def add_accessor(gltf, bin_data, array, normalized=False, target=None, with_min_max=False):
+    """
+    Записывает массив (count, components) в буфер и создает accessor.
+    Для вершинных атрибутов (target=ARRAY_BUFFER) строки выравниваются до 4 байт.
+    Возвращает индекс accessor'а.
+    """
+    array = np.ascontiguousarray(array)
+    if array.ndim == 1:
+        array = array.reshape(-1, 1)
+    count, num_components = array.shape
+    component_type = DTYPE_COMPONENTS[array.dtype]
+
+    byte_stride = None
+    row_size = array.dtype.itemsize * num_components
+    if target == ARRAY_BUFFER and row_size % 4:
+        # Шаг вершинного атрибута должен быть кратен 4 байтам
+        byte_stride = row_size + (-row_size % 4)
+        padded = np.zeros((count, byte_stride), dtype=np.uint8)
+        padded[:, :row_size] = array.view(np.uint8).reshape(count, row_size)
+        data = padded.tobytes()
+    else:
+        data = array.tobytes()
+
+    accessor = {
+        'bufferView': append_buffer_view(gltf, bin_data, data, target, byte_stride),
+        'componentType': component_type,
+        'count': count,
+        'type': SIZE_TYPES[num_components],
+    }
+    if normalized:
+        accessor['normalized'] = True
+    if with_min_max and count:
+        accessor['min'] = array.min(axis=0).tolist()
+        accessor['max'] = array.max(axis=0).tolist()
+
+    gltf.setdefault('accessors', []).append(accessor)
+    return len(gltf['accessors']) - 1
+
+
+def _collect_accessor_refs(gltf):
+    """Собирает ссылки на accessor'ы: [(контейнер, ключ), ...]"""
+    refs = []
+    for mesh in gltf.get('meshes', []):
+        for primitive in mesh.get('primitives', []):
+            attributes = primitive.get('attributes', {})
+            refs.extend((attributes, key) for key in attributes)
+            if 'indices' in primitive:
+                refs.append((primitive, 'indices'))
+            for target in primitive.get('targets', []):
+                refs.extend((target, key) for key in target)
+    for animation in gltf.get('animations', []):
+        for sampler in animation.get('samplers', []):
+            refs.append((sampler, 'input'))
+            refs.append((sampler, 'output'))
+    for skin in gltf.get('skins', []):
+        if 'inverseBindMatrices' in skin:
+            refs.append((skin, 'inverseBindMatrices'))
+    for node in gltf.get('nodes', []):
+        instancing = node.get('extensions', {}).get('EXT_mesh_gpu_instancing')
+        if instancing:
+            attributes = instancing.get('attributes', {})
+            refs.extend((attributes, key) for key in attributes)
+    return refs
+
+
+def _collect_buffer_view_refs(value, refs):
+    """Рекурсивно собирает все ссылки 'bufferView' в JSON документе"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == 'bufferView' and isinstance(item, int):
+                refs.append((value, key))
+            else:
+                _collect_buffer_view_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_buffer_view_refs(item, refs)
+    return refs
+
+
+def compact_buffer(gltf, bin_data):
+    """
+    Удаляет неиспользуемые accessor'ы и bufferView и пересобирает бинарный буфер
+    без "дыр". Возвращает новый bin_data (bytearray).
+    """
+    # 1. Неиспользуемые accessor'ы
+    accessor_refs = _collect_accessor_refs(gltf)
+    used_accessors = sorted({container[key] for container, key in accessor_refs})
+    accessor_map = {old: new for new, old in enumerate(used_accessors)}
+    if gltf.get('accessors'):
+        gltf['accessors'] = [gltf['accessors'][i] for i in used_accessors]
+    for container, key in accessor_refs:
+        container[key] = accessor_map[container[key]]
+
+    # 2. Неиспользуемые bufferView (ссылки ищем по всему документу, включая расширения)
+    view_refs = _collect_buffer_view_refs({k: v for k, v in gltf.items() if k != 'bufferViews'}, [])
+    used_views = sorted({container[key] for container, key in view_refs})
+
+    # bufferView, на которые ссылаются только accessor'ы, можно сократить до реально
+    # используемых диапазонов (экспортеры часто кладут много accessor'ов в один view)
+    accessor_ids = {id(accessor) for accessor in gltf.get('accessors', [])}
+    whole_views = {container[key] for container, key in view_refs if id(container) not in accessor_ids}
+    view_accessors = {}
+    for accessor in gltf.get('accessors', []):
+        if 'bufferView' in accessor:
+            view_accessors.setdefault(accessor['bufferView'], []).append(accessor)
+
+    view_map = {}
+    new_views = []
+    new_bin = bytearray()
+    for old_index in used_views:
+        view = dict(gltf['bufferViews'][old_index])
+        start = view.get('byteOffset', 0)
+        new_bin.extend(b'\x00' * (-len(new_bin) % 4))
+        view_start = len(new_bin)
+
+        if old_index in whole_views:
+            new_bin.extend(bin_data[start:start + view['byteLength']])
+        else:
+            # Копируем только используемые диапазоны, сохраняя выравнивание по модулю 4
+            stride = view.get('byteStride')
+            ranges = sorted(
+                ((accessor.get('byteOffset', 0), accessor.get('byteOffset', 0) + _view_byte_span(accessor, stride),
+                  accessor) for accessor in view_accessors[old_index]),
+                key=lambda item: item[:2]
+            )
+            range_start = range_end = None
+            range_new_start = 0
+            for begin, end, accessor in ranges:
+                if range_end is None or begin > range_end:
+                    if range_end is not None:
+                        new_bin.extend(bin_data[start + range_start:start + range_end])
+                    range_start, range_end = begin, end
+                    new_bin.extend(b'\x00' * ((range_start - (len(new_bin) - view_start)) % 4))
+                    range_new_start = len(new_bin) - view_start
+                else:
+                    range_end = max(range_end, end)
+                accessor['byteOffset'] = range_new_start + (begin - range_start)
+            if range_end is not None:
+                new_bin.extend(bin_data[start + range_start:start + range_end])
+
+        view['byteOffset'] = view_start
+        view['byteLength'] = len(new_bin) - view_start
+        view_map[old_index] = len(new_views)
+        new_views.append(view)
+    for container, key in view_refs:
+        container[key] = view_map[container[key]]
+
+    if new_views:
+        gltf['bufferViews'] = new_views
+    else:
+        gltf.pop('bufferViews', None)
+    if gltf.get('buffers'):
+        gltf['buffers'][0]['byteLength'] = len(new_bin)
+    return new_bin
+
+
+# ---------------------------------------------------------------------------
+# Оптимизация анимаций
+# ---------------------------------------------------------------------------
+
+def _normalize_quaternions(q):
+    """Нормализует кватернионы (N, 4)"""
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    return q / np.where(norms > 0.0, norms, 1.0)
+
+
+def _slerp(q0, q1, t):
+    """Сферическая интерполяция массивов кватернионов (N, 4) с параметрами t (N,)"""
+    dot = np.sum(q0 * q1, axis=1)
+    # Выбираем кратчайший путь
+    q1 = np.where((dot < 0.0)[:, None], -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Для почти совпадающих кватернионов используем линейную интерполяцию
+    near = sin_theta < 1e-6
+    safe_sin = np.where(near, 1.0, sin_theta)
+    w0 = np.where(near, 1.0 - t, np.sin((1.0 - t) * theta) / safe_sin)
+    w1 = np.where(near, t, np.sin(t * theta) / safe_sin)
+    return _normalize_quaternions(w0[:, None] * q0 + w1[:, None] * q1)
+
+
+def _interpolate_segment(times, values, start, end, is_rotation):
+    """Значения между ключами start и end, восстановленные интерполяцией (для ключей start+1..end-1)"""
+    t = (times[start + 1:end] - times[start]) / max(times[end] - times[start], 1e-12)
+    count = end - start - 1
+    v0 = np.repeat(values[start:start + 1], count, axis=0)
+    v1 = np.repeat(values[end:end + 1], count, axis=0)
+    if is_rotation:
+        return _slerp(v0, v1, t)
+    return v0 + (v1 - v0) * t[:, None]
+
+
+def _value_error(expected, actual, is_rotation):
+    """
+    Ошибка между наборами значений (N,).
+    Для вращений - угол между кватернионами в радианах, иначе - максимальное отклонение компонента.
+    """
+    if len(expected) == 0:
+        return np.zeros(0)
+    if is_rotation:
+        dot = np.abs(np.sum(_normalize_quaternions(expected) * _normalize_quaternions(actual), axis=1))
+        return 2.0 * np.arccos(np.clip(dot, 0.0, 1.0))
+    return np.max(np.abs(expected - actual), axis=1)
+
+
+def evaluate_keys(key_times, key_values, times, is_rotation):
+    """Вычисляет значения линейно интерполируемого трека (key_times, key_values) в моменты times"""
+    if len(key_times) == 1:
+        return np.repeat(key_values, len(times), axis=0)
+    right = np.clip(np.searchsorted(key_times, times, side='right'), 1, len(key_times) - 1)
+    left = right - 1
+    span = np.maximum(key_times[right] - key_times[left], 1e-12)
+    t = np.clip((times - key_times[left]) / span, 0.0, 1.0)
+    if is_rotation:
+        return _slerp(key_values[left], key_values[right], t)
+    return key_values[left] + (key_values[right] - key_values[left]) * t[:, None]
+
+
+def reduce_keyframes(times, values, tolerance, is_rotation):
+    """
+    Жадное прореживание ключей: от текущего опорного ключа трек продлевается,
+    пока все промежуточные ключи восстанавливаются интерполяцией с ошибкой <= tolerance.
+    Возвращает индексы оставленных ключей.
+    """
+    count = len(times)
+    if count <= 2:
+        return np.arange(count)
+
+    kept = [0]
+    anchor = 0
+    candidate = 2
+    while candidate < count:
+        restored = _interpolate_segment(times, values, anchor, candidate, is_rotation)
+        error = _value_error(values[anchor + 1:candidate], restored, is_rotation)
+        if error.size and error.max() > tolerance:
+            # Ключ candidate-1 нужен
+            anchor = candidate - 1
+            kept.append(anchor)
+        candidate += 1
+    kept.append(count - 1)
+    return np.array(kept)
+
+
+def _quantize_rotations(values):
+    """Квантует кватернионы в нормализованный SHORT (допустимо для rotation в glTF 2.0)"""
+    quantized = np.round(_normalize_quaternions(values) * 32767.0)
+    return np.clip(quantized, -32767, 32767).astype(np.int16)
+
+
+def _quantize_linear(values, precision):
+    """Округляет значения до сетки precision (float сохраняется, данные лучше сжимаются gzip/brotli)"""
+    return (np.round(values / precision) * precision).astype(np.float32)
+
+
+def optimize_animations(gltf, bin_data, tolerance=1e-4, rotation_tolerance=np.radians(0.05),
+                        quantize=False, translation_precision=1e-4):
+    """
+    Оптимизирует анимации GLB документа:
+    - удаляет ключи, которые восстанавливаются LINEAR/SLERP интерполяцией с ошибкой
+      не больше tolerance (переводы/масштаб/веса) и rotation_tolerance (вращения, радианы)
+    - удаляет постоянные каналы, совпадающие с позой покоя узла
+      (остальные постоянные каналы сокращаются до двух ключей)
+    - при quantize=True квантует вращения в SHORT и округляет переводы до translation_precision
+
+    Возвращает: (bin_data, report), где report - список словарей по клипам:
+    {'name', 'bytes_before', 'bytes_after', 'keys_before', 'keys_after',
+     'channels_removed', 'max_error', 'max_rotation_error'}
+    """
+    report = []
+    nodes = gltf.get('nodes', [])
+
+    for anim_index, animation in enumerate(gltf.get('animations', [])):
+        samplers = animation.get('samplers', [])
+        channels = animation.get('channels', [])
+
+        # Путь канала для каждого сэмплера (rotation - SLERP, остальное - LINEAR)
+        sampler_paths = {}
+        for channel in channels:
+            sampler_paths.setdefault(channel['sampler'], set()).add(channel['target'].get('path'))
+
+        used_accessors = {s['input'] for s in samplers} | {s['output'] for s in samplers}
+        bytes_before = sum(accessor_byte_length(gltf, i) for i in used_accessors)
+
+        clip = {
+            'name': animation.get('name', f"animation_{anim_index}"),
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_before,
+            'keys_before': 0,
+            'keys_after': 0,
+            'channels_removed': 0,
+            'max_error': 0.0,
+            'max_rotation_error': 0.0,
+        }
+
+        removed_samplers = set()
+        input_cache = {}  # Одинаковые наборы времен используют один accessor
+
+        for sampler_index, sampler in enumerate(samplers):
+            paths = sampler_paths.get(sampler_index, set())
+            times = read_accessor(gltf, bin_data, sampler['input'])[:, 0].astype(np.float64)
+            clip['keys_before'] += len(times)
+
+            # CUBICSPLINE/STEP и сэмплеры с разными путями оставляем без изменений
+            if sampler.get('interpolation', 'LINEAR') != 'LINEAR' or len(paths) != 1:
+                clip['keys_after'] += len(times)
+                continue
+
+            path = next(iter(paths))
+            is_rotation = path == 'rotation'
+            values = read_accessor(gltf, bin_data, sampler['output']).astype(np.float64)
+            if len(times) == 0 or len(values) % len(times):
+                clip['keys_after'] += len(times)
+                continue
+
+            # Для весов морфов на ключ приходится несколько значений
+            values = values.reshape(len(times), -1)
+            if is_rotation:
+                values = _normalize_quaternions(values)
+            limit = rotation_tolerance if is_rotation else tolerance
+
+            # Постоянный канал
+            constant_error = _value_error(values, np.repeat(values[:1], len(values), axis=0), is_rotation)
+            if constant_error.max() <= limit:
+                rest_value = None
+                channel_nodes = [c['target'].get('node') for c in channels if c['sampler'] == sampler_index]
+                if path in DEFAULT_TRS and len(channel_nodes) == 1 and channel_nodes[0] is not None:
+                    rest_value = np.array([nodes[channel_nodes[0]].get(path, DEFAULT_TRS[path])], dtype=np.float64)
+                if rest_value is not None and _value_error(values[:1], rest_value, is_rotation)[0] <= limit:
+                    # Канал совпадает с позой покоя - удаляем целиком
+                    removed_samplers.add(sampler_index)
+                    clip['channels_removed'] += 1
+                    error = constant_error.max()
+                    if is_rotation:
+                        clip['max_rotation_error'] = max(clip['max_rotation_error'], float(error))
+                    else:
+                        clip['max_error'] = max(clip['max_error'], float(error))
+                    continue
+                # Оставляем первый и последний ключ, чтобы не изменилась длительность клипа
+                kept = np.array([0, len(times) - 1]) if len(times) > 1 else np.array([0])
+                key_values = np.repeat(values[:1], len(kept), axis=0)
+            else:
+                kept = reduce_keyframes(times, values, limit, is_rotation)
+                key_values = values[kept]
+            key_times = times[kept]
+
+            # Квантование
+            output_array = key_values.astype(np.float32)
+            normalized = False
+            if quantize and is_rotation:
+                output_array = _quantize_rotations(key_values)
+                normalized = True
+                key_values = output_array.astype(np.float64) / 32767.0
+            elif quantize and path == 'translation':
+                output_array = _quantize_linear(key_values, translation_precision)
+                key_values = output_array.astype(np.float64)
+
+            # Реальная ошибка итогового трека относительно исходных ключей
+            restored = evaluate_keys(key_times, key_values, times, is_rotation)
+            error = _value_error(values, restored, is_rotation)
+            error = float(error.max()) if error.size else 0.0
+            if is_rotation:
+                clip['max_rotation_error'] = max(clip['max_rotation_error'], error)
+            else:
+                clip['max_error'] = max(clip['max_error'], error)
+            clip['keys_after'] += len(kept)
+
+            times_key = key_times.astype(np.float32).tobytes()
+            if times_key not in input_cache:
+                input_cache[times_key] = add_accessor(
+                    gltf, bin_data, key_times.astype(np.float32), with_min_max=True)
+            sampler['input'] = input_cache[times_key]
+            sampler['output'] = add_accessor(
+                gltf, bin_data, output_array.reshape(-1, output_array.shape[1] if path != 'weights' else 1),
+                normalized=normalized)
+
+        # Удаляем каналы и сэмплеры постоянных треков
+        if removed_samplers:
+            sampler_map = {}
+            new_samplers = []
+            for index, sampler in enumerate(samplers):
+                if index not in removed_samplers:
+                    sampler_map[index] = len(new_samplers)
+                    new_samplers.append(sampler)
+            animation['channels'] = [dict(c, sampler=sampler_map[c['sampler']])
+                                     for c in channels if c['sampler'] not in removed_samplers]
+            animation['samplers'] = new_samplers
+
+        used_accessors = {s['input'] for s in animation['samplers']} | {s['output'] for s in animation['samplers']}
+        clip['bytes_after'] = sum(accessor_byte_length(gltf, i) for i in used_accessors)
+        report.append(clip)
+
+    # Клипы без каналов невалидны - удаляем их
+    if gltf.get('animations'):
+        gltf['animations'] = [a for a in gltf['animations'] if a.get('channels')]
+        if not gltf['animations']:
+            gltf.pop('animations')
+
+    return compact_buffer(gltf, bin_data), report
+
+
+def format_animation_report(report):
+    """Форматирует отчет optimize_animations в список строк"""
+    lines = []
+    for clip in report:
+        saved = clip['bytes_before'] - clip['bytes_after']
+        lines.append(
+            f"  - '{clip['name']}': {clip['bytes_before']} -> {clip['bytes_after']} байт "
+            f"(сэкономлено {saved}), ключей {clip['keys_before']} -> {clip['keys_after']}, "
+            f"удалено каналов: {clip['channels_removed']}, "
+            f"макс. ошибка: {clip['max_error']:.6f}, "
+            f"макс. ошибка вращения: {np.degrees(clip['max_rotation_error']):.4f}°"
+        )
+    return lines
+
+
+# ---------------------------------------------------------------------------
+# Оптимизация индексных буферов под кеш вершин
+# ---------------------------------------------------------------------------
+
+# Размер кеша вершин после трансформации (FIFO), под который оптимизируется порядок
+VERTEX_CACHE_SIZE = 16
+
+# Режим примитива "треугольники" (по умолчанию в glTF)
+MODE_TRIANGLES = 4
+
+
+def compute_acmr(indices, cache_size=VERTEX_CACHE_SIZE):
+    """
+    Считает ACMR (среднее число промахов кеша вершин на треугольник)
+    для FIFO кеша размера cache_size.
+    """
+    triangle_count = len(indices) // 3
+    if not triangle_count:
+        return 0.0
+
+    # Вершина в кеше, пока после ее загрузки произошло меньше cache_size промахов
+    stamps = {}
+    misses = 0
+    for vertex in indices.tolist():
+        stamp = stamps.get(vertex)
+        if stamp is None or misses - stamp >= cache_size:
+            misses += 1
+            stamps[vertex] = misses
+    return misses / triangle_count
+
+
+def _vertex_triangle_adjacency(indices, vertex_count):
+    """Списки смежности вершина -> треугольники (CSR): (offsets, triangles)"""
+    order = np.argsort(indices, kind='stable')
+    triangles = order // 3
+    counts = np.bincount(indices, minlength=vertex_count)
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, triangles
+
+
+def tipsify(indices, vertex_count, cache_size=VERTEX_CACHE_SIZE):
+    """
+    Переупорядочивает треугольники алгоритмом Tipsify (Sander, Nehab, Barczak, 2007).
+    indices - плоский массив индексов треугольников. Возвращает новый плоский массив индексов.
+    """
+    triangle_count = len(indices) // 3
+    if triangle_count < 2:
+        return indices.copy()
+
+    offsets, adjacency = _vertex_triangle_adjacency(indices, vertex_count)
+    offsets = offsets.tolist()
+    adjacency = adjacency.tolist()
+    triangles = indices.reshape(-1, 3).tolist()
+
+    live = np.bincount(indices, minlength=vertex_count).tolist()  # Неиспользованные треугольники вершины
+    cache_time = [0] * vertex_count
+    emitted = [False] * triangle_count
+    dead_end = []
+    output = []
+
+    timestamp = cache_size + 1
+    cursor = 0
+    fanning = int(indices[0])
+
+    while fanning >= 0:
+        candidates = []
+        for triangle in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[triangle]:
+                continue
+            for vertex in triangles[triangle]:
+                output.append(vertex)
+                dead_end.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if timestamp - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = timestamp
+                    timestamp += 1
+            emitted[triangle] = True
+
+        # Выбираем следующую вершину-веер: находящуюся в кеше и с наибольшим "возрастом"
+        fanning = -1
+        best_priority = -1
+        for vertex in candidates:
+            if live[vertex] <= 0:
+                continue
+            priority = 0
+            if timestamp - cache_time[vertex] + 2 * live[vertex] <= cache_size:
+                priority = timestamp - cache_time[vertex]
+            if priority > best_priority:
+                best_priority = priority
+                fanning = vertex
+
+        if fanning == -1:
+            # Тупик: берем последнюю использованную вершину с неиспользованными треугольниками
+            while dead_end:
+                vertex = dead_end.pop()
+                if live[vertex] > 0:
+                    fanning = vertex
+                    break
+        if fanning == -1:
+            while cursor < vertex_count:
+                if live[cursor] > 0:
+                    fanning = cursor
+                    break
+                cursor += 1
+
+    return np.array(output, dtype=indices.dtype)
+
+
+def vertex_fetch_order(indices, vertex_count):
+    """
+    Порядок вершин по первому использованию в индексном буфере
+    (неиспользуемые вершины идут в конце в исходном порядке).
+    Возвращает: (order, remap) - order[new] = old, remap[old] = new
+    """
+    _, first_positions = np.unique(indices, return_index=True)
+    used = indices[np.sort(first_positions)]
+    unused = np.setdiff1d(np.arange(vertex_count), used, assume_unique=True)
+    order = np.concatenate([used, unused]).astype(np.int64)
+    remap = np.empty(vertex_count, dtype=np.int64)
+    remap[order] = np.arange(vertex_count)
+    return order, remap
+
+
+def _replace_accessor_data(gltf, bin_data, accessor_index, array, target):
+    """Создает accessor с новыми данными, сохраняя тип, нормализацию и min/max исходного"""
+    old = gltf['accessors'][accessor_index]
+    new_index = add_accessor(gltf, bin_data, array.astype(COMPONENT_DTYPES[old['componentType']]),
+                             normalized=old.get('normalized', False), target=target)
+    new = gltf['accessors'][new_index]
+    for key in ('min', 'max', 'name'):
+        if key in old:
+            new[key] = old[key]
+    return new_index
+
+
+def optimize_vertex_cache(gltf, bin_data, cache_size=VERTEX_CACHE_SIZE):
+    """
+    Оптимизирует индексные буферы треугольных примитивов под кеш вершин (Tipsify),
+    затем переупорядочивает вершины в порядке обращения (vertex fetch).
+    Вершины переупорядочиваются, только если их accessor'ы не используются другими примитивами.
+
+    Возвращает: (bin_data, report), где report - список словарей по примитивам:
+    {'name', 'triangles', 'acmr_before', 'acmr_after', 'changed', 'vertices_reordered'}
+    (changed=False - перестановка не улучшила ACMR, примитив оставлен как есть)
+    """
+    # Сколько раз каждый accessor используется как атрибут (общие accessor'ы переставлять нельзя)
+    attribute_users = {}
+    for mesh in gltf.get('meshes', []):
+        for primitive in mesh.get('primitives', []):
+            accessors = list(primitive.get('attributes', {}).values())
+            for target in primitive.get('targets', []):
+                accessors.extend(target.values())
+            for accessor_index in accessors:
+                attribute_users[accessor_index] = attribute_users.get(accessor_index, 0) + 1
+
+    report = []
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        for primitive_index, primitive in enumerate(mesh.get('primitives', [])):
+            if primitive.get('mode', MODE_TRIANGLES) != MODE_TRIANGLES or 'indices' not in primitive:
+                continue
+            if 'extensions' in primitive:
+                # Например, KHR_draco_mesh_compression - данные хранятся в сжатом виде
+                continue
+            vertex_count = gltf['accessors'][primitive['attributes']['POSITION']]['count']
+            indices = read_accessor(gltf, bin_data, primitive['indices'])[:, 0].astype(np.int64)
+            if len(indices) < 6:
+                continue
+
+            acmr_before = compute_acmr(indices, cache_size)
+            new_indices = tipsify(indices, vertex_count, cache_size)
+            acmr_after = compute_acmr(new_indices, cache_size)
+            if acmr_after >= acmr_before:
+                # Исходный порядок не хуже - оставляем примитив без изменений
+                report.append({
+                    'name': f"{mesh.get('name', f'mesh_{mesh_index}')}[{primitive_index}]",
+                    'triangles': len(indices) // 3,
+                    'acmr_before': acmr_before,
+                    'acmr_after': acmr_before,
+                    'changed': False,
+                    'vertices_reordered': False,
+                })
+                continue
+
+            vertex_accessors = list(primitive['attributes'].values())
+            for target in primitive.get('targets', []):
+                vertex_accessors.extend(target.values())
+            can_reorder = all(attribute_users[i] == 1 for i in vertex_accessors)
+
+            if can_reorder:
+                order, remap = vertex_fetch_order(new_indices, vertex_count)
+                new_indices = remap[new_indices]
+                for key, accessor_index in primitive['attributes'].items():
+                    data = read_accessor(gltf, bin_data, accessor_index, normalize=False)
+                    primitive['attributes'][key] = _replace_accessor_data(
+                        gltf, bin_data, accessor_index, data[order], ARRAY_BUFFER)
+                for target in primitive.get('targets', []):
+                    for key, accessor_index in target.items():
+                        data = read_accessor(gltf, bin_data, accessor_index, normalize=False)
+                        target[key] = _replace_accessor_data(
+                            gltf, bin_data, accessor_index, data[order], ARRAY_BUFFER)
+
+            primitive['indices'] = _replace_accessor_data(
+                gltf, bin_data, primitive['indices'], new_indices.reshape(-1, 1), ELEMENT_ARRAY_BUFFER)
+
+            report.append({
+                'name': f"{mesh.get('name', f'mesh_{mesh_index}')}[{primitive_index}]",
+                'triangles': len(indices) // 3,
+                'acmr_before': acmr_before,
+                'acmr_after': acmr_after,
+                'changed': True,
+                'vertices_reordered': can_reorder,
+            })
+
+    return compact_buffer(gltf, bin_data), report
+
+
+def format_vertex_cache_report(report):
+    """Форматирует отчет optimize_vertex_cache в список строк (с итоговым ACMR по всем примитивам)"""
+    lines = []
+    total_triangles = sum(item['triangles'] for item in report)
+    for item in report:
+        if not item['changed']:
+            reordered = " (без изменений: перестановка не улучшает ACMR)"
+        elif not item['vertices_reordered']:
+            reordered = " (вершины общие, переставлены только индексы)"
+        else:
+            reordered = ""
+        lines.append(
+            f"  - '{item['name']}': {item['triangles']} треугольников, "
+            f"ACMR {item['acmr_before']:.3f} -> {item['acmr_after']:.3f}{reordered}"
+        )
+    if total_triangles:
+        before = sum(item['acmr_before'] * item['triangles'] for item in report) / total_triangles
+        after = sum(item['acmr_after'] * item['triangles'] for item in report) / total_triangles
+        lines.append(f"  Итого: {total_triangles} треугольников, ACMR {before:.3f} -> {after:.3f}")
+    return lines
+
+
+# ---------------------------------------------------------------------------
+# Оптимизация морф-таргетов
+# ---------------------------------------------------------------------------
+
+# Квантование дельт морф-таргетов (KHR_mesh_quantization): нормализованные целые,
+# допустимо только если все дельты атрибута в диапазоне [-1, 1]
+MORPH_QUANTIZED_DTYPES = {'POSITION': np.int16, 'NORMAL': np.int8, 'TANGENT': np.int8}
+
+
+def _write_morph_accessor(gltf, bin_data, array, sparse):
+    """
+    Записывает дельты морф-таргета: sparse accessor (только сдвинутые вершины, без bufferView),
+    если он меньше плотного массива, иначе обычный accessor.
+    Возвращает: (индекс accessor'а, записан ли sparse)
+    """
+    count, num_components = array.shape
+    normalized = array.dtype != np.float32
+    moved = np.flatnonzero(np.any(array != 0, axis=1))
+    index_dtype = np.uint8 if count <= 256 else np.uint16 if count <= 65536 else np.uint32
+    sparse_bytes = len(moved) * (np.dtype(index_dtype).itemsize + array.dtype.itemsize * num_components)
+
+    if sparse and sparse_bytes < array.nbytes:
+        # bufferView sparse части не должны иметь target и byteStride
+        accessor = {
+            'componentType': DTYPE_COMPONENTS[array.dtype],
+            'count': count,
+            'type': SIZE_TYPES[num_components],
+            'sparse': {
+                'count': len(moved),
+                'indices': {
+                    'bufferView': append_buffer_view(gltf, bin_data, moved.astype(index_dtype).tobytes()),
+                    'componentType': DTYPE_COMPONENTS[np.dtype(index_dtype)],
+                },
+                'values': {
+                    'bufferView': append_buffer_view(gltf, bin_data, np.ascontiguousarray(array[moved]).tobytes()),
+                },
+            },
+        }
+        if normalized:
+            accessor['normalized'] = True
+        gltf['accessors'].append(accessor)
+        accessor_index = len(gltf['accessors']) - 1
+        is_sparse = True
+    else:
+        accessor_index = add_accessor(gltf, bin_data, array, normalized=normalized, target=ARRAY_BUFFER)
+        is_sparse = False
+
+    # min/max - по хранимым значениям (для POSITION обязательны)
+    accessor = gltf['accessors'][accessor_index]
+    accessor['min'] = array.min(axis=0).tolist()
+    accessor['max'] = array.max(axis=0).tolist()
+    return accessor_index, is_sparse
+
+
+def _remove_morph_targets(gltf, bin_data, mesh_index, keep, target_count):
+    """
+    Оставляет у меша только таргеты keep: примитивы, веса меша и узлов, targetNames
+    и треки анимации весов. Если таргетов не осталось, треки весов удаляются.
+    """
+    mesh = gltf['meshes'][mesh_index]
+    for primitive in mesh.get('primitives', []):
+        if 'targets' in primitive:
+            primitive['targets'] = [primitive['targets'][t] for t in keep]
+            if not keep:
+                primitive.pop('targets')
+
+    def filter_weights(container):
+        if 'weights' in container:
+            container['weights'] = [container['weights'][t] for t in keep]
+            if not keep:
+                container.pop('weights')
+
+    filter_weights(mesh)
+    extras = mesh.get('extras', {})
+    if len(extras.get('targetNames', [])) == target_count:
+        extras['targetNames'] = [extras['targetNames'][t] for t in keep]
+        if not keep:
+            extras.pop('targetNames')
+    mesh_nodes = set()
+    for node_index, node in enumerate(gltf.get('nodes', [])):
+        if node.get('mesh') == mesh_index:
+            mesh_nodes.add(node_index)
+            filter_weights(node)
+
+    for animation in gltf.get('animations', []):
+        samplers = animation.get('samplers', [])
+        weight_samplers = {channel['sampler'] for channel in animation.get('channels', [])
+                           if channel['target'].get('path') == 'weights'
+                           and channel['target'].get('node') in mesh_nodes}
+        if not keep:
+            animation['channels'] = [channel for channel in animation['channels']
+                                     if channel['sampler'] not in weight_samplers]
+            used = sorted({channel['sampler'] for channel in animation['channels']})
+            sampler_map = {old: new for new, old in enumerate(used)}
+            animation['samplers'] = [samplers[i] for i in used]
+            for channel in animation['channels']:
+                channel['sampler'] = sampler_map[channel['sampler']]
+            continue
+        for sampler_index in weight_samplers:
+            sampler = samplers[sampler_index]
+            # Для CUBICSPLINE на ключ приходится три набора весов - фильтр по столбцам тот же
+            values = read_accessor(gltf, bin_data, sampler['output']).reshape(-1, target_count)
+            sampler['output'] = add_accessor(gltf, bin_data, values[:, keep].reshape(-1, 1).astype(np.float32))
+
+    if gltf.get('animations'):
+        gltf['animations'] = [a for a in gltf['animations'] if a.get('channels')]
+        if not gltf['animations']:
+            gltf.pop('animations')
+
+
+def optimize_morph_targets(gltf, bin_data, sparse=True, quantize=False, zero_tolerance=1e-6):
+    """
+    Оптимизирует морф-таргеты (shape keys):
+    - дельты по модулю не больше zero_tolerance считаются нулевыми
+    - атрибут таргета без смещений удаляется из таргета, таргет без смещений во всех
+      примитивах удаляется из меша (вместе с весами и треками анимации весов)
+    - при sparse=True дельты записываются sparse accessor'ом, если так меньше
+    - при quantize=True дельты POSITION записываются нормализованным SHORT, NORMAL/TANGENT -
+      нормализованным BYTE (KHR_mesh_quantization), если все значения в диапазоне [-1, 1]
+
+    Возвращает: (bin_data, report), где report - список словарей по таргетам:
+    {'name', 'bytes_before', 'bytes_after', 'moved', 'vertices', 'removed', 'sparse', 'quantized', 'max_error'}
+    """
+    report = []
+    quantized_any = False
+    converted = {}  # Общие accessor'ы обрабатываются один раз: старый индекс -> (новый или None, sparse)
+
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        primitives = [p for p in mesh.get('primitives', []) if p.get('targets')]
+        if not primitives or any('extensions' in p for p in primitives):
+            # Например, KHR_draco_mesh_compression - таргеты хранятся в сжатом виде
+            continue
+        target_count = len(primitives[0]['targets'])
+        target_names = mesh.get('extras', {}).get('targetNames', [])
+        mesh_name = mesh.get('name', f"mesh_{mesh_index}")
+        entries = [{
+            'name': f"{mesh_name}:{target_names[t] if t < len(target_names) else t}",
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'moved': 0,
+            'vertices': 0,
+            'removed': False,
+            'sparse': 0,
+            'quantized': 0,
+            'max_error': 0.0,
+        } for t in range(target_count)]
+
+        for primitive in primitives:
+            for target_index, target in enumerate(primitive['targets']):
+                entry = entries[target_index]
+                for key in list(target):
+                    accessor_index = target[key]
+                    entry['bytes_before'] += accessor_byte_length(gltf, accessor_index)
+                    values = read_accessor(gltf, bin_data, accessor_index).astype(np.float32)
+                    values[np.abs(values) <= zero_tolerance] = 0.0
+                    moved = np.any(values != 0.0, axis=1)
+                    if key == 'POSITION':
+                        entry['moved'] += int(moved.sum())
+                        entry['vertices'] += len(values)
+
+                    if accessor_index not in converted:
+                        if not moved.any():
+                            converted[accessor_index] = (None, False)
+                        else:
+                            stored = values
+                            dtype = MORPH_QUANTIZED_DTYPES.get(key)
+                            source_dtype = np.dtype(COMPONENT_DTYPES[gltf['accessors'][accessor_index]['componentType']])
+                            if source_dtype != np.float32:
+                                # Уже квантованные дельты сохраняют свой тип
+                                stored = np.round(values * np.iinfo(source_dtype).max).astype(source_dtype)
+                            elif quantize and dtype is not None and np.abs(values).max() <= 1.0:
+                                scale = np.iinfo(dtype).max
+                                stored = np.round(values * scale).astype(dtype)
+                                error = float(np.abs(stored / scale - values).max())
+                                entry['max_error'] = max(entry['max_error'], error)
+                                entry['quantized'] += 1
+                                quantized_any = True
+                            converted[accessor_index] = _write_morph_accessor(gltf, bin_data, stored, sparse)
+
+                    new_index, is_sparse = converted[accessor_index]
+                    if new_index is None:
+                        del target[key]
+                        continue
+                    target[key] = new_index
+                    entry['sparse'] += is_sparse
+                    entry['bytes_after'] += accessor_byte_length(gltf, new_index)
+
+        keep = [t for t in range(target_count) if any(p['targets'][t] for p in primitives)]
+        if len(keep) < target_count:
+            for t in range(target_count):
+                entries[t]['removed'] = t not in keep
+            _remove_morph_targets(gltf, bin_data, mesh_index, keep, target_count)
+        report.extend(entries)
+
+    if quantized_any:
+        for key in ('extensionsUsed', 'extensionsRequired'):
+            extensions = gltf.setdefault(key, [])
+            if 'KHR_mesh_quantization' not in extensions:
+                extensions.append('KHR_mesh_quantization')
+
+    return compact_buffer(gltf, bin_data), report
+
+
+def format_morph_report(report):
+    """Форматирует отчет optimize_morph_targets в список строк"""
+    lines = []
+    for item in report:
+        saved = item['bytes_before'] - item['bytes_after']
+        details = f"сдвинуто вершин {item['moved']}/{item['vertices']}"
+        if item['removed']:
+            details += ", удален (нет смещений)"
+        if item['sparse']:
+            details += f", sparse: {item['sparse']}"
+        if item['quantized']:
+            details += f", квантовано: {item['quantized']} (макс. ошибка {item['max_error']:.6f})"
+        lines.append(f"  - '{item['name']}': {item['bytes_before']} -> {item['bytes_after']} байт "
+                     f"(сэкономлено {saved}), {details}")
+    if report:
+        before = sum(item['bytes_before'] for item in report)
+        after = sum(item['bytes_after'] for item in report)
+        lines.append(f"  Итого: {len(report)} таргетов, {before} -> {after} байт")
+    return lines
+
+
+# ---------------------------------------------------------------------------
+# Сжатие текстур в KTX2 (KHR_texture_basisu)
+# ---------------------------------------------------------------------------
+
+# Кеш закодированных текстур: <хеш исходника и параметров>.ktx2
+KTX2_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ktx2_cache")
+
+# Параметры toktx (KTX-Software 4.x): ETC1S - цвет (sRGB), UASTC - нормали и линейные данные
+BASISU_ENCODER_ARGS = {
+    'etc1s': ['--encode', 'etc1s', '--clevel', '1', '--qlevel', '128', '--assign_oetf', 'srgb'],
+    'uastc': ['--encode', 'uastc', '--uastc_quality', '2', '--zcmp', '19', '--assign_oetf', 'linear'],
+}
+
+# Байт на пиксель после транскодирования на GPU: ETC1S -> ETC2 RGB (ETC2 RGBA с альфой),
+# UASTC -> ASTC 4x4 / BC7 / ETC2 RGBA
+BASISU_GPU_BYTES_PER_PIXEL = {'etc1s': 0.5, 'etc1s_alpha': 1.0, 'uastc': 1.0}
+
+# Слоты текстур материала, в которых лежат цветные (sRGB) изображения
+COLOR_TEXTURE_SLOTS = ('baseColorTexture', 'emissiveTexture', 'diffuseTexture', 'specularGlossinessTexture')
+
+IMAGE_EXTENSIONS = {'image/png': '.png', 'image/jpeg': '.jpg'}
+
+
+def find_basisu_encoder(encoder=None):
+    """Путь к toktx: явно заданный или найденный в PATH. Возвращает None, если энкодера нет"""
+    if encoder:
+        return encoder if os.path.isfile(encoder) else shutil.which(encoder)
+    return shutil.which('toktx')
+
+
+def _texture_image_modes(gltf):
+    """
+    Режим кодирования для каждого изображения по слотам материалов, в которых оно используется:
+    цветные слоты - ETC1S, остальные (нормали, ORM, occlusion) - UASTC.
+    Изображение сразу в цветном и линейном слоте кодируется как UASTC.
+    Возвращает: {индекс изображения: 'etc1s' или 'uastc'}
+    """
+    textures = gltf.get('textures', [])
+    modes = {}
+
+    # Слоты ищутся рекурсивно: в pbrMetallicRoughness и в расширениях материалов
+    def visit(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, dict) and 'index' in item and key.endswith('Texture'):
+                    source = textures[item['index']].get('source') if item['index'] < len(textures) else None
+                    if source is not None and modes.get(source) != 'uastc':
+                        modes[source] = 'etc1s' if key in COLOR_TEXTURE_SLOTS else 'uastc'
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+
+    visit(gltf.get('materials', []))
+    return modes
+
+
+def _read_image_bytes(gltf, bin_data, image, base_dir):
+    """Содержимое изображения из bufferView или внешнего файла (None для data: URI и KTX2)"""
+    if image.get('mimeType') == 'image/ktx2':
+        return None
+    if 'bufferView' in image:
+        view = gltf['bufferViews'][image['bufferView']]
+        start = view.get('byteOffset', 0)
+        return bytes(bin_data[start:start + view['byteLength']])
+    uri = image.get('uri', '')
+    if not uri or uri.startswith('data:'):
+        return None
+    with open(os.path.join(base_dir, unquote(uri)), 'rb') as f:
+        return f.read()
+
+
+def encode_ktx2(encoder, data, extension, mode, cache_dir):
+    """
+    Кодирует изображение в KTX2 с мип-уровнями (toktx). Результат кешируется по хешу
+    исходника и параметров кодирования - повторный экспорт тех же текстур не кодирует их заново.
+    Возвращает: (путь к .ktx2 в кеше, взят ли из кеша)
+    """
+    args = BASISU_ENCODER_ARGS[mode]
+    digest = hashlib.sha256(data)
+    digest.update(" ".join([mode] + args).encode('utf-8'))
+    cache_path = os.path.join(cache_dir, digest.hexdigest() + ".ktx2")
+    if os.path.exists(cache_path):
+        return cache_path, True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=cache_dir) as temp_dir:
+        source_path = os.path.join(temp_dir, "source" + extension)
+        output_path = os.path.join(temp_dir, "output.ktx2")
+        with open(source_path, 'wb') as f:
+            f.write(data)
+        result = subprocess.run(
+            [encoder, '--t2', '--genmipmap'] + args + [output_path, source_path],
+            capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            raise RuntimeError((result.stderr or result.stdout).strip() or f"код выхода {result.returncode}")
+        os.replace(output_path, cache_path)
+    return cache_path, False
+
+
+def _remove_unused_images(gltf):
+    """Удаляет изображения, на которые не ссылается ни одна текстура (с учетом расширений)"""
+    refs = []
+    for texture in gltf.get('textures', []):
+        if 'source' in texture:
+            refs.append(texture)
+        for extension in texture.get('extensions', {}).values():
+            if 'source' in extension:
+                refs.append(extension)
+    used = sorted({ref['source'] for ref in refs})
+    image_map = {old: new for new, old in enumerate(used)}
+    gltf['images'] = [gltf['images'][i] for i in used]
+    for ref in refs:
+        ref['source'] = image_map[ref['source']]
+    if not gltf['images']:
+        gltf.pop('images')
+
+
+def encode_basisu_textures(gltf, bin_data, base_dir, encoder=None, jobs=None, cache_dir=KTX2_CACHE_DIR,
+                           keep_fallback=False, output_dir=None):
+    """
+    Кодирует изображения материалов в KTX2 (KHR_texture_basisu): ETC1S для цвета,
+    UASTC для карт нормалей и линейных данных (ORM, occlusion), с мип-уровнями.
+    Изображения кодируются параллельно (jobs процессов энкодера), результат кешируется в cache_dir.
+    keep_fallback=True - исходные PNG/JPEG остаются как запасной вариант (расширение не обязательное),
+    иначе они удаляются и KHR_texture_basisu становится обязательным.
+    Изображения, которые не удалось закодировать, остаются без изменений.
+    Внешние изображения (.gltf) читаются из base_dir, а .ktx2 пишутся в output_dir
+    (папка выходного файла; по умолчанию base_dir).
+
+    Возвращает: (bin_data, report), где report - список словарей по изображениям:
+    {'name', 'mode', 'width', 'height', 'bytes_before', 'bytes_after', 'gpu_before', 'gpu_after', 'cached', 'error'}
+    """
+    encoder_path = find_basisu_encoder(encoder)
+    if encoder_path is None:
+        raise FileNotFoundError(f"Энкодер KTX2 не найден: {encoder or 'toktx'} (установите KTX-Software)")
+
+    images = gltf.get('images', [])
+    tasks = []
+    for image_index, mode in sorted(_texture_image_modes(gltf).items()):
+        image = images[image_index]
+        data = _read_image_bytes(gltf, bin_data, image, base_dir)
+        if data is None:
+            continue
+        header = texture_catalog.probe_stream(io.BytesIO(data))
+        extension = IMAGE_EXTENSIONS.get(image.get('mimeType'), os.path.splitext(unquote(image.get('uri', '')))[1])
+        tasks.append((image_index, mode, data, header, extension or '.png'))
+
+    def encode(task):
+        image_index, mode, data, header, extension = task
+        try:
+            return encode_ktx2(encoder_path, data, extension, mode, cache_dir) + (None,)
+        except (OSError, RuntimeError) as e:
+            return None, False, str(e)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        results = list(pool.map(encode, tasks))
+
+    report = []
+    encoded = {}  # индекс исходного изображения -> индекс KTX2 изображения
+    for (image_index, mode, data, header, extension), (ktx2_path, cached, error) in zip(tasks, results):
+        image = images[image_index]
+        width, height, channels, bit_depth = header or (0, 0, 0, 8)
+        gpu_before = texture_catalog.estimate_texture_memory(width, height, bit_depth)[1]
+        item = {
+            'name': image.get('name') or image.get('uri') or str(image_index),
+            'mode': mode,
+            'width': width,
+            'height': height,
+            'bytes_before': len(data),
+            'bytes_after': len(data),
+            'gpu_before': gpu_before,
+            'gpu_after': gpu_before,
+            'cached': cached,
+            'error': error,
+        }
+        report.append(item)
+        if ktx2_path is None:
+            continue
+
+        with open(ktx2_path, 'rb') as f:
+            ktx2_data = f.read()
+        ktx2_image = {'mimeType': 'image/ktx2'}
+        if 'name' in image:
+            ktx2_image['name'] = image['name']
+        if 'bufferView' in image:
+            ktx2_image['bufferView'] = append_buffer_view(gltf, bin_data, ktx2_data)
+        else:
+            ktx2_uri = os.path.splitext(unquote(image['uri']))[0] + ".ktx2"
+            ktx2_file = os.path.join(output_dir or base_dir, ktx2_uri)
+            os.makedirs(os.path.dirname(ktx2_file), exist_ok=True)
+            with open(ktx2_file, 'wb') as f:
+                f.write(ktx2_data)
+            ktx2_image['uri'] = quote(ktx2_uri)
+        images.append(ktx2_image)
+        encoded[image_index] = len(images) - 1
+
+        gpu_key = 'etc1s_alpha' if mode == 'etc1s' and channels in (2, 4) else mode
+        item['bytes_after'] = len(ktx2_data)
+        item['gpu_after'] = int(width * height * BASISU_GPU_BYTES_PER_PIXEL[gpu_key] * 4 / 3)
+
+    for texture in gltf.get('textures', []):
+        if texture.get('source') in encoded:
+            texture.setdefault('extensions', {})['KHR_texture_basisu'] = {'source': encoded[texture['source']]}
+            if not keep_fallback:
+                texture.pop('source')
+
+    if encoded:
+        extension_lists = ('extensionsUsed',) if keep_fallback else ('extensionsUsed', 'extensionsRequired')
+        for key in extension_lists:
+            extensions = gltf.setdefault(key, [])
+            if 'KHR_texture_basisu' not in extensions:
+                extensions.append('KHR_texture_basisu')
+        if not keep_fallback:
+            _remove_unused_images(gltf)
+
+    return compact_buffer(gltf, bin_data), report
+
+
+def format_basisu_report(report):
+    """Форматирует отчет encode_basisu_textures в список строк (с итоговой памятью GPU)"""
+    mb = 1024 * 1024
+    lines = []
+    for item in report:
+        if item['error']:
+            lines.append(f"  - '{item['name']}': ⚠ не закодировано ({item['error']})")
+            continue
+        cached = ", из кеша" if item['cached'] else ""
+        lines.append(
+            f"  - '{item['name']}' ({item['mode'].upper()}, {item['width']}x{item['height']}{cached}): "
+            f"{item['bytes_before']} -> {item['bytes_after']} байт, "
+            f"GPU {item['gpu_before'] / mb:.2f} -> {item['gpu_after'] / mb:.2f} МБ"
+        )
+    if report:
+        gpu_before = sum(item['gpu_before'] for item in report)
+        gpu_after = sum(item['gpu_after'] for item in report)
+        lines.append(f"  Итого GPU (с мип-уровнями): {gpu_before / mb:.1f} -> {gpu_after / mb:.1f} МБ")
+    return lines
+
+
+# ---------------------------------------------------------------------------
+# Командная строка
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Оптимизация GLB файлов после экспорта")
+    parser.add_argument('input', help="Входной GLB (или .gltf с отдельным .bin) файл")
+    parser.add_argument('-o', '--output', help="Выходной файл (по умолчанию - перезапись входного)")
+    parser.add_argument('--animations', action='store_true', help="Оптимизировать анимации")
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help="Допустимая ошибка переводов/масштаба/весов (по умолчанию 1e-4)")
+    parser.add_argument('--rotation-tolerance', type=float, default=0.05,
+                        help="Допустимая ошибка вращений в градусах (по умолчанию 0.05)")
+    parser.add_argument('--quantize-animations', action='store_true',
+                        help="Квантовать вращения (SHORT) и переводы")
+    parser.add_argument('--vertex-cache', action='store_true',
+                        help="Оптимизировать индексные буферы под кеш вершин")
+    parser.add_argument('--cache-size', type=int, default=VERTEX_CACHE_SIZE,
+                        help=f"Размер FIFO кеша вершин (по умолчанию {VERTEX_CACHE_SIZE})")
+    parser.add_argument('--morphs', action='store_true',
+                        help="Оптимизировать морф-таргеты (sparse, удаление пустых таргетов)")
+    parser.add_argument('--quantize-morphs', action='store_true',
+                        help="Квантовать дельты морф-таргетов (KHR_mesh_quantization)")
+    parser.add_argument('--morph-tolerance', type=float, default=1e-6,
+                        help="Дельты не больше этого значения считаются нулевыми (по умолчанию 1e-6)")
+    parser.add_argument('--ktx2', action='store_true',
+                        help="Сжать текстуры в KTX2 (KHR_texture_basisu) энкодером toktx")
+    parser.add_argument('--ktx2-encoder', default=None, help="Путь к toktx (по умолчанию - из PATH)")
+    parser.add_argument('--ktx2-fallback', action='store_true',
+                        help="Оставить исходные PNG/JPEG как запасной вариант")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Количество одновременно работающих энкодеров (по умолчанию - число ядер)")
+    args = parser.parse_args(argv)
+
+    gltf, bin_data = read_gltf(args.input)
+    size_before = gltf_file_size(args.input)
+
+    if args.animations:
+        bin_data, report = optimize_animations(
+            gltf, bin_data,
+            tolerance=args.tolerance,
+            rotation_tolerance=np.radians(args.rotation_tolerance),
+            quantize=args.quantize_animations,
+        )
+        print("Анимации:")
+        for line in format_animation_report(report):
+            print(line)
+
+    if args.vertex_cache:
+        bin_data, report = optimize_vertex_cache(gltf, bin_data, cache_size=args.cache_size)
+        print("Кеш вершин:")
+        for line in format_vertex_cache_report(report):
+            print(line)
+
+    if args.morphs:
+        bin_data, report = optimize_morph_targets(
+            gltf, bin_data, quantize=args.quantize_morphs, zero_tolerance=args.morph_tolerance)
+        print("Морф-таргеты:")
+        for line in format_morph_report(report):
+            print(line)
+
+    if args.ktx2:
+        try:
+            bin_data, report = encode_basisu_textures(
+                gltf, bin_data, os.path.dirname(os.path.abspath(args.input)),
+                encoder=args.ktx2_encoder, jobs=args.jobs, keep_fallback=args.ktx2_fallback,
+                output_dir=os.path.dirname(os.path.abspath(args.output or args.input)))
+        except FileNotFoundError as e:
+            print(f"✗ {e}")
+            return 1
+        print("Текстуры KTX2:")
+        for line in format_basisu_report(report):
+            print(line)
+
+    output = args.output or args.input
+    size_after = write_gltf(output, gltf, bin_data)
+    print(f"✓ {output}: {size_before} -> {size_after} байт")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
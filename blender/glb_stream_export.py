@@ -0,0 +1,408 @@
+"""
+Потоковая запись GLB для Material Manager (запускается внутри Blender)
+
+Альтернатива bpy.ops.export_scene.gltf для больших статических сцен:
+меши, материалы (Principled BSDF) и изображения. Данные каждого объекта
+читаются через foreach_get в NumPy и сразу пишутся на диск как bufferView,
+файлы изображений копируются блоками. В памяти одновременно находятся
+данные только одного объекта.
+
+Порядок записи: BIN чанк пишется во временный файл рядом с результатом,
+в конце пишутся заголовок и JSON чанк (их размер известен только после
+всех объектов), затем BIN копируется блоками.
+
+Не поддерживаются: анимации, скиннинг, shape keys, камеры и источники света.
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import bpy
+import numpy as np
+
+import texture_catalog
+
+GLB_MAGIC = 0x46546C67  # b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+MODE_TRIANGLES = 4
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Blender (Z вверх) -> glTF (Y вверх): (x, y, z) -> (x, z, -y)
+AXIS_CONVERSION = np.array([
+    [1.0, 0.0, 0.0, 0.0],
+    [0.0, 0.0, 1.0, 0.0],
+    [0.0, -1.0, 0.0, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+])
+
+IMAGE_MIME_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg'}
+
+
+class BinWriter:
+    """Пишет bufferView во временный файл BIN чанка и ведет список bufferViews"""
+
+    def __init__(self, directory):
+        handle, self.path = tempfile.mkstemp(suffix='.bin', dir=directory)
+        self.file = os.fdopen(handle, 'w+b')
+        self.offset = 0
+        self.buffer_views = []
+
+    def _align(self):
+        padding = (-self.offset) % 4
+        if padding:
+            self.file.write(b'\x00' * padding)
+            self.offset += padding
+
+    def add_view(self, data, target=None, byte_stride=None):
+        """Записывает массив NumPy или bytes как bufferView. Возвращает индекс bufferView"""
+        self._align()
+        payload = data.tobytes() if isinstance(data, np.ndarray) else data
+        self.file.write(payload)
+        view = {'buffer': 0, 'byteOffset': self.offset, 'byteLength': len(payload)}
+        if target is not None:
+            view['target'] = target
+        if byte_stride is not None:
+            view['byteStride'] = byte_stride
+        self.offset += len(payload)
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def add_file(self, file_path):
+        """Копирует файл блоками в bufferView. Возвращает индекс bufferView"""
+        self._align()
+        start = self.offset
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+                self.file.write(chunk)
+                self.offset += len(chunk)
+        self.buffer_views.append({'buffer': 0, 'byteOffset': start, 'byteLength': self.offset - start})
+        return len(self.buffer_views) - 1
+
+    def close(self):
+        self._align()
+        self.file.flush()
+
+    def copy_to(self, output):
+        """Копирует BIN блоками в открытый файл результата"""
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, output, COPY_CHUNK_SIZE)
+
+    def remove(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StreamingGlbExporter:
+    """Собирает JSON glTF и пишет данные объектов по одному"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.gltf = {
+            'asset': {'version': '2.0', 'generator': 'Material Manager streaming GLB writer'},
+            'scene': 0,
+            'scenes': [{'nodes': []}],
+            'nodes': [],
+            'meshes': [],
+            'accessors': [],
+        }
+        self.bin = BinWriter(os.path.dirname(os.path.abspath(filepath)) or None)
+        self.mesh_cache = {}  # (имя меша, материалы слотов) без модификаторов -> индекс glTF меша
+        self.material_cache = {}  # материал -> индекс glTF материала
+        self.image_cache = {}  # изображение -> индекс glTF текстуры
+        self.temp_files = []
+
+    # -- Accessors --------------------------------------------------------
+
+    def add_accessor(self, array, component_type, accessor_type, target, with_min_max=False):
+        view_index = self.bin.add_view(np.ascontiguousarray(array), target=target)
+        accessor = {
+            'bufferView': view_index,
+            'componentType': component_type,
+            'count': len(array),
+            'type': accessor_type,
+        }
+        if with_min_max:
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        self.gltf['accessors'].append(accessor)
+        return len(self.gltf['accessors']) - 1
+
+    # -- Images and materials ---------------------------------------------
+
+    def add_image(self, image):
+        """Встраивает изображение (файл копируется блоками). Возвращает индекс текстуры или None"""
+        if image in self.image_cache:
+            return self.image_cache[image]
+
+        file_path = bpy.path.abspath(image.filepath) if image.filepath else ""
+        extension = os.path.splitext(file_path)[1].lower()
+        # Пиксели в памяти могут отличаться от файла: изменены (is_dirty) или уменьшены
+        # бюджетом текстур (копия сохраняет путь исходного файла) - тогда файл не подходит
+        modified = image.is_dirty
+        if not modified and image.packed_file is None and os.path.isfile(file_path):
+            header = texture_catalog.probe_image(file_path)
+            modified = header is not None and tuple(header[:2]) != tuple(image.size)
+
+        if not modified and image.packed_file is None and os.path.isfile(file_path) \
+                and extension in IMAGE_MIME_TYPES:
+            view_index = self.bin.add_file(file_path)
+            mime_type = IMAGE_MIME_TYPES[extension]
+        elif not modified and image.packed_file is not None and image.file_format in ('PNG', 'JPEG'):
+            view_index = self.bin.add_view(bytes(image.packed_file.data))
+            mime_type = 'image/png' if image.file_format == 'PNG' else 'image/jpeg'
+        elif image.file_format in ('PNG', 'JPEG'):
+            # Пиксели из памяти в том же формате (сохранение копии, путь изображения не меняется)
+            suffix, mime_type = ('.png', 'image/png') if image.file_format == 'PNG' else ('.jpg', 'image/jpeg')
+            handle, temp_path = tempfile.mkstemp(suffix=suffix)
+            os.close(handle)
+            self.temp_files.append(temp_path)
+            image.save(filepath=temp_path)
+            view_index = self.bin.add_file(temp_path)
+        else:
+            # Другие форматы (BMP, TIFF, сгенерированные) сохраняются во временный PNG
+            handle, temp_path = tempfile.mkstemp(suffix='.png')
+            os.close(handle)
+            self.temp_files.append(temp_path)
+            image_copy = image.copy()
+            try:
+                image_copy.filepath_raw = temp_path
+                image_copy.file_format = 'PNG'
+                image_copy.save()
+            finally:
+                bpy.data.images.remove(image_copy)
+            view_index = self.bin.add_file(temp_path)
+            mime_type = 'image/png'
+
+        images = self.gltf.setdefault('images', [])
+        images.append({'name': image.name, 'bufferView': view_index, 'mimeType': mime_type})
+        if 'samplers' not in self.gltf:
+            self.gltf['samplers'] = [{'magFilter': 9729, 'minFilter': 9987, 'wrapS': 10497, 'wrapT': 10497}]
+        textures = self.gltf.setdefault('textures', [])
+        textures.append({'sampler': 0, 'source': len(images) - 1})
+        self.image_cache[image] = len(textures) - 1
+        return self.image_cache[image]
+
+    def linked_image(self, socket):
+        """Изображение, подключенное к сокету напрямую или через Normal Map / Separate Color"""
+        if not socket.is_linked:
+            return None
+        node = socket.links[0].from_node
+        if node.type in ('NORMAL_MAP', 'SEPARATE_COLOR', 'SEPRGB'):
+            # У Normal Map первый вход - Strength; у Separate Color ('Color') и устаревшего
+            # Separate RGB ('Image') изображение подключается к первому входу
+            input_socket = node.inputs['Color'] if node.type == 'NORMAL_MAP' else node.inputs[0]
+            if not input_socket.is_linked:
+                return None
+            node = input_socket.links[0].from_node
+        if node.type == 'TEX_IMAGE' and node.image is not None:
+            return node.image
+        return None
+
+    def add_material(self, material):
+        """Материал Principled BSDF -> glTF pbrMetallicRoughness. Возвращает индекс материала"""
+        if material in self.material_cache:
+            return self.material_cache[material]
+
+        gltf_material = {'name': material.name}
+        pbr = {}
+        bsdf = None
+        if material.use_nodes:
+            bsdf = next((node for node in material.node_tree.nodes if node.type == 'BSDF_PRINCIPLED'), None)
+
+        if bsdf is not None:
+            base_image = self.linked_image(bsdf.inputs['Base Color'])
+            if base_image is not None:
+                pbr['baseColorTexture'] = {'index': self.add_image(base_image)}
+            else:
+                pbr['baseColorFactor'] = list(bsdf.inputs['Base Color'].default_value)
+
+            metallic_image = self.linked_image(bsdf.inputs['Metallic'])
+            roughness_image = self.linked_image(bsdf.inputs['Roughness'])
+            if metallic_image is not None and metallic_image == roughness_image:
+                # ORM: G - Roughness, B - Metallic
+                pbr['metallicRoughnessTexture'] = {'index': self.add_image(metallic_image)}
+            else:
+                pbr['metallicFactor'] = float(bsdf.inputs['Metallic'].default_value)
+                pbr['roughnessFactor'] = float(bsdf.inputs['Roughness'].default_value)
+
+            normal_image = self.linked_image(bsdf.inputs['Normal'])
+            if normal_image is not None:
+                gltf_material['normalTexture'] = {'index': self.add_image(normal_image)}
+
+            for node in material.node_tree.nodes:
+                if node.type == 'GROUP' and node.node_tree and 'Occlusion' in node.inputs:
+                    occlusion_image = self.linked_image(node.inputs['Occlusion'])
+                    if occlusion_image is not None:
+                        gltf_material['occlusionTexture'] = {'index': self.add_image(occlusion_image)}
+        else:
+            pbr['baseColorFactor'] = list(material.diffuse_color)
+
+        gltf_material['pbrMetallicRoughness'] = pbr
+        materials = self.gltf.setdefault('materials', [])
+        materials.append(gltf_material)
+        self.material_cache[material] = len(materials) - 1
+        return self.material_cache[material]
+
+    # -- Meshes -----------------------------------------------------------
+
+    def add_mesh(self, obj, mesh):
+        """
+        Пишет меш: вершины разделяются по (вершина, нормаль угла, UV), один примитив на материал.
+        Возвращает индекс glTF меша или None для пустого меша.
+        """
+        mesh.calc_loop_triangles()
+        triangle_count = len(mesh.loop_triangles)
+        if triangle_count == 0:
+            return None
+
+        triangle_loops = np.empty(triangle_count * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('loops', triangle_loops)
+        triangle_materials = np.empty(triangle_count, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('material_index', triangle_materials)
+
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get('co', coords)
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', loop_vertices)
+        normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        mesh.corner_normals.foreach_get('vector', normals)
+        normals = normals.reshape(-1, 3)
+
+        columns = [loop_vertices[:, None], normals.view(np.int32)]
+        uv_layer = next((layer for layer in mesh.uv_layers if layer.active_render), mesh.uv_layers.active)
+        uvs = None
+        if uv_layer is not None:
+            uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+            uv_layer.data.foreach_get('uv', uvs)
+            uvs = uvs.reshape(-1, 2)
+            columns.append(uvs.view(np.int32))
+
+        # Уникальные вершины glTF среди углов треугольников
+        keys = np.hstack(columns)[triangle_loops]
+        _, first_loops, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        unique_loops = triangle_loops[first_loops]
+        indices = inverse.reshape(-1).astype(np.uint32)
+        del keys
+
+        positions = coords.reshape(-1, 3)[loop_vertices[unique_loops]]
+        attributes = {
+            'POSITION': self.add_accessor(self.to_gltf_axes(positions), FLOAT, 'VEC3', ARRAY_BUFFER, True),
+            'NORMAL': self.add_accessor(self.to_gltf_axes(normals[unique_loops]), FLOAT, 'VEC3', ARRAY_BUFFER),
+        }
+        if uvs is not None:
+            texcoords = uvs[unique_loops].copy()
+            texcoords[:, 1] = 1.0 - texcoords[:, 1]
+            attributes['TEXCOORD_0'] = self.add_accessor(texcoords, FLOAT, 'VEC2', ARRAY_BUFFER)
+
+        index_dtype, index_component = (np.uint16, UNSIGNED_SHORT) if len(unique_loops) < 65536 \
+            else (np.uint32, UNSIGNED_INT)
+        triangle_indices = indices.reshape(-1, 3)
+        primitives = []
+        for material_index in np.unique(triangle_materials):
+            primitive_indices = triangle_indices[triangle_materials == material_index].reshape(-1).astype(index_dtype)
+            primitive = {
+                'attributes': attributes,
+                'indices': self.add_accessor(primitive_indices, index_component, 'SCALAR', ELEMENT_ARRAY_BUFFER),
+                'mode': MODE_TRIANGLES,
+            }
+            if material_index < len(obj.material_slots) and obj.material_slots[material_index].material:
+                primitive['material'] = self.add_material(obj.material_slots[material_index].material)
+            primitives.append(primitive)
+
+        self.gltf['meshes'].append({'name': mesh.name, 'primitives': primitives})
+        return len(self.gltf['meshes']) - 1
+
+    @staticmethod
+    def to_gltf_axes(vectors):
+        """Переводит векторы из осей Blender в оси glTF"""
+        return np.ascontiguousarray(vectors[:, [0, 2, 1]] * np.array([1.0, 1.0, -1.0], dtype=np.float32))
+
+    def add_object(self, obj, depsgraph):
+        """Добавляет объект как корневой узел с мировой матрицей"""
+        mesh_index = None
+        # Материалы примитивов берутся из слотов объекта (могут быть привязаны к объекту)
+        cache_key = None
+        if not obj.modifiers:
+            cache_key = (obj.data.name, tuple(slot.material.name if slot.material else None
+                                              for slot in obj.material_slots))
+        if cache_key is not None and cache_key in self.mesh_cache:
+            mesh_index = self.mesh_cache[cache_key]
+        else:
+            evaluated = obj.evaluated_get(depsgraph)
+            mesh = evaluated.to_mesh()
+            try:
+                mesh_index = self.add_mesh(obj, mesh)
+            finally:
+                evaluated.to_mesh_clear()
+            if cache_key is not None:
+                self.mesh_cache[cache_key] = mesh_index
+        if mesh_index is None:
+            return
+
+        matrix = AXIS_CONVERSION @ np.array(obj.matrix_world) @ AXIS_CONVERSION.T
+        node = {'name': obj.name, 'mesh': mesh_index}
+        if not np.allclose(matrix, np.eye(4)):
+            # glTF хранит матрицу по столбцам
+            node['matrix'] = matrix.T.reshape(-1).tolist()
+        self.gltf['nodes'].append(node)
+        self.gltf['scenes'][0]['nodes'].append(len(self.gltf['nodes']) - 1)
+
+    # -- Output -----------------------------------------------------------
+
+    def finish(self):
+        """Пишет заголовок, JSON чанк и копирует BIN чанк. Возвращает размер файла"""
+        self.bin.close()
+        self.gltf['buffers'] = [{'byteLength': self.bin.offset}]
+        self.gltf['bufferViews'] = self.bin.buffer_views
+        json_bytes = json.dumps(self.gltf, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        json_bytes += b' ' * ((-len(json_bytes)) % 4)
+        total_length = 12 + 8 + len(json_bytes) + 8 + self.bin.offset
+
+        with open(self.filepath, 'wb') as output:
+            output.write(struct.pack('<III', GLB_MAGIC, 2, total_length))
+            output.write(struct.pack('<II', len(json_bytes), CHUNK_JSON))
+            output.write(json_bytes)
+            output.write(struct.pack('<II', self.bin.offset, CHUNK_BIN))
+            self.bin.copy_to(output)
+        return total_length
+
+    def cleanup(self):
+        self.bin.remove()
+        for temp_path in self.temp_files:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def export_glb(filepath, objects, depsgraph=None):
+    """
+    Экспортирует меш-объекты в GLB потоковой записью.
+    Возвращает: {'objects': записано объектов, 'meshes': мешей, 'images': изображений, 'size': байт}
+    """
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+    exporter = StreamingGlbExporter(filepath)
+    try:
+        for obj in objects:
+            if obj.type == 'MESH':
+                exporter.add_object(obj, depsgraph)
+        size = exporter.finish()
+    finally:
+        exporter.cleanup()
+    return {
+        'objects': len(exporter.gltf['nodes']),
+        'meshes': len(exporter.gltf['meshes']),
+        'images': len(exporter.gltf.get('images', [])),
+        'size': size,
+    }
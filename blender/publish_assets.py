@@ -0,0 +1,261 @@
+"""
+Скрипт публикации экспортированных ассетов (GLB/OBJ/текстуры) для деплоя
+Использование (Blender не нужен):
+    python publish_assets.py <файлы или папки> [--out public/assets] [--jobs N]
+
+Что делает скрипт:
+1. Считает хеш содержимого каждого файла и копирует его под именем
+   <имя>.<хеш><расширение> (имя меняется только при изменении содержимого)
+2. Рядом пишет сжатые копии .br (Brotli, quality 11) и .gz (gzip, level 9),
+   сжатие выполняется параллельно в нескольких процессах
+3. Файлы, хеш которых уже опубликован, пропускаются (недостающие .br/.gz досоздаются,
+   копии, сжатие которых не уменьшает размер, запоминаются и больше не пересжимаются)
+4. Обновляет <папка>-manifest.json (assets-manifest.json для public/assets):
+   исходное имя -> опубликованное имя
+
+Благодаря неизменяемым именам для папки /assets/* можно выставить
+Cache-Control: immutable (см. netlify.toml). Манифест имеет постоянное имя,
+поэтому пишется рядом с папкой публикации (не внутри нее) и отдается с no-cache.
+Рядом же лежит .<папка>-publish-state.json - состояние публикации (несжимаемые файлы).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    # Brotli не входит в стандартную библиотеку: pip install brotli
+    brotli = None
+
+# Папка публикации по умолчанию (относительно корня проекта)
+PUBLISH_DIR = Path(__file__).resolve().parent.parent / "public" / "assets"
+# Манифест и состояние публикации пишутся рядом с папкой: <папка>-manifest.json
+MANIFEST_SUFFIX = "-manifest.json"
+STATE_SUFFIX = "-publish-state.json"
+# Имя манифеста прежних версий (внутри папки публикации)
+MANIFEST_NAME = "assets-manifest.json"
+
+# Расширения публикуемых файлов (в нижнем регистре)
+SUPPORTED_EXTENSIONS = ['.glb', '.gltf', '.bin', '.obj', '.mtl',
+                        '.png', '.jpg', '.jpeg', '.webp', '.ktx2', '.svg']
+
+# Длина хеша в имени файла (hex-символов)
+HASH_LENGTH = 16
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(file_path):
+    """
+    Считает SHA-256 содержимого файла (чтение блоками, без загрузки целиком).
+    Возвращает первые HASH_LENGTH hex-символов.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(file_path, content_hash):
+    """Возвращает имя файла с хешем содержимого: model.glb -> model.<hash>.glb"""
+    path = Path(file_path)
+    return f"{path.stem}.{content_hash}{path.suffix.lower()}"
+
+
+def collect_files(inputs):
+    """
+    Собирает список публикуемых файлов из переданных путей (папки обходятся рекурсивно).
+    Возвращает: [(file_path, relative_name), ...]
+    """
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for file_path in sorted(path.rglob('*')):
+                if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                    files.append((file_path, file_path.relative_to(path).as_posix()))
+        elif path.is_file():
+            if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                files.append((path, path.name))
+            else:
+                print(f"⚠ Пропущен файл с неподдерживаемым расширением: {path}")
+        else:
+            print(f"⚠ Путь не найден: {path}")
+    return files
+
+
+def _write_atomic(target, data):
+    """Записывает файл через временное имя, чтобы не оставлять недописанных файлов"""
+    tmp_path = target.with_name(target.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, target)
+
+
+def compress_file(source, target, method):
+    """
+    Сжимает файл максимальным уровнем и пишет результат рядом (выполняется в дочернем процессе).
+    Если сжатие не уменьшает размер (например, у JPEG), файл не пишется.
+    Возвращает: (target, original_size, compressed_size или None)
+    """
+    data = Path(source).read_bytes()
+    if method == 'br':
+        compressed = brotli.compress(data, quality=11)
+    else:
+        # mtime=0 - одинаковый результат при повторной публикации
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+    if len(compressed) >= len(data):
+        return str(target), len(data), None
+
+    _write_atomic(Path(target), compressed)
+    return str(target), len(data), len(compressed)
+
+
+def manifest_path_for(out_dir):
+    """
+    Путь манифеста: рядом с папкой публикации, а не в ней - файлы папки кешируются
+    как immutable, а манифест меняется при каждой публикации. Имя включает имя папки,
+    чтобы разные папки публикации с общим родителем не делили один манифест
+    (public/assets -> public/assets-manifest.json).
+    """
+    out_dir = Path(out_dir)
+    return out_dir.parent / f"{out_dir.name}{MANIFEST_SUFFIX}"
+
+
+def state_path_for(out_dir):
+    """Путь состояния публикации (скрытый файл рядом с манифестом)"""
+    out_dir = Path(out_dir)
+    return out_dir.parent / f".{out_dir.name}{STATE_SUFFIX}"
+
+
+def load_state(out_dir):
+    """
+    Загружает состояние публикации.
+    Возвращает: {'incompressible': {опубликованное имя: [методы, не уменьшившие размер]}}
+    """
+    state_path = state_path_for(out_dir)
+    if not state_path.exists():
+        return {'incompressible': {}}
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    state.setdefault('incompressible', {})
+    return state
+
+
+def load_manifest(out_dir):
+    """Загружает манифест опубликованных файлов (или пустой словарь)"""
+    manifest_path = manifest_path_for(out_dir)
+    if not manifest_path.exists():
+        # Манифест прежних версий лежал внутри папки публикации
+        manifest_path = Path(out_dir) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def publish_assets(inputs, out_dir=PUBLISH_DIR, jobs=None):
+    """
+    Публикует файлы в out_dir под хешированными именами и пишет сжатые копии.
+    Возвращает словарь манифеста: {исходное имя: опубликованное имя}
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if brotli is None:
+        print("⚠ Модуль brotli не установлен (pip install brotli) - файлы .br не будут созданы")
+
+    manifest = load_manifest(out_dir)
+    state = load_state(out_dir)
+    incompressible = state['incompressible']
+    files = collect_files(inputs)
+    if not files:
+        print("⚠ Нет файлов для публикации")
+        return manifest
+
+    compress_tasks = []
+    published_count = 0
+    skipped_count = 0
+
+    for file_path, relative_name in files:
+        content_hash = file_hash(file_path)
+        relative_target = Path(relative_name).with_name(hashed_name(file_path, content_hash))
+        target = out_dir / relative_target
+        manifest[relative_name] = relative_target.as_posix()
+
+        methods = ['gz', 'br'] if brotli is not None else ['gz']
+        if target.exists():
+            # Такое содержимое уже опубликовано - имя совпадает. Пересжимаются только
+            # отсутствующие копии прерванной публикации (сжатие, не уменьшившее размер,
+            # записано в состоянии: содержимое под этим именем не меняется)
+            skip_methods = incompressible.get(relative_target.as_posix(), [])
+            methods = [method for method in methods
+                       if method not in skip_methods and not Path(f"{target}.{method}").exists()]
+            skipped_count += 1
+            print(f"  = {relative_name} (уже опубликован как {relative_target.as_posix()})")
+        else:
+            # Копия через временное имя: прерванное копирование не считается опубликованным файлом
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(target.name + '.tmp')
+            shutil.copyfile(file_path, tmp_path)
+            os.replace(tmp_path, target)
+            published_count += 1
+            print(f"✓ {relative_name} -> {relative_target.as_posix()}")
+
+        for method in methods:
+            compress_tasks.append((relative_target.as_posix(), (str(target), f"{target}.{method}", method)))
+
+    # Сжатие - самая долгая часть, распределяем ее по процессам
+    if compress_tasks:
+        total_original = 0
+        total_compressed = 0
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(published_name, task[2], executor.submit(compress_file, *task))
+                       for published_name, task in compress_tasks]
+            for published_name, method, future in futures:
+                target, original_size, compressed_size = future.result()
+                name = os.path.relpath(target, out_dir)
+                if compressed_size is None:
+                    methods = incompressible.setdefault(published_name, [])
+                    if method not in methods:
+                        methods.append(method)
+                    print(f"  - {name}: сжатие не уменьшает размер, пропущено")
+                    continue
+                total_original += original_size
+                total_compressed += compressed_size
+                ratio = compressed_size / original_size * 100
+                print(f"  ✓ {name}: {original_size} -> {compressed_size} байт ({ratio:.1f}%)")
+        if total_original:
+            print(f"Сжатие: {total_original} -> {total_compressed} байт")
+
+    manifest_path = manifest_path_for(out_dir)
+    _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+    _write_atomic(state_path_for(out_dir), json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+
+    print(f"\nОпубликовано: {published_count}, пропущено (уже опубликованы): {skipped_count}")
+    print(f"Манифест: {manifest_path}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Публикация ассетов под хешированными именами с .br/.gz копиями")
+    parser.add_argument('inputs', nargs='+', help="Файлы или папки с ассетами")
+    parser.add_argument('--out', default=str(PUBLISH_DIR), help="Папка публикации")
+    parser.add_argument('--jobs', type=int, default=None, help="Количество процессов сжатия")
+    args = parser.parse_args(argv)
+
+    publish_assets(args.inputs, args.out, args.jobs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,712 @@
+"""
+Постоянный каталог текстур в SQLite для Material Manager (Blender не нужен)
+Использование:
+    python texture_catalog.py <папка с текстурами> [--catalog texture_catalog.sqlite] [--force]
+
+Каталог хранит папки и файлы текстур вместе с метаданными (размер файла,
+разрешение, количество каналов, глубина цвета, хеш содержимого).
+Обход папок рекурсивный (os.scandir в пуле потоков), повторно сканируются
+только папки, у которых изменилось время модификации. Разрешение читается
+из заголовка файла (первые сотни байт), без декодирования изображения,
+заголовки файлов папки читаются параллельно. По разрешению оценивается
+память под декодированные изображения и под текстуры на GPU.
+
+ZIP архивы считаются папками: <архив.zip>/<папка внутри архива>. Содержимое
+берется из центрального каталога архива, без распаковки. Файлы архива
+извлекаются только при обращении (хеш, загрузка) в кеш, где имя файла -
+хеш его содержимого.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Расширения текстур (в нижнем регистре)
+SUPPORTED_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif']
+
+# Архивы текстур, которые читаются как папки
+ARCHIVE_EXTENSIONS = ['.zip']
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL,
+    texture_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories(parent);
+CREATE TABLE IF NOT EXISTS textures (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    channels INTEGER,
+    bit_depth INTEGER,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS textures_directory ON textures(directory);
+CREATE INDEX IF NOT EXISTS textures_hash ON textures(hash);
+"""
+
+# Количество каналов PNG по типу цвета
+PNG_COLOR_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# Маркеры JPEG SOF (кроме DHT 0xC4, JPG 0xC8, DAC 0xCC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Суффиксы карт PBR набора: <имя>_<суффикс>.<расширение> (без учета регистра)
+PBR_MAP_SUFFIXES = {
+    'basecolor': ('basecolor', 'base_color', 'albedo', 'diffuse', 'color', 'col'),
+    'normal': ('normal', 'normalgl', 'normal_gl', 'nrm', 'nor'),
+    'roughness': ('roughness', 'rough', 'rgh'),
+    'metallic': ('metallic', 'metalness', 'metal'),
+    'ao': ('ao', 'ambientocclusion', 'ambient_occlusion', 'occlusion'),
+}
+PBR_SUFFIX_RE = re.compile(
+    r'^(?P<name>.+?)[ _.-]+(?P<suffix>' + '|'.join(
+        sorted((suffix for suffixes in PBR_MAP_SUFFIXES.values() for suffix in suffixes), key=len, reverse=True)
+    ) + r')$',
+    re.IGNORECASE
+)
+PBR_SUFFIX_TYPES = {suffix: map_type for map_type, suffixes in PBR_MAP_SUFFIXES.items() for suffix in suffixes}
+
+# Пул потоков для чтения заголовков (создается при первом использовании)
+_probe_pool = None
+
+
+# ---------------------------------------------------------------------------
+# Чтение заголовков изображений
+# ---------------------------------------------------------------------------
+
+def _probe_png(f, head):
+    if head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', head[16:26])
+    return width, height, PNG_COLOR_CHANNELS.get(color_type, 4), bit_depth
+
+
+def _probe_jpeg(f, head):
+    if head[:2] != b'\xff\xd8':
+        return None
+    offset = 2
+    while True:
+        f.seek(offset)
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # Заполняющий байт
+            offset += 1
+            continue
+        length = struct.unpack('>H', marker[2:4])[0]
+        if code in JPEG_SOF_MARKERS:
+            sof = f.read(6)
+            if len(sof) < 6:
+                return None
+            bit_depth, height, width, components = struct.unpack('>BHHB', sof)
+            return width, height, components, bit_depth
+        offset += 2 + length
+
+
+def _probe_bmp(f, head):
+    if head[:2] != b'BM' or len(head) < 30:
+        return None
+    width, height = struct.unpack('<ii', head[18:26])
+    bits_per_pixel = struct.unpack('<H', head[28:30])[0]
+    channels = 4 if bits_per_pixel == 32 else 3
+    return abs(width), abs(height), channels, 8
+
+
+def _probe_tiff(f, head):
+    if head[:4] == b'II*\x00':
+        endian = '<'
+    elif head[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        return None
+    ifd_offset = struct.unpack(endian + 'I', head[4:8])[0]
+    f.seek(ifd_offset)
+    entry_count = struct.unpack(endian + 'H', f.read(2))[0]
+    entries = f.read(entry_count * 12)
+
+    width = height = None
+    channels = 1
+    bit_depth = 8
+    for index in range(entry_count):
+        tag, field_type, count = struct.unpack_from(endian + 'HHI', entries, index * 12)
+        if field_type == 3:
+            value = struct.unpack_from(endian + 'H', entries, index * 12 + 8)[0]
+        else:
+            value = struct.unpack_from(endian + 'I', entries, index * 12 + 8)[0]
+        if tag == 256:
+            width = value
+        elif tag == 257:
+            height = value
+        elif tag == 258:
+            # При count > 1 значение - смещение массива; для оценки хватает 8/16 бит
+            bit_depth = value if count == 1 else 8
+        elif tag == 277:
+            channels = value
+    if width is None or height is None:
+        return None
+    return width, height, channels, bit_depth
+
+
+def probe_stream(f):
+    """
+    Читает разрешение изображения из открытого файла (PNG, JPEG, BMP, TIFF), не декодируя его.
+    Возвращает: (width, height, channels, bit_depth) или None, если формат не распознан
+    """
+    try:
+        head = f.read(64)
+        for probe in (_probe_png, _probe_jpeg, _probe_bmp, _probe_tiff):
+            result = probe(f, head)
+            if result:
+                return result
+    except (OSError, struct.error, zipfile.BadZipFile):
+        pass
+    return None
+
+
+def probe_image(file_path):
+    """Читает разрешение изображения из заголовка файла (см. probe_stream)"""
+    try:
+        with open(file_path, 'rb') as f:
+            return probe_stream(f)
+    except OSError:
+        return None
+
+
+def probe_images(file_paths):
+    """
+    Читает заголовки нескольких изображений параллельно.
+    Возвращает: список результатов probe_image в том же порядке
+    """
+    global _probe_pool
+    if len(file_paths) < 2:
+        return [probe_image(file_path) for file_path in file_paths]
+    if _probe_pool is None:
+        _probe_pool = ThreadPoolExecutor(thread_name_prefix="texture_probe")
+    return list(_probe_pool.map(probe_image, file_paths))
+
+
+def estimate_texture_memory(width, height, bit_depth):
+    """
+    Оценка памяти под текстуру в Blender.
+    Декодированное изображение хранится как RGBA: 8 бит - 4 байта на пиксель,
+    больше 8 бит - float (16 байт на пиксель). На GPU - RGBA8 или RGBA16F
+    с мип-уровнями (+1/3).
+    Возвращает: (decoded_bytes, gpu_bytes)
+    """
+    pixels = width * height
+    if bit_depth and bit_depth > 8:
+        return pixels * 16, pixels * 8 * 4 // 3
+    return pixels * 4, pixels * 4 * 4 // 3
+
+
+def file_hash(file_path):
+    """SHA-256 содержимого файла (чтение блоками)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def group_pbr_sets(items, name_of=str):
+    """
+    Группирует файлы текстур в PBR наборы по суффиксам (PBR_MAP_SUFFIXES).
+    Набор образуется, если в нем есть карта basecolor вместе с другими картами или хотя бы две карты.
+    Файл без суффикса и единственная карта любого типа (например, diffuse текстура brushed_metal.png) -
+    отдельный материал с полным именем файла.
+    items - пути или любые объекты, name_of(item) - имя файла.
+    Возвращает: [{'name': имя материала, 'maps': {тип карты: item}, 'pbr': bool}, ...] по имени
+    """
+    groups = {}  # имя набора в нижнем регистре -> {'name', 'maps', 'extra'}
+    standalone = []
+    for item in items:
+        stem = os.path.splitext(os.path.basename(name_of(item)))[0]
+        match = PBR_SUFFIX_RE.match(stem)
+        if not match:
+            standalone.append({'name': stem, 'maps': {'basecolor': item}, 'pbr': False})
+            continue
+        map_type = PBR_SUFFIX_TYPES[match.group('suffix').lower()]
+        group = groups.setdefault(match.group('name').lower(), {'name': match.group('name'), 'maps': {}, 'extra': []})
+        if map_type in group['maps']:
+            # Вторая карта того же типа (например, .png и .jpg) - отдельный материал
+            group['extra'].append(item)
+        else:
+            group['maps'][map_type] = item
+
+    texture_sets = list(standalone)
+    for group in groups.values():
+        if len(group['maps']) == 1:
+            # Одна карта - обычный материал с исходным именем файла (суффикс может быть частью имени)
+            group['extra'].extend(group['maps'].values())
+        else:
+            texture_sets.append({'name': group['name'], 'maps': group['maps'], 'pbr': True})
+        for item in group['extra']:
+            stem = os.path.splitext(os.path.basename(name_of(item)))[0]
+            texture_sets.append({'name': stem, 'maps': {'basecolor': item}, 'pbr': False})
+
+    texture_sets.sort(key=lambda texture_set: texture_set['name'].lower())
+    return texture_sets
+
+
+def count_materials(rows):
+    """
+    Число материалов папки по строкам (имя файла, хеш или None) - так же, как при применении:
+    PBR набор - один материал, отдельные текстуры с одинаковым хешем - один материал.
+    """
+    hashes = dict(rows)
+    count = 0
+    seen = set()
+    for texture_set in group_pbr_sets(hashes):
+        content_hash = None if texture_set['pbr'] else hashes[texture_set['maps']['basecolor']]
+        if content_hash is not None:
+            if content_hash in seen:
+                continue
+            seen.add(content_hash)
+        count += 1
+    return count
+
+
+# ---------------------------------------------------------------------------
+# ZIP архивы
+# ---------------------------------------------------------------------------
+
+def is_archive(path):
+    """Является ли путь архивом текстур (по расширению)"""
+    return os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+
+
+def split_archive_path(path):
+    """
+    Разбирает путь внутри архива: <архив.zip>/<имя в архиве>.
+    Возвращает: (путь архива, имя в архиве через '/') или (None, None) для обычного пути
+    """
+    archive_path = os.path.abspath(path)
+    parts = []
+    while True:
+        if is_archive(archive_path) and os.path.isfile(archive_path):
+            return (archive_path, '/'.join(reversed(parts))) if parts else (None, None)
+        parent, name = os.path.split(archive_path)
+        if parent == archive_path or not name:
+            return None, None
+        parts.append(name)
+        archive_path = parent
+
+
+def member_mtime_ns(info):
+    """Время изменения файла в архиве (локальное время из центрального каталога)"""
+    return int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+
+
+def scan_archive(path, known_mtime_ns=None):
+    """
+    Читает содержимое архива из центрального каталога (без распаковки).
+    Разрешение изображений читается из заголовков (распаковываются первые байты файлов).
+    Возвращает: (path, mtime_ns, {папка: textures} или None, если архив не изменился),
+    папки - пути вида <архив.zip>/<папка>, сам архив - корневая папка
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    if known_mtime_ns == mtime_ns:
+        return path, mtime_ns, None
+
+    directories = {path: []}
+    seen_names = set()
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or os.path.splitext(info.filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            if info.filename.lower() in seen_names:
+                continue
+            seen_names.add(info.filename.lower())
+            parts = info.filename.split('/')
+            directory = os.path.join(path, *parts[:-1])
+            # Промежуточные папки архива тоже попадают в каталог (как пустые папки на диске)
+            parent = directory
+            while parent not in directories:
+                directories[parent] = []
+                parent = os.path.dirname(parent)
+            with archive.open(info) as f:
+                header = probe_stream(f)
+            directories[directory].append(
+                (os.path.join(path, *parts), parts[-1], info.file_size, member_mtime_ns(info))
+                + tuple(header or (None, None, None, None)))
+    return path, mtime_ns, directories
+
+
+# ---------------------------------------------------------------------------
+# Сканирование папок
+# ---------------------------------------------------------------------------
+
+def scan_directory(path, known_mtime_ns=None):
+    """
+    Сканирует одну папку (без рекурсии). Выполняется в потоках пула.
+    Если время модификации папки совпадает с known_mtime_ns, содержимое не читается.
+    Возвращает: (path, mtime_ns, subdirectories или None, textures или None),
+    textures - [(path, name, size, mtime_ns, width, height, channels, bit_depth), ...]
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    if known_mtime_ns == mtime_ns:
+        return path, mtime_ns, None, None
+
+    subdirectories = []
+    files = []
+    seen_names = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) or (entry.is_file() and is_archive(entry.name)):
+                subdirectories.append(entry.path)
+            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                # Одинаковые имена в разном регистре считаем одним файлом
+                if entry.name.lower() in seen_names:
+                    continue
+                seen_names.add(entry.name.lower())
+                stat = entry.stat()
+                files.append((entry.path, entry.name, stat.st_size, stat.st_mtime_ns))
+
+    headers = probe_images([file_info[0] for file_info in files])
+    textures = [
+        file_info + tuple(header or (None, None, None, None))
+        for file_info, header in zip(files, headers)
+    ]
+    return path, mtime_ns, subdirectories, textures
+
+
+def subtree_range(root_dir):
+    """
+    Границы путей внутри root_dir для запроса по диапазону (path >= ? AND path < ?).
+    В отличие от LIKE, '_' и '%' в именах папок не являются шаблонами и регистр учитывается.
+    Возвращает: (нижняя граница включительно, верхняя граница не включительно)
+    """
+    prefix = root_dir if root_dir.endswith(os.sep) else root_dir + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class TextureCatalog:
+    """Каталог текстур в SQLite: папки, файлы и их метаданные"""
+
+    def __init__(self, catalog_path, cache_dir=None):
+        self.catalog_path = catalog_path
+        # Кеш файлов, извлеченных из архивов (по умолчанию - рядом с каталогом)
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(catalog_path)), "texture_cache")
+        # Каталог может читаться одновременно несколькими процессами (пакетный экспорт)
+        self.connection = sqlite3.connect(catalog_path, timeout=30)
+        self.connection.executescript(CATALOG_SCHEMA)
+        self._memory_hashes = {}  # Хеши файлов вне каталога: путь -> (размер, mtime, хеш)
+        self._archives = {}  # Открытые архивы: путь -> (mtime_ns, ZipFile)
+
+    def close(self):
+        for _, archive in self._archives.values():
+            archive.close()
+        self._archives.clear()
+        self.connection.close()
+
+    def scan(self, root_dir, force=False, max_workers=None):
+        """
+        Рекурсивно обновляет каталог для root_dir. Папки с неизменившимся временем
+        модификации не перечитываются (их подпапки берутся из каталога).
+        force=True - перечитать все папки.
+        Возвращает: {'directories': всего папок, 'rescanned': перечитано, 'textures': всего текстур, 'seconds': время}
+        """
+        start_time = time.perf_counter()
+        root_dir = os.path.abspath(root_dir)
+        cursor = self.connection.cursor()
+        known = dict(cursor.execute(
+            "SELECT path, mtime_ns FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+            (root_dir, *subtree_range(root_dir))
+        ).fetchall())
+
+        visited = set()
+        rescanned = 0
+        if not os.path.isdir(root_dir):
+            return {'directories': 0, 'rescanned': 0, 'textures': 0, 'seconds': 0.0}
+
+        def submit(path):
+            scanner = scan_archive if is_archive(path) else scan_directory
+            return pool.submit(scanner, path, None if force else known.get(path))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {submit(root_dir)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except (OSError, zipfile.BadZipFile) as e:
+                        print(f"⚠ Не удалось прочитать папку: {e}")
+                        continue
+
+                    if len(result) == 3:
+                        # Архив: все его папки сохраняются сразу
+                        path, mtime_ns, directories = result
+                        if directories is None:
+                            visited.update(known_path for known_path in known
+                                           if known_path == path or known_path.startswith(path + os.sep))
+                        else:
+                            rescanned += 1
+                            for directory, textures in directories.items():
+                                visited.add(directory)
+                                self._store_directory(cursor, directory, root_dir, mtime_ns, textures)
+                        continue
+
+                    path, mtime_ns, subdirectories, textures = result
+                    visited.add(path)
+
+                    if subdirectories is None:
+                        # Папка не изменилась - подпапки берем из каталога
+                        subdirectories = [row[0] for row in cursor.execute(
+                            "SELECT path FROM directories WHERE parent = ?", (path,))]
+                    else:
+                        rescanned += 1
+                        self._store_directory(cursor, path, root_dir, mtime_ns, textures)
+
+                    for subdirectory in subdirectories:
+                        pending.add(submit(subdirectory))
+
+        # Удаленные папки
+        removed = [path for path in known if path not in visited]
+        for path in removed:
+            cursor.execute("DELETE FROM directories WHERE path = ?", (path,))
+            cursor.execute("DELETE FROM textures WHERE directory = ?", (path,))
+        self.connection.commit()
+
+        texture_count = cursor.execute(
+            "SELECT COUNT(*) FROM textures WHERE directory = ? OR (directory >= ? AND directory < ?)",
+            (root_dir, *subtree_range(root_dir))
+        ).fetchone()[0]
+        return {
+            'directories': len(visited),
+            'rescanned': rescanned,
+            'textures': texture_count,
+            'seconds': time.perf_counter() - start_time,
+        }
+
+    def _store_directory(self, cursor, path, root_dir, mtime_ns, textures):
+        """Сохраняет результат сканирования папки (хеши неизменившихся файлов сохраняются)"""
+        old_hashes = {
+            row[0]: row[1:] for row in cursor.execute(
+                "SELECT path, size, mtime_ns, hash FROM textures WHERE directory = ?", (path,))
+        }
+        cursor.execute("DELETE FROM textures WHERE directory = ?", (path,))
+        rows = []
+        for texture_path, name, size, texture_mtime_ns, width, height, channels, bit_depth in textures:
+            old = old_hashes.get(texture_path)
+            content_hash = old[2] if old and old[0] == size and old[1] == texture_mtime_ns else None
+            rows.append((texture_path, path, name, size, texture_mtime_ns,
+                         width, height, channels, bit_depth, content_hash))
+        cursor.executemany(
+            "INSERT INTO textures (path, directory, name, size, mtime_ns, width, height, channels, bit_depth, hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        parent = os.path.dirname(path) if path != root_dir else None
+        cursor.execute(
+            "INSERT OR REPLACE INTO directories (path, parent, mtime_ns, texture_count) VALUES (?, ?, ?, ?)",
+            (path, parent, mtime_ns, len(rows)))
+
+    def folders(self, root_dir):
+        """
+        Папки с текстурами внутри root_dir (без самой корневой папки), отсортированные по имени.
+        Количество - число материалов, как при применении папки: PBR набор карт считается одним материалом,
+        отдельные текстуры с одинаковым содержимым (по уже известным хешам) - одним.
+        Возвращает: [(относительное имя папки, количество материалов, путь), ...]
+        """
+        root_dir = os.path.abspath(root_dir)
+        rows = {}
+        for directory, name, content_hash in self.connection.execute(
+                "SELECT directory, name, hash FROM textures WHERE directory >= ? AND directory < ?",
+                subtree_range(root_dir)):
+            rows.setdefault(directory, []).append((name, content_hash))
+        folders_info = [
+            (os.path.relpath(path, root_dir).replace(os.sep, '/'), count_materials(folder_rows), path)
+            for path, folder_rows in rows.items()
+        ]
+        folders_info.sort(key=lambda x: x[0].lower())
+        return folders_info
+
+    def textures(self, folder_path):
+        """
+        Текстуры папки из каталога, отсортированные по имени.
+        Возвращает: список словарей с полями таблицы textures
+        """
+        cursor = self.connection.execute(
+            "SELECT path, name, size, mtime_ns, width, height, channels, bit_depth, hash "
+            "FROM textures WHERE directory = ?", (os.path.abspath(folder_path),))
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        rows.sort(key=lambda row: row['name'].lower())
+        return rows
+
+    def folder_memory(self, root_dir):
+        """
+        Оценка памяти по папкам внутри root_dir (по разрешению из заголовков).
+        Возвращает: {путь папки: (decoded_bytes, gpu_bytes, количество нераспознанных файлов)}
+        """
+        root_dir = os.path.abspath(root_dir)
+        estimates = {}
+        rows = self.connection.execute(
+            "SELECT directory, width, height, bit_depth FROM textures WHERE directory >= ? AND directory < ?",
+            subtree_range(root_dir))
+        for directory, width, height, bit_depth in rows:
+            decoded, gpu, unknown = estimates.get(directory, (0, 0, 0))
+            if width and height:
+                texture_decoded, texture_gpu = estimate_texture_memory(width, height, bit_depth)
+                estimates[directory] = (decoded + texture_decoded, gpu + texture_gpu, unknown)
+            else:
+                estimates[directory] = (decoded, gpu, unknown + 1)
+        return estimates
+
+    def has_directory(self, folder_path):
+        """Есть ли папка в каталоге"""
+        return self.connection.execute(
+            "SELECT 1 FROM directories WHERE path = ?", (os.path.abspath(folder_path),)
+        ).fetchone() is not None
+
+    def get_hash(self, file_path):
+        """
+        Хеш содержимого файла. Берется из каталога, если размер и время изменения совпадают,
+        иначе считается и сохраняется (для файлов вне каталога - в памяти).
+        """
+        file_path = os.path.abspath(file_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, hash FROM textures WHERE path = ?", (file_path,)).fetchone()
+        archive_path, member = split_archive_path(file_path)
+        if archive_path is not None:
+            return self._get_member_hash(file_path, archive_path, member, row)
+
+        stat = os.stat(file_path)
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and row[2]:
+            return row[2]
+
+        cached = self._memory_hashes.get(file_path)
+        if not row and cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        content_hash = file_hash(file_path)
+        if row:
+            self.connection.execute(
+                "UPDATE textures SET size = ?, mtime_ns = ?, hash = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, content_hash, file_path))
+            self.connection.commit()
+        else:
+            self._memory_hashes[file_path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def _open_archive(self, archive_path):
+        """Открытый архив (центральный каталог читается один раз, пока архив не изменится)"""
+        mtime_ns = os.stat(archive_path).st_mtime_ns
+        cached = self._archives.get(archive_path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        if cached:
+            cached[1].close()
+        archive = zipfile.ZipFile(archive_path)
+        self._archives[archive_path] = (mtime_ns, archive)
+        return archive
+
+    def _get_member_hash(self, file_path, archive_path, member, row):
+        """
+        Хеш файла из архива. Если хеша нет в каталоге, файл извлекается в кеш
+        (хеш считается при извлечении) - повторно распаковывать его не нужно.
+        """
+        info = self._open_archive(archive_path).getinfo(member)
+        mtime_ns = member_mtime_ns(info)
+        if row and row[0] == info.file_size and row[1] == mtime_ns and row[2]:
+            return row[2]
+
+        cached = self._memory_hashes.get(file_path)
+        if not row and cached and cached[0] == info.file_size and cached[1] == mtime_ns:
+            return cached[2]
+
+        _, content_hash = self._extract_member(archive_path, member)
+        if row:
+            self.connection.execute(
+                "UPDATE textures SET size = ?, mtime_ns = ?, hash = ? WHERE path = ?",
+                (info.file_size, mtime_ns, content_hash, file_path))
+            self.connection.commit()
+        else:
+            self._memory_hashes[file_path] = (info.file_size, mtime_ns, content_hash)
+        return content_hash
+
+    def _cache_path(self, content_hash, member):
+        return os.path.join(self.cache_dir, content_hash[:2], content_hash + os.path.splitext(member)[1].lower())
+
+    def _extract_member(self, archive_path, member):
+        """
+        Извлекает файл архива в кеш: пишется во временный файл с подсчетом хеша
+        и переименовывается в <хеш>.<расширение>.
+        Возвращает: (путь в кеше, хеш)
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(suffix='.part', dir=self.cache_dir)
+        try:
+            with os.fdopen(handle, 'wb') as output, self._open_archive(archive_path).open(member) as source:
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    output.write(chunk)
+            content_hash = digest.hexdigest()
+            cache_path = self._cache_path(content_hash, member)
+            if os.path.exists(cache_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                os.replace(temp_path, cache_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return cache_path, content_hash
+
+    def extract(self, file_path):
+        """
+        Путь к файлу текстуры на диске. Файл из архива извлекается в кеш
+        (если его там еще нет), обычный файл возвращается без изменений.
+        """
+        archive_path, member = split_archive_path(file_path)
+        if archive_path is None:
+            return file_path
+        cache_path = self._cache_path(self.get_hash(file_path), member)
+        if not os.path.exists(cache_path):
+            cache_path, _ = self._extract_member(archive_path, member)
+        return cache_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обновление каталога текстур")
+    parser.add_argument('root', help="Корневая папка с текстурами")
+    parser.add_argument('--catalog', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          "texture_catalog.sqlite"),
+                        help="Путь к файлу каталога")
+    parser.add_argument('--force', action='store_true', help="Перечитать все папки")
+    args = parser.parse_args(argv)
+
+    catalog = TextureCatalog(args.catalog)
+    stats = catalog.scan(args.root, force=args.force)
+    print(f"✓ Папок: {stats['directories']} (перечитано {stats['rescanned']}), "
+          f"текстур: {stats['textures']}, время: {stats['seconds']:.3f} с")
+    memory = catalog.folder_memory(args.root)
+    for folder_name, material_count, folder_path in catalog.folders(args.root)[:20]:
+        decoded, gpu, unknown = memory.get(folder_path, (0, 0, 0))
+        unknown_info = f", не распознано: {unknown}" if unknown else ""
+        print(f"  - {folder_name} ({material_count}): RAM ~{decoded / 1048576:.1f} МБ, "
+              f"GPU ~{gpu / 1048576:.1f} МБ{unknown_info}")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())